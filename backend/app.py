@@ -4,12 +4,20 @@ This API provides endpoints for both text summarization and TTS synthesis.
 
 Installation:
 pip install flask transformers torch huggingface_hub tqdm accelerate scipy numpy
+pip install soundfile  # optional: FLAC and Ogg/Opus audio output
 """
 
-from flask import Flask, request, jsonify, send_file
+import io
+import json
+import math
+import time
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from services.summarization_service import SummarizationService
+from services.rate_limiter import RateLimitExceeded
 from services.tts_service import TTSService
+from services.tts_stream_service import TTSStreamService
+from services.audio_encoding import ACCEPT_FORMATS, AudioEncoder, available_formats
 from services.ocr_service import OCRService
 from services.translation_service import TranslationService
 
@@ -19,6 +27,7 @@ CORS(app)  # Enable CORS for frontend communication
 # Initialize services
 summarization_service = SummarizationService()
 tts_service = TTSService()
+tts_stream_service = TTSStreamService()
 ocr_service = OCRService()
 translation_service = TranslationService()
 
@@ -39,6 +48,13 @@ def initialize():
         except Exception as e:
             print(f"Warning: Failed to initialize TTS service: {e}")
     
+    # Initialize streaming TTS pipeline if not already loaded
+    if not tts_stream_service.is_initialized():
+        try:
+            tts_stream_service.initialize()
+        except Exception as e:
+            print(f"Warning: Failed to initialize TTS streaming pipeline: {e}")
+    
     # Initialize translation service if not already loaded
     if not translation_service.is_initialized():
         try:
@@ -55,12 +71,24 @@ def health_check():
             "summarization": {
                 "model": summarization_service.MODEL_NAME,
                 "device": summarization_service.get_device(),
-                "loaded": summarization_service.is_initialized()
+                "loaded": summarization_service.is_initialized(),
+                "extractive_fallback": summarization_service.has_fallback(),
+                "cache": summarization_service.get_cache_stats(),
+                "rate_limit": summarization_service.get_rate_limit_stats(),
+                "chat_sessions": summarization_service.get_chat_session_stats(),
+                "coalescing": summarization_service.get_coalescing_stats()
             },
             "tts": {
                 "model": tts_service.MODEL_NAME,
                 "device": tts_service.get_device(),
-                "loaded": tts_service.is_initialized()
+                "loaded": tts_service.is_initialized(),
+                "coalescing": tts_service.get_coalescing_stats(),
+                "cache": tts_service.get_cache_stats(),
+                "audio_formats": available_formats(),
+                "streaming": {
+                    "loaded": tts_stream_service.is_initialized(),
+                    **tts_stream_service.get_stats()
+                }
             },
             "ocr": {
                 "loaded": ocr_service.is_initialized(),
@@ -68,17 +96,35 @@ def health_check():
             },
             "translation": {
                 "loaded": translation_service.is_initialized(),
-                "supported_languages": TranslationService.get_supported_languages()
+                "supported_languages": TranslationService.get_supported_languages(),
+                "coalescing": translation_service.get_coalescing_stats(),
+                "memory": translation_service.get_memory_stats(),
+                "client_pool": translation_service.get_pool_stats(),
+                "backends": translation_service.get_backend_stats(),
+                "micro_batching": translation_service.get_micro_batch_stats()
             }
         }
     })
 
+def _rate_limited(err):
+    """Build a 429 response (with Retry-After) for a request the scheduler turned away"""
+    response = jsonify({"error": str(err), "retry_after": err.retry_after})
+    response.status_code = 429
+    if err.retry_after is not None:
+        response.headers['Retry-After'] = str(max(1, math.ceil(err.retry_after)))
+    return response
+
 @app.route('/summarize', methods=['POST'])
 def summarize():
     """
     Summarization endpoint
-    Expects JSON: {"text": "Your text to summarize here"}
-    Returns: JSON with summary
+    Expects JSON: {"text": "Your text to summarize here",
+                   "mode": "llm" | "fast" (optional),
+                   "strategy": "auto" | "single" | "hierarchical" (optional),
+                   "fan_out": 4 (optional), "max_depth": 4 (optional),
+                   "document_id": "..." (optional, enables incremental re-summarization)}
+    Returns: JSON with summary and the mode that produced it
+             (plus version and paragraph counts when document_id is given)
     """
     try:
         # Get text from request
@@ -88,11 +134,24 @@ def summarize():
         
         text = data['text']
         
+        # Edited documents only re-summarize the paragraphs that changed
+        if data.get('document_id') and data.get('mode', 'llm') == 'llm':
+            result = summarization_service.summarize_document(data['document_id'], text)
+            return jsonify(result)
+        
         # Use the summarization service
-        summary = summarization_service.summarize(text)
+        result = summarization_service.summarize_detailed(
+            text,
+            strategy=data.get('strategy', 'auto'),
+            fan_out=data.get('fan_out'),
+            max_depth=data.get('max_depth'),
+            mode=data.get('mode', 'llm')
+        )
         
-        return jsonify({"summary": summary})
+        return jsonify(result)
     
+    except RateLimitExceeded as err:
+        return _rate_limited(err)
     except ValueError as err:
         return jsonify({"error": str(err)}), 400
     except Exception as err:
@@ -102,15 +161,139 @@ def summarize():
             "details": str(err)
         }), 500
 
+@app.route('/summarize/batch', methods=['POST'])
+def summarize_batch():
+    """
+    Batch summarization endpoint
+    Expects JSON: {"texts": ["first text", "second text", ...], "concurrency": 4 (optional)}
+    Returns: JSON with per-item results in input order
+             ({"index": 0, "summary": "..."} or {"index": 1, "error": "..."})
+    """
+    try:
+        data = request.get_json()
+        if not data or 'texts' not in data:
+            return jsonify({"error": "No texts provided"}), 400
+        
+        result = summarization_service.summarize_batch(
+            data['texts'],
+            concurrency=data.get('concurrency'),
+            strategy=data.get('strategy', 'auto'),
+            mode=data.get('mode', 'llm')
+        )
+        
+        return jsonify(result)
+    
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as err:
+        print(f"SUMMARIZE BATCH ERROR: {err}")
+        return jsonify({
+            "error": "Batch summarization failed",
+            "details": str(err)
+        }), 500
+
+
+def _sse(event, payload):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _sse_response(fragments, error_message):
+    """
+    Stream text fragments as SSE 'token' events, followed by a 'done' event
+    carrying time-to-first-token and total time (or an 'error' event)
+    """
+    started = time.perf_counter()
+    
+    def generate():
+        first_token_at = None
+        chars = 0
+        try:
+            for fragment in fragments:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chars += len(fragment)
+                yield _sse("token", {"text": fragment})
+        except RateLimitExceeded as err:
+            yield _sse("error", {"error": str(err), "retry_after": err.retry_after})
+            return
+        except Exception as err:
+            print(f"STREAM ERROR: {err}")
+            yield _sse("error", {"error": error_message, "details": str(err)})
+            return
+        
+        finished = time.perf_counter()
+        yield _sse("done", {
+            "ttft_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+            "total_ms": round((finished - started) * 1000, 1),
+            "chars": chars
+        })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/summarize/stream', methods=['POST'])
+def summarize_stream():
+    """
+    Streaming summarization endpoint (Server-Sent Events)
+    Expects JSON: {"text": "Your text to summarize here", "mode": "llm" | "fast" (optional)}
+    Returns: text/event-stream of 'token' events ({"text": "..."}) and a final
+             'done' event ({"ttft_ms", "total_ms", "chars"}) or 'error' event
+    """
+    try:
+        data = request.get_json()
+        if not data or 'text' not in data:
+            return jsonify({"error": "No text provided"}), 400
+        
+        fragments = summarization_service.summarize_stream(
+            data['text'],
+            fan_out=data.get('fan_out'),
+            max_depth=data.get('max_depth'),
+            mode=data.get('mode', 'llm')
+        )
+        
+        return _sse_response(fragments, "Summarization failed")
+    
+    except RateLimitExceeded as err:
+        return _rate_limited(err)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as err:
+        print(f"SUMMARIZE STREAM ERROR: {err}")
+        return jsonify({
+            "error": "Summarization failed",
+            "details": str(err)
+        }), 500
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """
     General chat endpoint for any text generation task
     Expects JSON: {"messages": [{"role": "user", "content": "..."}], "max_tokens": 500, "temperature": 0.7}
+    With a server-side session (see /chat/session), send only the new turn:
+        {"session_id": "...", "message": "..."} or {"session_id": "...", "messages": [...]}
     Returns: JSON with response
     """
     try:
         data = request.get_json()
+        if data and data.get('session_id'):
+            new_messages = data.get('messages')
+            if new_messages is None and 'message' in data:
+                new_messages = [{"role": "user", "content": data['message']}]
+            if not new_messages:
+                return jsonify({"error": "No message provided"}), 400
+            
+            result = summarization_service.chat_session(
+                data['session_id'],
+                new_messages,
+                data.get('max_tokens', 500),
+                data.get('temperature', 0.7)
+            )
+            return jsonify(result)
+        
         if not data or 'messages' not in data:
             return jsonify({"error": "No messages provided"}), 400
         
@@ -123,6 +306,10 @@ def chat():
         
         return jsonify({"response": response})
     
+    except RateLimitExceeded as err:
+        return _rate_limited(err)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
     except Exception as err:
         print(f"CHAT ERROR: {err}")
         return jsonify({
@@ -130,17 +317,133 @@ def chat():
             "details": str(err)
         }), 500
 
+@app.route('/chat/session', methods=['POST'])
+def create_chat_session():
+    """
+    Start a server-side chat session
+    Expects JSON: {"system_prompt": "..." (optional), "token_budget": 3000 (optional)}
+    Returns: JSON with session_id and token_budget
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        result = summarization_service.create_chat_session(
+            data.get('system_prompt'),
+            data.get('token_budget')
+        )
+        
+        return jsonify(result)
+    
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as err:
+        print(f"CHAT SESSION ERROR: {err}")
+        return jsonify({
+            "error": "Failed to create chat session",
+            "details": str(err)
+        }), 500
+
+@app.route('/chat/session/<session_id>', methods=['DELETE'])
+def end_chat_session(session_id):
+    """
+    End a server-side chat session
+    Returns: JSON with deleted flag (404 if the session does not exist)
+    """
+    if not summarization_service.end_chat_session(session_id):
+        return jsonify({"error": f"Unknown chat session: {session_id}"}), 404
+    return jsonify({"deleted": True})
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    Expects JSON: {"messages": [{"role": "user", "content": "..."}], "max_tokens": 500, "temperature": 0.7}
+    Returns: text/event-stream of 'token' events and a final 'done' or 'error' event
+    """
+    try:
+        data = request.get_json()
+        if not data or 'messages' not in data:
+            return jsonify({"error": "No messages provided"}), 400
+        
+        fragments = summarization_service.chat_stream(
+            data['messages'],
+            data.get('max_tokens', 500),
+            data.get('temperature', 0.7)
+        )
+        
+        return _sse_response(fragments, "Chat generation failed")
+    
+    except RateLimitExceeded as err:
+        return _rate_limited(err)
+    except Exception as err:
+        print(f"CHAT STREAM ERROR: {err}")
+        return jsonify({
+            "error": "Chat generation failed",
+            "details": str(err)
+        }), 500
+
 
 # ============================================================================
 # Text-to-Speech Endpoints
 # ============================================================================
 
+TTS_OPTIONS = ('description', 'temperature', 'top_p', 'seed')
+
+def _tts_options(data, names=TTS_OPTIONS):
+    """Voice and sampling options present in a TTS request body"""
+    return {name: data[name] for name in names if data.get(name) is not None}
+
+def _audio_format(data, default='wav'):
+    """Output audio format: the body's 'format', else the preferred audio type in the Accept header"""
+    if data.get('format'):
+        return data['format']
+    best = request.accept_mimetypes.best_match(list(ACCEPT_FORMATS))
+    return ACCEPT_FORMATS.get(best, default)
+
+def _wants_binary_audio():
+    """Whether the Accept header prefers an audio type over JSON (JSON when it does not say)"""
+    best = request.accept_mimetypes.best_match(['application/json', *ACCEPT_FORMATS])
+    return best in ACCEPT_FORMATS
+
+def _tts_response(data, as_attachment=False):
+    """
+    Synthesize the request's text as binary audio, or as base64 in JSON
+    
+    The format ("wav", "flac", "opus", "pcm") comes from the body's 'format'
+    or the Accept header, the sample rate tier from 'quality' ("high",
+    "medium" = 16 kHz, "low" = 8 kHz).
+    """
+    audio_format = _audio_format(data)
+    quality = data.get('quality', 'high')
+    options = _tts_options(data)
+    
+    if not as_attachment and not _wants_binary_audio():
+        return jsonify(tts_service.synthesize_base64(data['text'], audio_format, quality, **options))
+    
+    audio_bytes, sampling_rate, content_type = tts_service.synthesize_encoded(
+        data['text'], audio_format, quality, **options
+    )
+    extension = 'ogg' if audio_format == 'opus' else audio_format
+    response = send_file(
+        io.BytesIO(audio_bytes),
+        mimetype=content_type,
+        as_attachment=as_attachment,
+        download_name=f'speech.{extension}'
+    )
+    response.headers['X-Sample-Rate'] = str(sampling_rate)
+    response.vary.add('Accept')
+    return response
+
 @app.route('/tts', methods=['POST'])
 def tts():
     """
-    TTS endpoint for frontend - Returns base64 encoded audio in JSON
-    Expects JSON: {"text": "Your text here", "voice": "alloy" (optional)}
-    Returns: JSON with base64 encoded audio
+    TTS endpoint for frontend - Returns base64 encoded audio in JSON, or binary audio
+    Expects JSON: {"text": "Your text here", "voice": "alloy" (optional),
+                   "description", "temperature", "top_p", "seed" (optional),
+                   "format": "wav" | "flac" | "opus" | "pcm" (optional, default "wav"),
+                   "quality": "high" | "medium" | "low" (optional, default "high")}
+    Returns: JSON with base64 encoded audio, or the audio itself when the
+             Accept header prefers an audio type (e.g. "Accept: audio/ogg")
     """
     try:
         # Check if TTS service is initialized
@@ -155,13 +458,10 @@ def tts():
         if not data or 'text' not in data:
             return jsonify({"error": "Missing 'text' field in request"}), 400
         
-        text = data['text']
         voice = data.get('voice', 'alloy')  # Voice parameter for future use
         
         # Use the TTS service
-        result = tts_service.synthesize_base64(text)
-        
-        return jsonify(result)
+        return _tts_response(data)
     
     except ValueError as err:
         return jsonify({"error": str(err)}), 400
@@ -177,8 +477,11 @@ def tts():
 def synthesize_speech():
     """
     TTS endpoint - Returns audio file
-    Expects JSON: {"text": "Your text here"}
-    Returns: Audio file (WAV format)
+    Expects JSON: {"text": "Your text here",
+                   "description", "temperature", "top_p", "seed" (optional),
+                   "format": "wav" | "flac" | "opus" | "pcm" (optional, else from Accept, default "wav"),
+                   "quality": "high" | "medium" | "low" (optional, default "high")}
+    Returns: Audio file (WAV by default)
     """
     try:
         # Check if TTS service is initialized
@@ -193,17 +496,8 @@ def synthesize_speech():
         if not data or 'text' not in data:
             return jsonify({"error": "Missing 'text' field in request"}), 400
         
-        text = data['text']
-        
         # Use the TTS service
-        audio_buffer, _ = tts_service.synthesize(text)
-        
-        return send_file(
-            audio_buffer,
-            mimetype='audio/wav',
-            as_attachment=True,
-            download_name='speech.wav'
-        )
+        return _tts_response(data, as_attachment=True)
     
     except ValueError as err:
         return jsonify({"error": str(err)}), 400
@@ -218,9 +512,13 @@ def synthesize_speech():
 @app.route('/synthesize_json', methods=['POST'])
 def synthesize_json():
     """
-    Alternative TTS endpoint - Returns base64 encoded audio in JSON
-    Expects JSON: {"text": "Your text here"}
-    Returns: JSON with base64 encoded audio
+    Alternative TTS endpoint - Returns base64 encoded audio in JSON, or binary audio
+    Expects JSON: {"text": "Your text here",
+                   "description", "temperature", "top_p", "seed" (optional),
+                   "format": "wav" | "flac" | "opus" | "pcm" (optional, default "wav"),
+                   "quality": "high" | "medium" | "low" (optional, default "high")}
+    Returns: JSON with base64 encoded audio, or the audio itself when the
+             Accept header prefers an audio type
     """
     try:
         # Get text from request
@@ -228,12 +526,8 @@ def synthesize_json():
         if not data or 'text' not in data:
             return jsonify({"error": "Missing 'text' field in request"}), 400
         
-        text = data['text']
-        
         # Use the TTS service
-        result = tts_service.synthesize_base64(text)
-        
-        return jsonify(result)
+        return _tts_response(data)
     
     except ValueError as err:
         return jsonify({"error": str(err)}), 400
@@ -245,6 +539,71 @@ def synthesize_json():
         }), 500
 
 
+@app.route('/tts/stream', methods=['POST'])
+def tts_stream():
+    """
+    Streaming TTS endpoint - Returns audio while it is being generated
+    Expects JSON: {"text": "Your text here", "description": "Voice description" (optional),
+                   "temperature": 0.4, "top_p": 0.9, "max_tokens": 2000, "seed" (optional),
+                   "format": "wav" | "pcm" | "flac" | "opus" (optional, else from Accept, default "wav"),
+                   "quality": "high" | "medium" | "low" (optional, default "high"),
+                   "long_form": true | false (optional, default: on for long texts)}
+    Returns: Chunked audio encoded as it is generated: audio/wav (streaming
+             header, then 16-bit mono PCM), raw audio/L16 PCM (big-endian), audio/flac or
+             Ogg/Opus (one page per second or so); time to first audio and
+             real-time factor are logged per stream and aggregated under /health
+    """
+    try:
+        if not tts_stream_service.is_initialized():
+            return jsonify({
+                "error": "TTS streaming not available",
+                "details": "The streaming pipeline is not initialized. Set TTS_STREAM_ENABLED=true"
+            }), 503
+        
+        data = request.get_json()
+        if not data or 'text' not in data:
+            return jsonify({"error": "Missing 'text' field in request"}), 400
+        
+        encoder = AudioEncoder(
+            _audio_format(data),
+            tts_stream_service.SAMPLE_RATE,
+            data.get('quality', 'high')
+        )
+        options = _tts_options(data, ('temperature', 'top_p', 'max_tokens', 'seed', 'long_form'))
+        chunks = tts_stream_service.stream(data['text'], data.get('description'), **options)
+        
+        def generate():
+            try:
+                for chunk in chunks:
+                    encoded = encoder.encode(chunk)
+                    if encoded:
+                        yield encoded
+                yield encoder.finish()
+            except Exception as err:
+                # Headers are already sent; ending the stream early is all we can do
+                print(f"TTS STREAM ERROR: {err}")
+        
+        return Response(
+            stream_with_context(generate()),
+            content_type=encoder.content_type,
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no',
+                'X-Sample-Rate': str(encoder.sample_rate),
+                'Vary': 'Accept'
+            }
+        )
+    
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as err:
+        print(f"TTS STREAM ERROR: {err}")
+        return jsonify({
+            "error": "Text-to-speech streaming failed",
+            "details": str(err)
+        }), 500
+
+
 # ============================================================================
 # OCR Endpoints
 # ============================================================================
@@ -289,6 +648,7 @@ def translate():
     """
     Translation endpoint
     Expects JSON: {"text": "Your text here", "targetLang": "Hindi"}
+    Optional: "sourceLang" (name or code) skips source language detection
     Returns: JSON with translated text
     """
     try:
@@ -304,7 +664,7 @@ def translate():
         target_lang = data['targetLang']
         
         # Use the translation service
-        result = translation_service.translate(text, target_lang)
+        result = translation_service.translate(text, target_lang, data.get('sourceLang'))
         
         return jsonify(result)
     
@@ -318,6 +678,92 @@ def translate():
         }), 500
 
 
+@app.route('/translate/multi', methods=['POST'])
+def translate_multi():
+    """
+    Multi-target translation endpoint
+    Expects JSON: {"text": "Your text here", "targetLangs": ["Hindi", "Kannada", "Tamil"]}
+    Optional: "sourceLang" (name or code) skips source language detection
+    Returns: JSON with the source language and per-language results and timings
+    """
+    try:
+        data = request.get_json()
+        if not data or 'text' not in data:
+            return jsonify({"error": "Missing 'text' field in request"}), 400
+        
+        # Accept a list under either key
+        target_langs = data.get('targetLangs', data.get('targetLang'))
+        if target_langs is None:
+            return jsonify({"error": "Missing 'targetLangs' field in request"}), 400
+        
+        result = translation_service.translate_multi(data['text'], target_langs, data.get('sourceLang'))
+        
+        return jsonify(result)
+    
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as err:
+        print(f"MULTI TRANSLATION ERROR: {err}")
+        return jsonify({
+            "error": "Translation failed",
+            "details": str(err)
+        }), 500
+
+
+@app.route('/translate/stream', methods=['POST'])
+def translate_stream():
+    """
+    Streaming translation endpoint (NDJSON)
+    Expects JSON: {"text": "Your text here", "targetLang": "Hindi", "sourceLang": "English" (optional)}
+    Returns: application/x-ndjson, one JSON object per line:
+             {"type": "start", ...}, then {"type": "segment", "index", "text", "elapsed_ms"}
+             in document order (concatenating "text" gives the translation), then
+             {"type": "done", "ttft_ms", "total_ms", ...} or {"type": "error", ...}
+    """
+    try:
+        data = request.get_json()
+        if not data or 'text' not in data:
+            return jsonify({"error": "Missing 'text' field in request"}), 400
+        
+        if 'targetLang' not in data:
+            return jsonify({"error": "Missing 'targetLang' field in request"}), 400
+        
+        events = translation_service.translate_stream(data['text'], data['targetLang'], data.get('sourceLang'))
+        started = time.perf_counter()
+        
+        def generate():
+            first_segment_at = None
+            try:
+                for event in events:
+                    now = time.perf_counter()
+                    if event["type"] == "segment":
+                        if first_segment_at is None:
+                            first_segment_at = now
+                        event["elapsed_ms"] = round((now - started) * 1000, 1)
+                    elif event["type"] == "done":
+                        event["ttft_ms"] = round((first_segment_at - started) * 1000, 1) if first_segment_at else None
+                        event["total_ms"] = round((now - started) * 1000, 1)
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as err:
+                print(f"TRANSLATION STREAM ERROR: {err}")
+                yield json.dumps({"type": "error", "error": "Translation failed", "details": str(err)}) + "\n"
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as err:
+        print(f"TRANSLATION STREAM ERROR: {err}")
+        return jsonify({
+            "error": "Translation failed",
+            "details": str(err)
+        }), 500
+
+
 @app.route('/detect-language', methods=['POST'])
 def detect_language():
     """
@@ -0,0 +1,110 @@
+"""
+Throughput benchmark for cross-stream batched SNAC decoding
+Runs N concurrent Maya1VoiceStreamingPipeline streams on one event loop, fed
+by a fake token engine that produces frames as fast as they are consumed, and
+compares per-stream inline decoding (batch size 1) with SNACDecodeScheduler
+
+Reports audio seconds produced per wall-clock second across all streams and
+the mean decode batch size. Uses the real SNAC 24kHz decoder on CPU when
+torch and snac are installed, otherwise the NumPy stand-in from
+bench_snac_streaming.py (which batches with one FFT per batch)
+
+Usage:
+    python bench_snac_batching.py [frames per stream]
+"""
+
+import asyncio
+import random
+import sys
+import time
+import timeit
+from types import SimpleNamespace
+from bench_snac_streaming import load_decoder
+from maya1_model.vllm_streaming_inference import (
+    CODE_END_TOKEN_ID,
+    CODE_START_TOKEN_ID,
+    SNAC_MAX_ID,
+    SNAC_MIN_ID,
+    SNAC_SAMPLE_RATE,
+    SNAC_TOKENS_PER_FRAME,
+    Maya1VoiceStreamingPipeline,
+    SNACDecodeScheduler
+)
+
+STREAM_COUNTS = [1, 2, 4, 8, 16, 32]
+
+
+class FakeEngine:
+    """Yields one SNAC frame per step, like vLLM's cumulative RequestOutput"""
+    
+    def __init__(self, frames):
+        self.frames = frames
+    
+    async def generate(self, prompt, sampling_params, request_id):
+        tokens = [CODE_START_TOKEN_ID]
+        for _ in range(self.frames):
+            tokens.extend(random.randint(SNAC_MIN_ID, SNAC_MAX_ID) for _ in range(SNAC_TOKENS_PER_FRAME))
+            # Let the other streams run, as the engine's step loop would
+            await asyncio.sleep(0)
+            yield SimpleNamespace(outputs=[SimpleNamespace(token_ids=list(tokens))])
+        yield SimpleNamespace(outputs=[SimpleNamespace(token_ids=tokens + [CODE_END_TOKEN_ID])])
+
+
+async def run_streams(pipeline, streams):
+    async def consume():
+        audio_bytes = 0
+        async for chunk in pipeline.generate_speech_stream("Benchmark voice.", "Benchmark text."):
+            audio_bytes += len(chunk)
+        return audio_bytes
+    
+    started = time.perf_counter()
+    totals = await asyncio.gather(*(consume() for _ in range(streams)))
+    return sum(totals) / 2 / SNAC_SAMPLE_RATE, time.perf_counter() - started
+
+
+def measure(decoder, frames, streams, batched):
+    scheduler = SNACDecodeScheduler(decoder) if batched else None
+    model = SimpleNamespace(engine=FakeEngine(frames), build_prompt=lambda description, text: text)
+    pipeline = Maya1VoiceStreamingPipeline(model, decoder, decode_scheduler=scheduler)
+    audio_seconds, wall_seconds = asyncio.run(run_streams(pipeline, streams))
+    mean_batch = scheduler.get_stats()["mean_batch_size"] if scheduler else 1.0
+    return audio_seconds / wall_seconds, mean_batch
+
+
+def measure_decoder(decoder, batch, window_frames=5, repeats=5):
+    """Decoder alone: ``batch`` windows one by one versus one decode_batch call"""
+    windows = [
+        [random.randint(SNAC_MIN_ID, SNAC_MAX_ID) for _ in range(window_frames * SNAC_TOKENS_PER_FRAME)]
+        for _ in range(batch)
+    ]
+    single = min(timeit.repeat(lambda: [decoder.decode(window) for window in windows], number=1, repeat=repeats))
+    batched = min(timeit.repeat(lambda: decoder.decode_batch(windows), number=1, repeat=repeats))
+    return single, batched
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    random.seed(0)
+    decoder, decoder_name = load_decoder()
+    
+    # The pipeline logs every stream; keep the table readable
+    results = []
+    for streams in STREAM_COUNTS:
+        inline, _ = measure(decoder, frames, streams, batched=False)
+        batched, mean_batch = measure(decoder, frames, streams, batched=True)
+        results.append((streams, inline, batched, mean_batch))
+    
+    print(f"\n{decoder_name}: decoder only, 5-frame windows")
+    print(f"{'windows':>8} {'one by one (ms)':>16} {'decode_batch (ms)':>18} {'speedup':>8}")
+    for batch in STREAM_COUNTS:
+        single, batched = measure_decoder(decoder, batch)
+        print(f"{batch:>8} {single * 1000:>16.2f} {batched * 1000:>18.2f} {single / batched:>7.2f}x")
+    
+    print(f"\n{decoder_name}: {frames} frames per stream")
+    print(f"{'streams':>8} {'inline (audio s/s)':>19} {'batched (audio s/s)':>20} {'speedup':>8} {'mean batch':>11}")
+    for streams, inline, batched, mean_batch in results:
+        print(f"{streams:>8} {inline:>19.1f} {batched:>20.1f} {batched / inline:>7.2f}x {mean_batch:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
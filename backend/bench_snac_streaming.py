@@ -0,0 +1,164 @@
+"""
+Benchmark for the streaming SNAC decode schemes
+Compares the original sliding window (decode the last 4 frames for every new
+frame, keep samples 2048:4096) with StreamingSNACDecoder at larger hops:
+decoder calls and frames decoded per emitted frame (decoder FLOPs scale with
+the frames decoded), decode time per second of audio, time to first audio in
+frames, and the error against decoding the whole utterance at once
+
+Uses the real SNAC 24kHz decoder on CPU when torch and snac are installed,
+otherwise a NumPy stand-in with a convolutional receptive field (relative
+costs and edge effects only, not real audio quality)
+
+Usage:
+    python bench_snac_streaming.py [frames]
+"""
+
+import random
+import sys
+import time
+import numpy as np
+from maya1_model.vllm_streaming_inference import (
+    SNAC_MAX_ID,
+    SNAC_MIN_ID,
+    SNAC_SAMPLE_RATE,
+    SNAC_SAMPLES_PER_FRAME,
+    SNAC_TOKENS_PER_FRAME,
+    SNACDecoder,
+    StreamingSNACDecoder,
+    unpack_snac_frames
+)
+
+# (label, hop, left context, right context, overlap samples)
+SCHEMES = [
+    ("hop 1, ctx 1/2, crop", 1, 1, 2, 0),
+    ("hop 2, ctx 1/1, xfade 512", 2, 1, 1, 512),
+    ("hop 3, ctx 1/1, xfade 512", 3, 1, 1, 512),
+    ("hop 4, ctx 1/1, xfade 512", 4, 1, 1, 512),
+    ("hop 3, ctx 0/1, xfade 512", 3, 0, 1, 512),
+]
+
+
+class SyntheticSNACDecoder:
+    """NumPy stand-in for SNAC: level codes upsampled and smoothed by a 6144-tap kernel"""
+    
+    def __init__(self, receptive_samples=3072):
+        self.kernel = np.hanning(2 * receptive_samples + 1)
+        self.kernel /= self.kernel.sum()
+    
+    def decode(self, tokens):
+        return self.decode_batch([tokens])[0]
+    
+    def decode_batch(self, windows):
+        """Same-length windows are convolved together with one batched FFT"""
+        results = [None] * len(windows)
+        groups = {}
+        for index, tokens in enumerate(windows):
+            l1, l2, l3 = unpack_snac_frames(tokens)
+            if l1.size:
+                excitation = (
+                    np.repeat(l1 / 4095 - 0.5, SNAC_SAMPLES_PER_FRAME)
+                    + 0.5 * np.repeat(l2 / 4095 - 0.5, SNAC_SAMPLES_PER_FRAME // 2)
+                    + 0.25 * np.repeat(l3 / 4095 - 0.5, SNAC_SAMPLES_PER_FRAME // 4)
+                )
+                groups.setdefault(l1.size, []).append((index, excitation))
+        
+        for members in groups.values():
+            signals = np.stack([excitation for _, excitation in members])
+            length = signals.shape[1]
+            size = 1 << (length + len(self.kernel) - 2).bit_length()
+            spectrum = np.fft.rfft(signals, size) * np.fft.rfft(self.kernel, size)
+            # Zero padding at the window edges plays the role of missing context
+            start = (len(self.kernel) - 1) // 2
+            audio = np.fft.irfft(spectrum, size)[:, start:start + length].astype(np.float32)
+            for row, (index, _) in enumerate(members):
+                results[index] = audio[row]
+        return results
+
+
+class CountingDecoder:
+    """Wraps a decoder, timing calls and counting decoded frames"""
+    
+    def __init__(self, decoder):
+        self.decoder = decoder
+        self.calls = 0
+        self.frames = 0
+        self.seconds = 0.0
+    
+    def decode(self, tokens):
+        started = time.perf_counter()
+        audio = self.decoder.decode(tokens)
+        self.seconds += time.perf_counter() - started
+        self.calls += 1
+        self.frames += len(tokens) // SNAC_TOKENS_PER_FRAME
+        return audio
+
+
+def load_decoder():
+    try:
+        return SNACDecoder(device="cpu"), "SNAC 24kHz (CPU)"
+    except Exception as e:
+        print(f"(SNAC unavailable: {e}; using the NumPy stand-in decoder)")
+        return SyntheticSNACDecoder(), "NumPy stand-in"
+
+
+def run_original(decoder, tokens):
+    """The pipeline's original loop: last 28 tokens every 7, samples 2048:4096"""
+    chunks = []
+    first_at = None
+    for size in range(SNAC_TOKENS_PER_FRAME, len(tokens) + 1, SNAC_TOKENS_PER_FRAME):
+        if size > 27:
+            audio = decoder.decode(tokens[size - 28:size])
+            chunks.append(audio[2048:4096])
+            first_at = first_at or size // SNAC_TOKENS_PER_FRAME
+    # Emits frames 1 .. n-3
+    return np.concatenate(chunks), 1, first_at
+
+
+def run_streaming(decoder, tokens, hop, left, right, overlap):
+    stream = StreamingSNACDecoder(decoder, hop, left, right, overlap, initial_tokens=len(tokens))
+    chunks = []
+    first_at = None
+    for index, token in enumerate(tokens):
+        audio = stream.push(token)
+        if audio is not None:
+            chunks.append(audio)
+            first_at = first_at or (index + 1) // SNAC_TOKENS_PER_FRAME
+    chunks.append(stream.flush())
+    return np.concatenate(chunks), 0, first_at
+
+
+def snr_db(reference, audio):
+    noise = np.sum((reference - audio) ** 2)
+    return float("inf") if noise == 0 else 10 * np.log10(np.sum(reference ** 2) / noise)
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 285
+    random.seed(0)
+    tokens = [random.randint(SNAC_MIN_ID, SNAC_MAX_ID) for _ in range(frames * SNAC_TOKENS_PER_FRAME)]
+    decoder, decoder_name = load_decoder()
+    reference = decoder.decode(tokens)
+    audio_seconds = frames * SNAC_SAMPLES_PER_FRAME / SNAC_SAMPLE_RATE
+    
+    print(f"\n{decoder_name}: {frames} frames ({audio_seconds:.1f}s of audio)")
+    print(f"{'scheme':<28} {'calls':>6} {'frames/out':>11} {'ms per s audio':>15} "
+          f"{'first audio':>12} {'coverage':>9} {'SNR (dB)':>9}")
+    
+    runs = [("original sliding window", lambda d: run_original(d, tokens))]
+    for label, hop, left, right, overlap in SCHEMES:
+        runs.append((label, lambda d, c=(hop, left, right, overlap): run_streaming(d, tokens, *c)))
+    
+    for label, run in runs:
+        counting = CountingDecoder(decoder)
+        audio, first_frame, first_at = run(counting)
+        start = first_frame * SNAC_SAMPLES_PER_FRAME
+        expected = reference[start:start + len(audio)]
+        emitted_frames = len(audio) / SNAC_SAMPLES_PER_FRAME
+        print(f"{label:<28} {counting.calls:>6} {counting.frames / emitted_frames:>11.2f} "
+              f"{counting.seconds * 1000 / audio_seconds:>15.1f} {f'{first_at} frames':>12} "
+              f"{emitted_frames / frames:>8.0%} {snr_db(expected, audio):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Microbenchmark for SNAC frame unpacking
+Checks that the vectorized unpack_snac_frames matches the original per-frame
+loop exactly, then times both across frame counts (a streaming window is 4
+frames, DEFAULT_MAX_TOKENS is about 285)
+
+The "from ndarray" column is the streaming hot path: StreamingSNACDecoder
+passes views of its int64 token buffer. For Python lists the conversion to
+an array dominates, so lists of fewer than about 8 frames unpack slower than
+the loop (e.g. 0.7-0.8x at 4 frames); only the ndarray path is a win there.
+
+Usage:
+    python bench_snac_unpack.py
+"""
+
+import random
+import timeit
+import numpy as np
+from maya1_model.vllm_streaming_inference import (
+    CODE_END_TOKEN_ID,
+    CODE_TOKEN_OFFSET,
+    SNAC_MAX_ID,
+    SNAC_MIN_ID,
+    SNAC_TOKENS_PER_FRAME,
+    torch,
+    unpack_snac_frames
+)
+
+FRAME_COUNTS = [4, 16, 64, 285, 1024]
+
+
+def unpack_loop(vocab_ids):
+    """The original per-frame implementation, kept as the reference"""
+    if vocab_ids and vocab_ids[-1] == CODE_END_TOKEN_ID:
+        vocab_ids = vocab_ids[:-1]
+    frames = len(vocab_ids) // SNAC_TOKENS_PER_FRAME
+    vocab_ids = vocab_ids[:frames * SNAC_TOKENS_PER_FRAME]
+    if frames == 0:
+        return [[], [], []]
+    
+    l1, l2, l3 = [], [], []
+    for i in range(frames):
+        slots = vocab_ids[i*7:(i+1)*7]
+        l1.append((slots[0] - CODE_TOKEN_OFFSET) % 4096)
+        l2.extend([
+            (slots[1] - CODE_TOKEN_OFFSET) % 4096,
+            (slots[4] - CODE_TOKEN_OFFSET) % 4096,
+        ])
+        l3.extend([
+            (slots[2] - CODE_TOKEN_OFFSET) % 4096,
+            (slots[3] - CODE_TOKEN_OFFSET) % 4096,
+            (slots[5] - CODE_TOKEN_OFFSET) % 4096,
+            (slots[6] - CODE_TOKEN_OFFSET) % 4096,
+        ])
+    return [l1, l2, l3]
+
+
+def random_tokens(frames, with_eos=True):
+    tokens = [random.randint(SNAC_MIN_ID, SNAC_MAX_ID) for _ in range(frames * SNAC_TOKENS_PER_FRAME)]
+    return tokens + [CODE_END_TOKEN_ID] if with_eos else tokens
+
+
+def check_equivalence():
+    """Compare both implementations on random, partial-frame and EOS-terminated inputs"""
+    cases = [[], [CODE_END_TOKEN_ID], random_tokens(1, False)[:5]]
+    cases += [random_tokens(frames, with_eos) for frames in (1, 4, 7, 285) for with_eos in (False, True)]
+    cases += [random_tokens(5, False) + [SNAC_MIN_ID] * 3]
+    for tokens in cases:
+        expected = unpack_loop(tokens)
+        actual = unpack_snac_frames(tokens)
+        for level, (want, got) in enumerate(zip(expected, actual)):
+            assert got.dtype == np.int64, f"L{level + 1} dtype {got.dtype}"
+            assert got.tolist() == want, f"L{level + 1} mismatch for {len(tokens)} tokens"
+    print(f"✓ Vectorized unpack matches the loop on {len(cases)} inputs")
+
+
+def bench():
+    print(f"\n{'frames':>8} {'loop (µs)':>12} {'vectorized (µs)':>16} {'speedup':>9} {'from ndarray (µs)':>18}")
+    for frames in FRAME_COUNTS:
+        tokens = random_tokens(frames)
+        array_tokens = np.asarray(tokens, dtype=np.int64)
+        loop_us = _time_us(lambda: unpack_loop(tokens), frames)
+        fast_us = _time_us(lambda: unpack_snac_frames(tokens), frames)
+        array_us = _time_us(lambda: unpack_snac_frames(array_tokens), frames)
+        print(f"{frames:>8} {loop_us:>12.1f} {fast_us:>16.1f} {loop_us / fast_us:>8.1f}x {array_us:>18.1f}")
+    
+    if torch is None:
+        print("\n(torch not installed: skipping the unpack + tensor construction comparison)")
+        return
+    
+    # What decode() actually pays before the SNAC forward pass
+    print(f"\n{'frames':>8} {'loop+tensor (µs)':>17} {'vectorized+from_numpy (µs)':>27} {'speedup':>9}")
+    for frames in FRAME_COUNTS:
+        tokens = random_tokens(frames)
+        old_us = _time_us(lambda: [torch.tensor(level, dtype=torch.long).unsqueeze(0)
+                                   for level in unpack_loop(tokens)], frames)
+        new_us = _time_us(lambda: [torch.from_numpy(level).unsqueeze(0)
+                                   for level in unpack_snac_frames(tokens)], frames)
+        print(f"{frames:>8} {old_us:>17.1f} {new_us:>27.1f} {old_us / new_us:>8.1f}x")
+
+
+def _time_us(fn, frames):
+    repeats = max(20, 20000 // frames)
+    return min(timeit.repeat(fn, number=repeats, repeat=5)) / repeats * 1e6
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    check_equivalence()
+    bench()
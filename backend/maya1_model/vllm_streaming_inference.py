@@ -7,6 +7,11 @@ Demonstrates streaming audio generation with sliding window approach for smooth
 Requirements:
     pip install vllm transformers torch snac numpy
 
+vLLM, transformers, torch and snac are optional imports: the streaming
+pipeline can also be driven by any engine with the same
+``generate(prompt, sampling_params, request_id)`` interface (e.g. a fake
+engine in tests) on machines without the GPU stack.
+
 Usage:
     python vllm_streaming_inference.py
 
@@ -14,13 +19,42 @@ Author: Maya-1-Voice Team
 License: MIT
 """
 
-import torch
 import numpy as np
 import asyncio
-from typing import List, Optional, AsyncGenerator
-from transformers import AutoTokenizer
-from vllm import AsyncLLMEngine, AsyncEngineArgs, SamplingParams
-from snac import SNAC
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import List, NamedTuple, Optional, AsyncGenerator
+
+try:
+    import torch
+except ImportError:  # Needed for SNAC decoding and the vLLM engine only
+    torch = None
+
+try:
+    from transformers import AutoTokenizer
+except ImportError:
+    AutoTokenizer = None
+
+try:
+    from vllm import AsyncLLMEngine, AsyncEngineArgs, SamplingParams
+except ImportError:
+    AsyncLLMEngine = AsyncEngineArgs = SamplingParams = None
+
+try:
+    from vllm.v1.sample.logits_processor import LogitsProcessor as _V1LogitsProcessor
+    HAS_V1_LOGITS_PROCESSORS = True
+except ImportError:  # Older vLLM (per-request processors) or no vLLM at all
+    _V1LogitsProcessor = object
+    HAS_V1_LOGITS_PROCESSORS = False
+
+try:
+    from snac import SNAC
+except ImportError:
+    SNAC = None
 
 
 # ============================================================================
@@ -48,11 +82,87 @@ DEFAULT_MAX_TOKENS = 2000
 DEFAULT_MIN_TOKENS = 28  # At least 4 SNAC frames
 DEFAULT_REPETITION_PENALTY = 1.1
 
+# Streaming decode (see StreamingSNACDecoder). Audio per SNAC frame at 24kHz.
+SNAC_SAMPLES_PER_FRAME = 2048
+DEFAULT_HOP_FRAMES = 3            # Frames emitted per decoder call
+DEFAULT_LEFT_CONTEXT_FRAMES = 1   # Already-emitted frames decoded again for context
+DEFAULT_RIGHT_CONTEXT_FRAMES = 1  # Look-ahead frames decoded but not yet emitted
+DEFAULT_OVERLAP_SAMPLES = 512     # Crossfade between consecutive windows
+
+# Cross-stream batched decoding (see SNACDecodeScheduler)
+DEFAULT_DECODE_TICK_SECONDS = 0.002
+DEFAULT_DECODE_MAX_BATCH = 32
+
 
 # ============================================================================
 # SNAC DECODER
 # ============================================================================
 
+# Frame slots feeding each level, in the order they appear within a frame's
+# block of that level (L2 has 2 codes per frame, L3 has 4)
+LEVEL_SLOTS = ([0], [1, 4], [2, 3, 5, 6])
+
+
+@lru_cache(maxsize=64)
+def _frame_gather_index(frames: int) -> np.ndarray:
+    """
+    Flat token positions that lay out ``frames`` frames as [L1 | L2 | L3].
+    
+    Cached per frame count: a streaming window always has the same size,
+    so the index is built once and every later unpack is a single take.
+    """
+    starts = np.arange(frames, dtype=np.int64)[:, None] * SNAC_TOKENS_PER_FRAME
+    return np.concatenate([(starts + slots).reshape(-1) for slots in LEVEL_SLOTS])
+
+
+def unpack_snac_frames(vocab_ids) -> List[np.ndarray]:
+    """
+    Unpack 7-token SNAC frames to 3 hierarchical levels.
+    
+    This is the EXACT INVERSE of training preprocessing.
+    
+    Frame structure (7 tokens per frame):
+    [slot0, slot1, slot2, slot3, slot4, slot5, slot6]
+    
+    Unpacking to [L1, L2, L3]:
+    - slot0 → L1[i]       (coarse: 1x rate)
+    - slot1 → L2[2*i]     (medium: 2x rate, even)
+    - slot2 → L3[4*i+0]   (fine: 4x rate)
+    - slot3 → L3[4*i+1]
+    - slot4 → L2[2*i+1]   (medium: odd)
+    - slot5 → L3[4*i+2]
+    - slot6 → L3[4*i+3]
+    
+    Done as array operations instead of a per-frame loop: one gather with
+    a cached index writes all three levels into a single buffer, the code
+    arithmetic runs in place on it, and the levels are contiguous views.
+    The win is on ndarray input, which is what StreamingSNACDecoder hands
+    out (views of its token buffer). A Python list is converted first, and
+    below about 8 frames that conversion costs more than the old loop saved
+    (see bench_snac_unpack.py); such short list inputs only come from
+    one-off decode() calls, where the SNAC forward pass dominates.
+    
+    Args:
+        vocab_ids: SNAC token IDs (list or array), optionally ending in EOS
+    
+    Returns:
+        [L1, L2, L3] int64 arrays with n, 2n and 4n elements
+    """
+    # Remove EOS token if present, ignore an incomplete trailing frame
+    size = len(vocab_ids)
+    if size and vocab_ids[-1] == CODE_END_TOKEN_ID:
+        size -= 1
+    frames = size // SNAC_TOKENS_PER_FRAME
+    
+    codes = np.asarray(vocab_ids, dtype=np.int64).take(_frame_gather_index(frames))
+    
+    # Subtract offset and mod 4096 to get original SNAC codes (4096 is a
+    # power of two, so the floor modulo is a bit mask)
+    codes -= CODE_TOKEN_OFFSET
+    codes &= 4095
+    return [codes[:frames], codes[frames:3 * frames], codes[3 * frames:]]
+
+
 class SNACDecoder:
     """
     Decodes SNAC tokens (7-token frames) to audio waveforms.
@@ -63,6 +173,8 @@ class SNACDecoder:
     
     def __init__(self, device: str = "cuda"):
         """Initialize SNAC decoder with 24kHz model."""
+        if SNAC is None or torch is None:
+            raise ImportError("SNAC decoding requires torch and snac: pip install torch snac")
         self.device = device
         print(f"🎵 Loading SNAC 24kHz model to {device}...")
         self.snac_model = SNAC.from_pretrained(SNAC_MODEL_NAME).eval().to(device)
@@ -72,19 +184,8 @@ class SNACDecoder:
         """
         Unpack 7-token SNAC frames to 3 hierarchical levels.
         
-        This is the EXACT INVERSE of training preprocessing.
-        
-        Frame structure (7 tokens per frame):
-        [slot0, slot1, slot2, slot3, slot4, slot5, slot6]
-        
-        Unpacking to [L1, L2, L3]:
-        - slot0 → L1[i]       (coarse: 1x rate)
-        - slot1 → L2[2*i]     (medium: 2x rate, even)
-        - slot2 → L3[4*i+0]   (fine: 4x rate)
-        - slot3 → L3[4*i+1]
-        - slot4 → L2[2*i+1]   (medium: odd)
-        - slot5 → L3[4*i+2]
-        - slot6 → L3[4*i+3]
+        List-returning wrapper around unpack_snac_frames (see there for the
+        frame layout).
         
         Args:
             vocab_ids: List of SNAC token IDs (128266-156937), length divisible by 7
@@ -92,38 +193,8 @@ class SNACDecoder:
         Returns:
             [L1, L2, L3] where L1=n, L2=2n, L3=4n elements
         """
-        # Remove EOS token if present
-        if vocab_ids and vocab_ids[-1] == CODE_END_TOKEN_ID:
-            vocab_ids = vocab_ids[:-1]
-        
-        # Ensure complete frames
-        frames = len(vocab_ids) // SNAC_TOKENS_PER_FRAME
-        vocab_ids = vocab_ids[:frames * SNAC_TOKENS_PER_FRAME]
-        
-        if frames == 0:
-            return [[], [], []]
-        
-        l1, l2, l3 = [], [], []
-        
-        for i in range(frames):
-            slots = vocab_ids[i*7:(i+1)*7]
-            
-            # Subtract offset and mod 4096 to get original SNAC codes
-            l1.append((slots[0] - CODE_TOKEN_OFFSET) % 4096)
-            l2.extend([
-                (slots[1] - CODE_TOKEN_OFFSET) % 4096,  # Even
-                (slots[4] - CODE_TOKEN_OFFSET) % 4096,  # Odd
-            ])
-            l3.extend([
-                (slots[2] - CODE_TOKEN_OFFSET) % 4096,
-                (slots[3] - CODE_TOKEN_OFFSET) % 4096,
-                (slots[5] - CODE_TOKEN_OFFSET) % 4096,
-                (slots[6] - CODE_TOKEN_OFFSET) % 4096,
-            ])
-        
-        return [l1, l2, l3]
-    
-    @torch.inference_mode()
+        return [level.tolist() for level in unpack_snac_frames(vocab_ids)]
+    
     def decode(
         self, 
         snac_tokens: List[int], 
@@ -144,23 +215,24 @@ class SNACDecoder:
             return None
         
         # Unpack to 3 hierarchical levels
-        levels = self.unpack_snac_from_7(snac_tokens)
+        levels = unpack_snac_frames(snac_tokens)
         
-        if not levels[0]:
+        if not levels[0].size:
             return None
         
-        # Convert to tensors
-        codes = [
-            torch.tensor(level, dtype=torch.long, device=self.device).unsqueeze(0)
-            for level in levels
-        ]
-        
-        # Decode through SNAC quantizer + decoder
-        z_q = self.snac_model.quantizer.from_codes(codes)
-        audio = self.snac_model.decoder(z_q)
-        
-        # Extract audio: [batch, 1, samples] → [samples]
-        audio = audio[0, 0].cpu().numpy()
+        with torch.inference_mode():
+            # Wrap the arrays without copying; only the device transfer copies
+            codes = [
+                torch.from_numpy(level).unsqueeze(0).to(self.device)
+                for level in levels
+            ]
+            
+            # Decode through SNAC quantizer + decoder
+            z_q = self.snac_model.quantizer.from_codes(codes)
+            audio = self.snac_model.decoder(z_q)
+            
+            # Extract audio: [batch, 1, samples] → [samples]
+            audio = audio[0, 0].cpu().numpy()
         
         # Sliding window mode: keep middle 2048 samples only
         # This eliminates popping/cracking in streaming by overlapping windows
@@ -169,6 +241,39 @@ class SNACDecoder:
         
         return audio
     
+    def decode_batch(self, windows: List) -> List[Optional[np.ndarray]]:
+        """
+        Decode several token windows with batched forward passes.
+        
+        Windows with the same number of frames (the steady state of every
+        stream with the same hop) are stacked into one ``from_codes`` and
+        ``decoder`` call; windows of other lengths form their own batches.
+        
+        Args:
+            windows: SNAC token sequences (lists or arrays)
+        
+        Returns:
+            One float32 waveform (or None, as decode() would) per window
+        """
+        results = [None] * len(windows)
+        groups = {}
+        for index, tokens in enumerate(windows):
+            levels = unpack_snac_frames(tokens)
+            if levels[0].size:
+                groups.setdefault(levels[0].size, []).append((index, levels))
+        
+        with torch.inference_mode():
+            for members in groups.values():
+                codes = [
+                    torch.from_numpy(np.stack([levels[level] for _, levels in members])).to(self.device)
+                    for level in range(3)
+                ]
+                z_q = self.snac_model.quantizer.from_codes(codes)
+                audio = self.snac_model.decoder(z_q)[:, 0].cpu().numpy()
+                for row, (index, _) in enumerate(members):
+                    results[index] = audio[row]
+        return results
+    
     def decode_to_bytes(
         self, 
         snac_tokens: List[int], 
@@ -194,10 +299,326 @@ class SNACDecoder:
         return audio_int16.tobytes()
 
 
+class DecodeWindow(NamedTuple):
+    """Tokens to decode for one streaming hop and the audio range it emits."""
+    tokens: np.ndarray  # SNAC tokens of the whole window, context included
+    offset: int         # First emitted sample within the decoded audio
+    length: int         # Emitted samples (crossfade look-ahead not included)
+    final: bool         # Last window of the stream (no crossfade tail kept)
+
+
+class StreamingSNACDecoder:
+    """
+    Incremental decoder for a growing SNAC token stream.
+    
+    Every ``hop_frames`` new frames, decodes one window made of
+    ``left_context_frames`` already-emitted frames, the ``hop_frames`` frames
+    to emit and ``right_context_frames`` of look-ahead, so the emitted audio
+    never sits at a window edge where the convolutional decoder lacks
+    context. The first ``overlap_samples`` of each hop are crossfaded
+    (overlap-add with complementary linear ramps) with the previous window's
+    prediction of the same samples, which removes clicks at hop boundaries.
+    
+    Decoder work per emitted frame is (left + hop + right) / hop frames:
+    the original sliding window (hop 1, left 1, right 2, no crossfade)
+    decodes every frame 4 times, hop 3 with one frame of context on each
+    side decodes 5 frames per 3 emitted. Time to first audio stays at
+    hop + right frames. flush() emits the frames still held back at the end
+    of the stream.
+    """
+    
+    def __init__(
+        self,
+        snac_decoder: SNACDecoder,
+        hop_frames: int = DEFAULT_HOP_FRAMES,
+        left_context_frames: int = DEFAULT_LEFT_CONTEXT_FRAMES,
+        right_context_frames: int = DEFAULT_RIGHT_CONTEXT_FRAMES,
+        overlap_samples: int = DEFAULT_OVERLAP_SAMPLES,
+        initial_tokens: int = DEFAULT_MAX_TOKENS,
+    ):
+        """
+        Args:
+            snac_decoder: Provides ``decode(tokens)`` returning float32 audio
+                (SNAC_SAMPLES_PER_FRAME samples per frame)
+            hop_frames: Frames emitted per decoder call (>= 1)
+            left_context_frames: Emitted frames re-decoded as left context
+            right_context_frames: Look-ahead frames per window
+            overlap_samples: Crossfade length, at most the right context
+            initial_tokens: Initial token buffer capacity (grows as needed)
+        """
+        if hop_frames < 1:
+            raise ValueError("hop_frames must be at least 1")
+        if overlap_samples > right_context_frames * SNAC_SAMPLES_PER_FRAME:
+            raise ValueError("overlap_samples cannot exceed the right context")
+        
+        self.snac_decoder = snac_decoder
+        self.hop_frames = hop_frames
+        self.left_context_frames = left_context_frames
+        self.right_context_frames = right_context_frames
+        self.overlap_samples = overlap_samples
+        
+        ramp = (np.arange(overlap_samples, dtype=np.float32) + 0.5) / max(overlap_samples, 1)
+        self._fade_in = ramp
+        self._fade_out = 1.0 - ramp
+        
+        self._tokens = np.empty(max(initial_tokens, SNAC_TOKENS_PER_FRAME), dtype=np.int64)
+        self._size = 0
+        self._scheduled_frames = 0  # Frames handed out in decode windows
+        self._tail = None  # Previous window's audio for the first overlap samples of the next hop
+        self.decoder_calls = 0
+        self.decoded_frames = 0
+    
+    def push(self, token_id: int) -> Optional[np.ndarray]:
+        """
+        Add one SNAC token, decoding synchronously once a hop is ready.
+        
+        Returns:
+            Newly final float32 audio (hop_frames frames), or None
+        """
+        window = self.append(token_id)
+        if window is None:
+            return None
+        return self.complete(window, self.snac_decoder.decode(window.tokens))
+    
+    def flush(self) -> Optional[np.ndarray]:
+        """Emit every complete frame not emitted yet (call once at end of stream)."""
+        window = self.final_window()
+        if window is None:
+            return None
+        return self.complete(window, self.snac_decoder.decode(window.tokens))
+    
+    def append(self, token_id: int) -> Optional[DecodeWindow]:
+        """
+        Add one SNAC token without decoding.
+        
+        For callers that decode elsewhere (e.g. a batched scheduler): the
+        returned window's tokens are decoded and the audio handed to
+        complete(). Windows must be completed in the order they are returned.
+        
+        Returns:
+            The window to decode once a hop is ready, else None
+        """
+        if self._size == len(self._tokens):
+            self._tokens = np.concatenate([self._tokens, np.empty_like(self._tokens)])
+        self._tokens[self._size] = token_id
+        self._size += 1
+        
+        if self._size % SNAC_TOKENS_PER_FRAME:
+            return None
+        frames = self._size // SNAC_TOKENS_PER_FRAME
+        if frames - self._scheduled_frames < self.hop_frames + self.right_context_frames:
+            return None
+        return self._window(self.hop_frames, frames)
+    
+    def final_window(self) -> Optional[DecodeWindow]:
+        """The window covering the frames still held back at end of stream, if any."""
+        frames = self._size // SNAC_TOKENS_PER_FRAME
+        if frames <= self._scheduled_frames:
+            return None
+        return self._window(frames - self._scheduled_frames, frames, final=True)
+    
+    def _window(self, count: int, end_frame: int, final: bool = False) -> DecodeWindow:
+        start_frame = max(0, self._scheduled_frames - self.left_context_frames)
+        offset = (self._scheduled_frames - start_frame) * SNAC_SAMPLES_PER_FRAME
+        self._scheduled_frames += count
+        self.decoder_calls += 1
+        self.decoded_frames += end_frame - start_frame
+        return DecodeWindow(
+            tokens=self._tokens[start_frame * SNAC_TOKENS_PER_FRAME:end_frame * SNAC_TOKENS_PER_FRAME],
+            offset=offset,
+            length=count * SNAC_SAMPLES_PER_FRAME,
+            final=final,
+        )
+    
+    def complete(self, window: DecodeWindow, audio: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Turn a decoded window into output audio, crossfading with the previous one.
+        
+        Returns:
+            The window's new float32 audio, or None if decoding produced nothing
+        """
+        if audio is None:
+            return None
+        
+        overlap = 0 if window.final else self.overlap_samples
+        segment = np.array(audio[window.offset:window.offset + window.length + overlap], dtype=np.float32)
+        
+        if self._tail is not None:
+            n = min(len(self._tail), len(segment))
+            segment[:n] = self._tail[:n] * self._fade_out[:n] + segment[:n] * self._fade_in[:n]
+        
+        self._tail = segment[window.length:] if overlap else None
+        return segment[:window.length]
+
+
+class SNACDecodeScheduler:
+    """
+    Shared decode scheduler batching windows across concurrent streams.
+    
+    Streams on one event loop await decode(); windows submitted within
+    ``tick_seconds`` of the first one (or until ``max_batch`` are waiting)
+    are decoded together by SNACDecoder.decode_batch on a worker thread, so
+    many listeners cost a few batched forward passes instead of many
+    batch-size-1 passes, and the event loop keeps streaming tokens while the
+    decoder runs. Windows arriving during a decode form the next batch.
+    
+    Streams register with open_stream()/close_stream(); once every open
+    stream is waiting, nobody else can submit, so the batch goes out without
+    waiting for the rest of the tick.
+    """
+    
+    def __init__(
+        self,
+        snac_decoder: SNACDecoder,
+        tick_seconds: float = DEFAULT_DECODE_TICK_SECONDS,
+        max_batch: int = DEFAULT_DECODE_MAX_BATCH,
+    ):
+        """
+        Args:
+            snac_decoder: Provides ``decode_batch(windows)``
+            tick_seconds: How long the first window waits for company
+            max_batch: Windows after which a batch is decoded immediately
+        """
+        self.snac_decoder = snac_decoder
+        self.tick_seconds = tick_seconds
+        self.max_batch = max_batch
+        
+        # One decode at a time: a batched forward pass already uses every core
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snac-decode")
+        self._pending = []  # (tokens, future) waiting for the next batch
+        self._timer = None
+        self._open_streams = 0
+        self._stats = {"windows": 0, "batches": 0, "max_batch_seen": 0, "decode_seconds": 0.0}
+    
+    def open_stream(self):
+        """Register a stream that will submit windows."""
+        self._open_streams += 1
+    
+    def close_stream(self):
+        """Unregister a finished stream (may release a batch it was holding up)."""
+        self._open_streams -= 1
+        if self._pending and len(self._pending) >= self._open_streams:
+            self._dispatch(asyncio.get_running_loop())
+    
+    async def decode(self, tokens) -> Optional[np.ndarray]:
+        """Decode one window together with whatever other streams submit meanwhile."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((tokens, future))
+        if len(self._pending) >= min(self.max_batch, max(self._open_streams, 1)):
+            self._dispatch(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.tick_seconds, self._dispatch, loop)
+        return await future
+    
+    def _dispatch(self, loop):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Streams that went away while waiting are dropped from the batch
+        batch = [(tokens, future) for tokens, future in batch if not future.cancelled()]
+        if batch:
+            task = loop.run_in_executor(self._executor, self._decode_batch, [tokens for tokens, _ in batch])
+            task.add_done_callback(lambda done: self._deliver(batch, done))
+    
+    def _decode_batch(self, windows):
+        started = time.perf_counter()
+        results = self.snac_decoder.decode_batch(windows)
+        self._stats["decode_seconds"] += time.perf_counter() - started
+        return results
+    
+    def _deliver(self, batch, done):
+        self._stats["windows"] += len(batch)
+        self._stats["batches"] += 1
+        self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+        error = done.exception()
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[index])
+    
+    def get_stats(self) -> dict:
+        """Windows decoded, batches run and the mean batch size."""
+        stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["mean_batch_size"] = round(stats["windows"] / batches, 2) if batches else 0.0
+        stats["decode_seconds"] = round(stats["decode_seconds"], 3)
+        stats["tick_ms"] = round(self.tick_seconds * 1000, 2)
+        return stats
+
+
+def audio_to_pcm16(audio: np.ndarray) -> bytes:
+    """Convert float32 audio in [-1, 1] to int16 PCM bytes."""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
 # ============================================================================
 # CUSTOM LOGITS PROCESSOR
 # ============================================================================
 
+class AudioVocabularyMask:
+    """
+    Cache of "blocked token" masks for the audio phase.
+    
+    The mask (True for every token except SNAC codes and EOS) depends only
+    on the device and vocabulary size, so it is built once per pair and
+    then applied in place with ``masked_fill_`` instead of allocating a
+    full-vocabulary -inf tensor for every generated token. A boolean mask
+    works for logits of any dtype.
+    """
+    
+    def __init__(self):
+        self._masks = {}
+        self._lock = threading.Lock()
+    
+    def get(self, device, vocab_size: int) -> "torch.Tensor":
+        key = (str(device), vocab_size)
+        mask = self._masks.get(key)
+        if mask is None:
+            with self._lock:
+                mask = self._masks.get(key)
+                if mask is None:
+                    mask = torch.ones(vocab_size, dtype=torch.bool, device=device)
+                    mask[SNAC_MIN_ID:SNAC_MAX_ID + 1] = False  # Allow SNAC codes
+                    mask[CODE_END_TOKEN_ID] = False            # Allow EOS
+                    self._masks[key] = mask
+        return mask
+    
+    def apply_(self, logits: "torch.Tensor") -> "torch.Tensor":
+        """Mask non-audio tokens of a [vocab_size] logits row in place."""
+        return logits.masked_fill_(self.get(logits.device, logits.shape[-1]), float("-inf"))
+
+
+AUDIO_VOCABULARY_MASK = AudioVocabularyMask()
+
+
+class AudioConstraintState:
+    """
+    Per-request SOS tracking.
+    
+    The prompt is checked once when the request starts; after that only
+    tokens generated since the previous step are looked at, so each step
+    costs O(new tokens) instead of rescanning prompt + output.
+    """
+    
+    __slots__ = ("audio_phase", "checked")
+    
+    def __init__(self, prompt_token_ids=()):
+        self.audio_phase = CODE_START_TOKEN_ID in prompt_token_ids
+        self.checked = 0
+    
+    def observe(self, output_token_ids) -> bool:
+        """Update with the request's output so far; True once SOS has been generated."""
+        if not self.audio_phase and len(output_token_ids) > self.checked:
+            self.audio_phase = CODE_START_TOKEN_ID in output_token_ids[self.checked:]
+            self.checked = len(output_token_ids)
+        return self.audio_phase
+
+
 class OnlyAudioAfterSOS:
     """
     Restricts vocabulary to SNAC codes + EOS after SOS token.
@@ -205,17 +626,22 @@ class OnlyAudioAfterSOS:
     This prevents the model from generating text tokens during audio phase,
     which would cause "hallucination" where the model repeats description text
     instead of generating proper audio codes.
+    
+    Per-request logits processor for engines that take
+    ``SamplingParams(logits_processors=[...])`` (vLLM V0). Create one per
+    request: the SOS state lives on the instance. vLLM V1 engines use
+    AudioOnlyLogitsProcessor instead.
     """
     
     def __init__(self):
-        self._seen_sos = False
+        self._state = None
     
     def __call__(
         self,
         prompt_token_ids: List[int],
         generated_token_ids: List[int],
-        logits: torch.Tensor,
-    ) -> torch.Tensor:
+        logits: "torch.Tensor",
+    ) -> "torch.Tensor":
         """
         Apply constraint: after SOS, only allow SNAC codes + EOS.
         
@@ -225,26 +651,83 @@ class OnlyAudioAfterSOS:
             logits: Logits for next token [vocab_size]
         
         Returns:
-            Modified logits with masked tokens
+            The same logits tensor, masked in place once SOS was generated
         """
-        # Check if SOS has been generated
-        if not self._seen_sos:
-            all_token_ids = prompt_token_ids + generated_token_ids
-            if CODE_START_TOKEN_ID in all_token_ids:
-                self._seen_sos = True
-            else:
-                return logits  # No constraint yet
-        
-        # Apply constraint: mask all tokens except SNAC codes + EOS
-        mask = torch.full_like(logits, float('-inf'))
-        mask[SNAC_MIN_ID:SNAC_MAX_ID + 1] = 0  # Allow SNAC codes
-        mask[CODE_END_TOKEN_ID] = 0            # Allow EOS
+        if self._state is None or len(generated_token_ids) < self._state.checked:
+            # First step of a generation: the prompt is checked once, here
+            self._state = AudioConstraintState(prompt_token_ids)
         
-        return logits + mask
+        if self._state.observe(generated_token_ids):
+            AUDIO_VOCABULARY_MASK.apply_(logits)
+        return logits
     
     def reset(self):
         """Reset state for reuse across generations."""
-        self._seen_sos = False
+        self._state = None
+
+
+class AudioOnlyLogitsProcessor(_V1LogitsProcessor):
+    """
+    Batch-level audio constraint for vLLM V1 engines.
+    
+    V1 dropped per-request logits-processor callables; instead one instance
+    per engine is registered through ``logits_processors=[...]`` in the
+    engine arguments and sees the whole persistent batch. State is kept per
+    batch row (an AudioConstraintState plus vLLM's live output-token list)
+    and follows the engine's add/remove/move updates, so concurrent requests
+    never share SOS state. Requests opt out with
+    ``SamplingParams(extra_args={"audio_only": False})``.
+    """
+    
+    def __init__(self, vllm_config=None, device=None, is_pin_memory=False):
+        self.device = device
+        self._rows = {}  # batch index -> (AudioConstraintState, output token ids)
+    
+    def is_argmax_invariant(self) -> bool:
+        # Masking can change the most likely token, so greedy requests need it too
+        return False
+    
+    def update_state(self, batch_update) -> None:
+        """Follow vLLM's batch changes: removals, then additions, then moves."""
+        if batch_update is None:
+            return
+        
+        for index in batch_update.removed:
+            self._rows.pop(index, None)
+        
+        for added in batch_update.added:
+            # (index, params, output_ids) in older V1 releases,
+            # (index, params, prompt_ids, output_ids) in newer ones
+            index, params = added[0], added[1]
+            prompt_ids = added[2] if len(added) > 3 else ()
+            output_ids = added[-1]
+            extra_args = getattr(params, "extra_args", None) or {}
+            if extra_args.get("audio_only", True):
+                self._rows[index] = (AudioConstraintState(prompt_ids or ()), output_ids)
+            else:
+                self._rows.pop(index, None)
+        
+        for source, target, direction in batch_update.moved:
+            moving = self._rows.pop(source, None)
+            if _is_swap(direction):
+                displaced = self._rows.pop(target, None)
+                if displaced is not None:
+                    self._rows[source] = displaced
+            else:
+                self._rows.pop(target, None)
+            if moving is not None:
+                self._rows[target] = moving
+    
+    def apply(self, logits: "torch.Tensor") -> "torch.Tensor":
+        """Mask non-audio tokens in place for every row whose request is past SOS."""
+        for index, (state, output_ids) in self._rows.items():
+            if state.observe(output_ids):
+                AUDIO_VOCABULARY_MASK.apply_(logits[index])
+        return logits
+
+
+def _is_swap(direction) -> bool:
+    return getattr(direction, "name", str(direction)).upper().endswith("SWAP")
 
 
 # ============================================================================
@@ -274,6 +757,8 @@ class Maya1VoiceModel:
             max_model_len: Maximum sequence length
             gpu_memory_utilization: GPU memory fraction to use (0.0-1.0)
         """
+        if AsyncLLMEngine is None or AutoTokenizer is None:
+            raise ImportError("Maya1VoiceModel requires vllm and transformers: pip install vllm transformers")
         self.model_path = model_path
         
         print(f"🚀 Initializing Maya-1-Voice Model")
@@ -290,6 +775,13 @@ class Maya1VoiceModel:
         
         # Initialize VLLM async engine
         print(f"🔧 Initializing VLLM engine...")
+        # Keep generation on audio tokens after SOS: V1 engines register one
+        # batch-level processor, older engines get one callable per request
+        extra_engine_args = {}
+        if HAS_V1_LOGITS_PROCESSORS:
+            extra_engine_args["logits_processors"] = [AudioOnlyLogitsProcessor]
+        self.per_request_logits_processors = not HAS_V1_LOGITS_PROCESSORS
+        
         engine_args = AsyncEngineArgs(
             model=model_path,
             tokenizer=model_path,
@@ -297,6 +789,7 @@ class Maya1VoiceModel:
             max_model_len=max_model_len,
             gpu_memory_utilization=gpu_memory_utilization,
             trust_remote_code=True,
+            **extra_engine_args,
         )
         
         self.engine = AsyncLLMEngine.from_engine_args(engine_args)
@@ -331,22 +824,75 @@ class Maya1VoiceModel:
 # STREAMING PIPELINE
 # ============================================================================
 
+def make_sampling_params(**kwargs):
+    """
+    Build sampling parameters for the generation engine.
+    
+    Returns vLLM's SamplingParams when vLLM is installed, otherwise a plain
+    namespace with the same attributes for engines that only read them.
+    """
+    if SamplingParams is None:
+        return SimpleNamespace(**kwargs)
+    return SamplingParams(**kwargs)
+
+
 class Maya1VoiceStreamingPipeline:
     """
-    Streaming TTS pipeline using sliding window approach.
+    Streaming TTS pipeline using overlapping decode windows.
     
     This generates smooth audio by:
     1. Streaming tokens from VLLM as they're generated
-    2. Every 7 tokens, decoding the last 28 tokens (4 frames) - sliding window
-    3. Keeping only middle 2048 samples from each decode
-    4. Creating natural overlap between chunks for artifact-free playback
+    2. Every ``hop_frames`` SNAC frames, decoding a window with one frame of
+       context on each side (StreamingSNACDecoder)
+    3. Crossfading consecutive windows with overlap-add
+    4. Flushing the held-back look-ahead frames when generation ends
+    
+    hop_frames=1, left_context_frames=1, right_context_frames=2 and
+    overlap_samples=0 reproduce the original scheme (decode the last 4
+    frames every 7 tokens, keep samples 2048:4096).
     """
     
-    def __init__(self, model: Maya1VoiceModel, snac_decoder: SNACDecoder):
-        """Initialize streaming pipeline."""
+    def __init__(
+        self,
+        model: Maya1VoiceModel,
+        snac_decoder: SNACDecoder,
+        hop_frames: int = DEFAULT_HOP_FRAMES,
+        left_context_frames: int = DEFAULT_LEFT_CONTEXT_FRAMES,
+        right_context_frames: int = DEFAULT_RIGHT_CONTEXT_FRAMES,
+        overlap_samples: int = DEFAULT_OVERLAP_SAMPLES,
+        decode_scheduler: Optional[SNACDecodeScheduler] = None,
+    ):
+        """
+        Initialize streaming pipeline.
+        
+        Args:
+            model: Provides ``build_prompt(description, text)`` and an
+                ``engine`` whose async ``generate`` yields vLLM-style outputs
+                (``output.outputs[0].token_ids`` holding all tokens so far)
+            snac_decoder: Provides ``decode(tokens)`` returning float32 audio
+            hop_frames, left_context_frames, right_context_frames,
+            overlap_samples: Streaming decode settings (see StreamingSNACDecoder)
+            decode_scheduler: Optional shared scheduler batching decodes across
+                concurrent streams; without one each stream decodes inline
+        """
         self.model = model
         self.snac_decoder = snac_decoder
-        print(f"🌊 Maya-1-Voice Streaming Pipeline initialized")
+        self.decode_scheduler = decode_scheduler
+        self.decode_settings = dict(
+            hop_frames=hop_frames,
+            left_context_frames=left_context_frames,
+            right_context_frames=right_context_frames,
+            overlap_samples=overlap_samples,
+        )
+        # Validate the settings once up front rather than on the first request
+        StreamingSNACDecoder(snac_decoder, initial_tokens=0, **self.decode_settings)
+        print(f"🌊 Maya-1-Voice Streaming Pipeline initialized (hop {hop_frames} frames)")
+    
+    async def _decode(self, tokens) -> Optional[np.ndarray]:
+        """Decode one window, batched with other streams when a scheduler is set."""
+        if self.decode_scheduler is not None:
+            return await self.decode_scheduler.decode(tokens)
+        return self.snac_decoder.decode(tokens)
     
     async def generate_speech_stream(
         self,
@@ -356,6 +902,7 @@ class Maya1VoiceStreamingPipeline:
         top_p: float = DEFAULT_TOP_P,
         max_tokens: int = DEFAULT_MAX_TOKENS,
         repetition_penalty: float = DEFAULT_REPETITION_PENALTY,
+        seed: Optional[int] = None,
     ) -> AsyncGenerator[bytes, None]:
         """
         Generate speech audio with streaming.
@@ -367,6 +914,7 @@ class Maya1VoiceStreamingPipeline:
             top_p: Nucleus sampling
             max_tokens: Max SNAC tokens to generate
             repetition_penalty: Prevent repetition loops
+            seed: Per-request sampling seed for reproducible audio
         
         Yields:
             Audio chunks as bytes (int16 PCM, 24kHz mono)
@@ -378,26 +926,34 @@ class Maya1VoiceStreamingPipeline:
         # Build prompt
         prompt = self.model.build_prompt(description, text)
         
-        # Configure sampling (removed custom logits processor for V1 compatibility)
-        sampling_params = SamplingParams(
+        # Configure sampling. The audio-only constraint is engine-level on
+        # vLLM V1 (AudioOnlyLogitsProcessor); older engines take it per request.
+        extra_sampling = {}
+        if getattr(self.model, "per_request_logits_processors", False):
+            extra_sampling["logits_processors"] = [OnlyAudioAfterSOS()]
+        sampling_params = make_sampling_params(
             temperature=temperature,
             top_p=top_p,
             max_tokens=max_tokens,
             min_tokens=DEFAULT_MIN_TOKENS,
             repetition_penalty=repetition_penalty,
             stop_token_ids=[CODE_END_TOKEN_ID],  # Stop on audio EOS
+            seed=seed,
+            **extra_sampling,
         )
         
         print(f"🎲 Sampling: temp={temperature}, top_p={top_p}, max_tokens={max_tokens}")
         
-        # Token buffer for sliding window
-        token_buffer = []
+        # Per-request incremental decoder (holds the SNAC token buffer)
+        stream_decoder = StreamingSNACDecoder(
+            self.snac_decoder,
+            initial_tokens=max_tokens,
+            **self.decode_settings,
+        )
         total_tokens = 0
         total_chunks = 0
         
         # Generate with VLLM
-        import uuid
-        import time
         request_id = f"maya1voice-{uuid.uuid4().hex[:8]}-{int(time.time() * 1000000)}"
         
         results_generator = self.model.engine.generate(
@@ -406,37 +962,44 @@ class Maya1VoiceStreamingPipeline:
             request_id=request_id,
         )
         
-        # Stream tokens with sliding window decoding
-        async for request_output in results_generator:
-            generated_ids = request_output.outputs[0].token_ids
-            
-            # Process only new tokens
-            new_tokens = generated_ids[total_tokens:]
-            total_tokens = len(generated_ids)
-            
-            # Filter and buffer SNAC tokens only
-            for token_id in new_tokens:
-                if SNAC_MIN_ID <= token_id <= SNAC_MAX_ID:
-                    token_buffer.append(token_id)
-                    
-                    # Sliding window: process every 7 tokens when buffer > 27
-                    # Take last 28 tokens (4 frames) for smooth overlap
-                    if len(token_buffer) % 7 == 0 and len(token_buffer) > 27:
-                        window_tokens = token_buffer[-28:]
-                        
-                        # Decode with sliding window (returns middle 2048 samples)
-                        audio_bytes = self.snac_decoder.decode_to_bytes(
-                            window_tokens, 
-                            use_sliding_window=True
-                        )
-                        
-                        if audio_bytes:
+        # Stream tokens with windowed decoding
+        if self.decode_scheduler is not None:
+            self.decode_scheduler.open_stream()
+        try:
+            async for request_output in results_generator:
+                generated_ids = request_output.outputs[0].token_ids
+                
+                # Process only new tokens
+                new_tokens = generated_ids[total_tokens:]
+                total_tokens = len(generated_ids)
+                
+                # Filter SNAC tokens only; decode once a hop is ready
+                for token_id in new_tokens:
+                    if SNAC_MIN_ID <= token_id <= SNAC_MAX_ID:
+                        window = stream_decoder.append(token_id)
+                        if window is None:
+                            continue
+                        audio = stream_decoder.complete(window, await self._decode(window.tokens))
+                        if audio is not None and len(audio):
                             total_chunks += 1
                             if total_chunks == 1:
-                                print(f"🎵 First chunk decoded ({len(audio_bytes)} bytes)")
-                            yield audio_bytes
+                                print(f"🎵 First chunk decoded ({len(audio) * 2} bytes)")
+                            yield audio_to_pcm16(audio)
+            
+            # Frames held back as look-ahead
+            window = stream_decoder.final_window()
+            audio = stream_decoder.complete(window, await self._decode(window.tokens)) if window else None
+            if audio is not None and len(audio):
+                total_chunks += 1
+                yield audio_to_pcm16(audio)
+        finally:
+            # Closing the engine stream early (client went away) aborts the request
+            await results_generator.aclose()
+            if self.decode_scheduler is not None:
+                self.decode_scheduler.close_stream()
         
-        print(f"✅ Streaming complete: {total_tokens} tokens → {total_chunks} chunks")
+        print(f"✅ Streaming complete: {total_tokens} tokens → {total_chunks} chunks "
+              f"({stream_decoder.decoded_frames} frames decoded in {stream_decoder.decoder_calls} calls)")
 
 
 # ============================================================================
@@ -0,0 +1,354 @@
+"""
+Audio Encoding - Chunk-by-chunk WAV/FLAC/Ogg-Opus encoding with optional downsampled tiers
+"""
+
+import io
+import struct
+from math import gcd
+import numpy as np
+from scipy.signal import firwin, upfirdn
+
+try:
+    import soundfile
+except ImportError:  # FLAC and Ogg/Opus need soundfile (libsndfile >= 1.0.29 for Opus)
+    soundfile = None
+
+SAMPLE_WIDTH = 2  # int16 PCM
+
+# Output format -> content type ("pcm" is raw 16-bit samples in network byte
+# order (big-endian), as RFC 2586 defines audio/L16)
+AUDIO_CONTENT_TYPES = {
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "opus": "audio/ogg; codecs=opus",
+    "pcm": "audio/L16"
+}
+
+# Accept header media types -> output format
+ACCEPT_FORMATS = {
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "opus",
+    "audio/opus": "opus"
+}
+
+# Quality tier -> output sample rate (None keeps the model's rate); the lower
+# tiers are for slow connections, 16 kHz still sounds natural for speech
+QUALITY_SAMPLE_RATES = {
+    "high": None,
+    "medium": 16000,
+    "low": 8000
+}
+
+# Rates an Opus encoder accepts; other rates are resampled to the next one up
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# soundfile container and subtype per format
+_SOUNDFILE_FORMATS = {
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS")
+}
+
+
+def available_formats():
+    """Output formats supported by the installed libraries"""
+    formats = ["wav", "pcm"]
+    if soundfile is not None:
+        formats.append("flac")
+        if "OPUS" in soundfile.available_subtypes("OGG"):
+            formats.append("opus")
+    return formats
+
+
+def check_output(audio_format, quality="high"):
+    """
+    Check that audio can be encoded in a format and quality tier
+    
+    Raises:
+        ValueError: If the format or quality is unknown or the format is not
+            supported by the installed libraries
+    """
+    if audio_format not in AUDIO_CONTENT_TYPES:
+        raise ValueError(f"Unsupported audio format '{audio_format}' "
+                         f"(expected one of {', '.join(AUDIO_CONTENT_TYPES)})")
+    if audio_format not in available_formats():
+        raise ValueError(f"Audio format '{audio_format}' needs the soundfile package "
+                         f"(with libsndfile >= 1.0.29 for Opus)")
+    if quality not in QUALITY_SAMPLE_RATES:
+        raise ValueError(f"Unsupported quality '{quality}' (expected one of {', '.join(QUALITY_SAMPLE_RATES)})")
+
+
+def audio_content_type(audio_format, sample_rate):
+    """Content type of encoded audio (raw PCM carries its rate as a parameter)"""
+    if audio_format == "pcm":
+        return f"audio/L16;rate={sample_rate};channels=1"
+    return AUDIO_CONTENT_TYPES[audio_format]
+
+
+def wav_header(sample_rate, data_size=None, channels=1, sample_width=SAMPLE_WIDTH):
+    """
+    WAV header for 16-bit PCM
+    
+    Args:
+        sample_rate (int): Samples per second
+        data_size (int): Size of the PCM data in bytes; None for a stream of
+            unknown length, whose RIFF and data sizes are set to the maximum
+            value (browsers and most decoders then read until the connection
+            closes)
+    """
+    riff_size = 0xFFFFFFFF if data_size is None else 36 + data_size
+    byte_rate = sample_rate * channels * sample_width
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                                channels * sample_width, sample_width * 8)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF if data_size is None else data_size)
+    )
+
+
+def output_sample_rate(audio_format, sample_rate, quality="high"):
+    """Sample rate of the encoded audio (the tier's rate, never above the input's)"""
+    rate = min(sample_rate, QUALITY_SAMPLE_RATES[quality] or sample_rate)
+    if audio_format == "opus" and rate not in OPUS_SAMPLE_RATES:
+        rate = next((opus_rate for opus_rate in OPUS_SAMPLE_RATES if opus_rate >= rate), OPUS_SAMPLE_RATES[-1])
+    return rate
+
+
+class Resampler:
+    """
+    Streaming polyphase resampler
+    
+    Produces the same samples as scipy.signal.resample_poly on the whole
+    signal (same Kaiser-windowed FIR, same alignment), but takes the input
+    in chunks of any size: the input needed by future outputs is kept
+    between calls, and outputs are emitted as soon as all of their input has
+    arrived.
+    """
+    
+    def __init__(self, source_rate, target_rate):
+        divisor = gcd(int(source_rate), int(target_rate))
+        self.up = int(target_rate) // divisor
+        self.down = int(source_rate) // divisor
+        
+        max_rate = max(self.up, self.down)
+        half_len = 10 * max_rate
+        taps = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * self.up
+        # Zero-pad the filter so its delay is a whole number of output samples
+        pre_pad = self.down - half_len % self.down
+        self._taps = np.concatenate([np.zeros(pre_pad), taps])
+        self._delay = (half_len + pre_pad) // self.down  # In output samples
+        
+        self._buffer = np.zeros(0)
+        self._offset = 0    # Input index of _buffer[0], always a multiple of down
+        self._received = 0  # Input samples so far
+        self._emitted = 0   # Output samples so far
+    
+    def process(self, samples):
+        """Add input samples, return the output samples that are now final"""
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._received += len(samples)
+        # Filter outputs whose newest input sample has arrived
+        ready = -(-self._received * self.up // self.down)
+        return self._emit(ready - self._delay)
+    
+    def finish(self):
+        """Return the remaining output (the input is treated as ending with zeros)"""
+        return self._emit(-(-self._received * self.up // self.down))
+    
+    def _emit(self, stop):
+        if stop <= self._emitted:
+            return np.zeros(0)
+        
+        filtered = upfirdn(self._taps, self._buffer, self.up, self.down)
+        first = self._offset * self.up // self.down
+        start = self._emitted + self._delay - first
+        audio = filtered[start:stop + self._delay - first]
+        self._emitted += len(audio)
+        
+        # Drop the input no future output depends on, keeping the offset aligned
+        needed = ((self._emitted + self._delay) * self.down - len(self._taps) + 1) // self.up
+        drop = max(0, needed - self._offset) // self.down * self.down
+        self._buffer = self._buffer[drop:]
+        self._offset += drop
+        return audio
+
+
+class _ChunkSink:
+    """
+    Write-only file object handing soundfile's output out in chunks
+    
+    Bytes stay in the sink until drain(). Encoders that seek back to patch
+    a header at close (FLAC's STREAMINFO) can only patch bytes not drained
+    yet; writes before that point are dropped, which leaves the header's
+    "unknown length" values in a stream, as for a live FLAC stream.
+    """
+    
+    def __init__(self):
+        self._buffer = bytearray()
+        self._base = 0  # Stream offset of _buffer[0]
+        self._position = 0
+    
+    def write(self, data):
+        data = bytes(data)
+        written = len(data)
+        start = self._position - self._base
+        if start < 0:
+            data = data[-start:]
+            start = 0
+        end = start + len(data)
+        if end > len(self._buffer):
+            self._buffer.extend(bytes(end - len(self._buffer)))
+        self._buffer[start:end] = data
+        self._position += written
+        return written
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._base + len(self._buffer)
+        self._position = offset
+        return self._position
+    
+    def tell(self):
+        return self._position
+    
+    def read(self, size=-1):
+        return b""
+    
+    def drain(self):
+        data = bytes(self._buffer)
+        self._base += len(data)
+        self._buffer.clear()
+        return data
+
+
+class AudioEncoder:
+    """
+    Incremental encoder from int16 PCM to an output format and quality tier
+    
+    encode() takes the audio in chunks of any size (e.g. as a stream
+    produces them) and returns the encoded bytes that are ready; finish()
+    returns the rest. The concatenated output is a complete file. WAV and
+    PCM output is produced immediately, FLAC per encoded frame, Ogg/Opus
+    per Ogg page (roughly one per second of audio).
+    """
+    
+    def __init__(self, audio_format, sample_rate, quality="high"):
+        """
+        Args:
+            audio_format (str): "wav", "flac", "opus" or "pcm"
+            sample_rate (int): Sample rate of the input audio
+            quality (str): "high" (input rate), "medium" (16 kHz) or "low" (8 kHz)
+        
+        Raises:
+            ValueError: If the format or quality is unknown or the format is
+                not supported by the installed libraries
+        """
+        check_output(audio_format, quality)
+        
+        self.audio_format = audio_format
+        self.sample_rate = output_sample_rate(audio_format, int(sample_rate), quality)
+        self._resampler = Resampler(sample_rate, self.sample_rate) if self.sample_rate != sample_rate else None
+        self._header_sent = False
+        self._sink = None
+        self._file = None
+        if audio_format in _SOUNDFILE_FORMATS:
+            container, subtype = _SOUNDFILE_FORMATS[audio_format]
+            self._sink = _ChunkSink()
+            self._file = soundfile.SoundFile(self._sink, mode="w", samplerate=self.sample_rate, channels=1,
+                                             format=container, subtype=subtype)
+    
+    @property
+    def content_type(self):
+        """Content type of the encoded audio"""
+        return audio_content_type(self.audio_format, self.sample_rate)
+    
+    def encode(self, audio):
+        """
+        Encode a chunk of audio
+        
+        Args:
+            audio: int16 samples as a numpy array or little-endian PCM bytes
+                (as the streaming pipeline produces them)
+        
+        Returns:
+            bytes: Encoded bytes ready to send (may be empty)
+        """
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = np.frombuffer(audio, dtype=np.int16)
+        if self._resampler is not None:
+            audio = self._resampler.process(audio)
+        return self._write(audio)
+    
+    def finish(self):
+        """Flush the resampler and the codec, return the last bytes of the file"""
+        data = b""
+        if self._resampler is not None:
+            data = self._write(self._resampler.finish())
+        if self._file is not None:
+            self._file.close()
+            data += self._sink.drain()
+        elif not self._header_sent:
+            data += self._write(np.zeros(0, dtype=np.int16))
+        return data
+    
+    def _write(self, audio):
+        if self._file is not None:
+            if len(audio):
+                self._file.write(_to_int16(audio))
+            return self._sink.drain()
+        
+        data = _pcm_bytes(audio, self.audio_format)
+        if self.audio_format == "wav" and not self._header_sent:
+            data = wav_header(self.sample_rate) + data
+        self._header_sent = True
+        return data
+
+
+def _pcm_bytes(audio, audio_format):
+    """int16 sample bytes: little-endian inside WAV, big-endian for audio/L16"""
+    audio = _to_int16(audio)
+    return (audio.astype(">i2") if audio_format == "pcm" else audio).tobytes()
+
+
+def _to_int16(audio):
+    if audio.dtype == np.int16:
+        return audio
+    return np.clip(np.rint(audio), -32768, 32767).astype(np.int16)
+
+
+def encode_audio(audio, sample_rate, audio_format="wav", quality="high"):
+    """
+    Encode a complete int16 signal
+    
+    Unlike a stream, the file gets exact lengths in its header (WAV sizes,
+    FLAC STREAMINFO), so players can show the duration and seek.
+    
+    Returns:
+        tuple: (encoded bytes, output sample rate)
+    
+    Raises:
+        ValueError: If the format or quality is not supported
+    """
+    check_output(audio_format, quality)
+    rate = output_sample_rate(audio_format, int(sample_rate), quality)
+    audio = np.asarray(audio)
+    if rate != sample_rate:
+        resampler = Resampler(sample_rate, rate)
+        audio = np.concatenate([resampler.process(audio), resampler.finish()])
+    audio = _to_int16(audio)
+    
+    if audio_format in _SOUNDFILE_FORMATS:
+        container, subtype = _SOUNDFILE_FORMATS[audio_format]
+        buffer = io.BytesIO()
+        soundfile.write(buffer, audio, rate, format=container, subtype=subtype)
+        return buffer.getvalue(), rate
+    
+    data = _pcm_bytes(audio, audio_format)
+    if audio_format == "wav":
+        data = wav_header(rate, len(data)) + data
+    return data, rate
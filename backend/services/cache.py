@@ -0,0 +1,307 @@
+"""
+Cache - Content-addressed two-tier cache (in-memory LRU + SQLite on disk)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Collapse runs of whitespace so trivially different inputs share a key"""
+    return " ".join(text.split())
+
+
+def make_cache_key(*parts):
+    """
+    Build a stable content-addressed key from arbitrary JSON-serializable parts
+    
+    Args:
+        *parts: Values that together identify a cached result
+    
+    Returns:
+        str: Hex SHA-256 digest of the parts
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """
+    Two-tier cache with a size-bounded in-process LRU in front of a
+    persistent SQLite store that survives restarts.
+    
+    Values may be ``str`` or ``bytes``. Both tiers evict by TTL and by total
+    byte size (least recently used entries go first).
+    """
+    
+    # Memory hits refresh last_access on disk too, written in batches so a
+    # hit does not cost a SQLite write; pending updates are also flushed
+    # before every disk eviction
+    TOUCH_BATCH_SIZE = 64
+    TOUCH_FLUSH_SECONDS = 5.0
+    
+    def __init__(self, name, db_path=None, max_memory_bytes=16 * 1024 * 1024,
+                 max_disk_bytes=256 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        """
+        Args:
+            name (str): Cache name, used as the SQLite table name and in logs
+            db_path (str): SQLite file for the disk tier (None disables it)
+            max_memory_bytes (int): Byte budget of the in-memory LRU tier
+            max_disk_bytes (int): Byte budget of the SQLite tier
+            ttl_seconds (float): Entry lifetime (0 or None disables expiry)
+        """
+        self.name = name
+        self.db_path = db_path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, size, created_at)
+        self._memory_bytes = 0
+        
+        self._conn = None
+        self._disk_bytes = 0
+        self._touched = {}  # key -> last memory hit not yet written to disk
+        self._touched_flushed_at = time.monotonic()
+        
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+        
+        if db_path:
+            self._open_disk_tier()
+    
+    def _open_disk_tier(self):
+        """Open (or create) the SQLite store backing the disk tier"""
+        try:
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, is_text INTEGER NOT NULL, "
+                "size INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.name}_last_access ON {self.name} (last_access)"
+            )
+            self._conn.commit()
+            row = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.name}").fetchone()
+            self._disk_bytes = row[0]
+            print(f"{self.name} cache: disk tier at {self.db_path} ({self._disk_bytes} bytes)")
+        except sqlite3.Error as e:
+            print(f"Warning: {self.name} cache disk tier disabled: {e}")
+            self._conn = None
+    
+    def _is_expired(self, created_at, now):
+        return bool(self.ttl_seconds) and now - created_at > self.ttl_seconds
+    
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value, 0
+        return value.encode("utf-8"), 1
+    
+    def get(self, key):
+        """
+        Look up a key in memory first, then on disk
+        
+        Args:
+            key (str): Cache key (see make_cache_key)
+        
+        Returns:
+            str | bytes | None: Cached value, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, size, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    if self._conn is not None:
+                        self._touch(key, now)
+                    return value
+                self._drop_memory(key)
+                self._counters["expirations"] += 1
+            
+            if self._conn is not None:
+                try:
+                    value = self._get_disk(key, now)
+                except sqlite3.Error as e:
+                    # A broken disk tier degrades to a miss, as writes do
+                    print(f"Warning: {self.name} cache read failed: {e}")
+                    value = None
+                if value is not None:
+                    return value
+            
+            self._counters["misses"] += 1
+            return None
+    
+    def _get_disk(self, key, now):
+        """Read a key from the disk tier and promote it (call with the lock held)"""
+        row = self._conn.execute(
+            f"SELECT value, is_text, size, created_at FROM {self.name} WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        blob, is_text, size, created_at = row
+        if self._is_expired(created_at, now):
+            self._delete_disk(key, size)
+            self._counters["expirations"] += 1
+            return None
+        self._conn.execute(
+            f"UPDATE {self.name} SET last_access = ? WHERE key = ?", (now, key)
+        )
+        self._conn.commit()
+        value = blob.decode("utf-8") if is_text else bytes(blob)
+        # Promote to the memory tier for subsequent hits
+        self._put_memory(key, value, size, created_at)
+        self._counters["disk_hits"] += 1
+        return value
+    
+    def _touch(self, key, now):
+        """Queue a last_access update for a memory hit (call with the lock held)"""
+        self._touched[key] = now
+        if (len(self._touched) >= self.TOUCH_BATCH_SIZE
+                or time.monotonic() - self._touched_flushed_at >= self.TOUCH_FLUSH_SECONDS):
+            self._flush_touches()
+    
+    def _flush_touches(self):
+        """Write queued last_access updates to disk (call with the lock held)"""
+        touched, self._touched = self._touched, {}
+        self._touched_flushed_at = time.monotonic()
+        if not touched:
+            return
+        try:
+            self._conn.executemany(
+                f"UPDATE {self.name} SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(accessed, key) for key, accessed in touched.items()]
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: {self.name} cache access update failed: {e}")
+    
+    def set(self, key, value):
+        """
+        Store a value in both tiers
+        
+        Args:
+            key (str): Cache key (see make_cache_key)
+            value (str | bytes): Value to store
+        """
+        blob, is_text = self._encode(value)
+        size = len(blob)
+        now = time.time()
+        with self._lock:
+            self._counters["sets"] += 1
+            self._put_memory(key, value, size, now)
+            if self._conn is not None:
+                try:
+                    old = self._conn.execute(
+                        f"SELECT size FROM {self.name} WHERE key = ?", (key,)
+                    ).fetchone()
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO {self.name} "
+                        "(key, value, is_text, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, sqlite3.Binary(blob), is_text, size, now, now)
+                    )
+                    self._conn.commit()
+                    self._disk_bytes += size - (old[0] if old else 0)
+                    self._evict_disk(now)
+                except sqlite3.Error as e:
+                    print(f"Warning: {self.name} cache write failed: {e}")
+    
+    def _put_memory(self, key, value, size, created_at):
+        if size > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._drop_memory(key)
+        self._memory[key] = (value, size, created_at)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._counters["evictions"] += 1
+    
+    def _drop_memory(self, key):
+        _, size, _ = self._memory.pop(key)
+        self._memory_bytes -= size
+    
+    def _delete_disk(self, key, size):
+        self._conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+        self._conn.commit()
+        self._disk_bytes -= size
+    
+    def _evict_disk(self, now):
+        """Drop expired entries, then least recently used ones until under budget"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        self._flush_touches()
+        # Evict a little below the budget so the next few writes don't rescan
+        target_bytes = int(self.max_disk_bytes * 0.9)
+        if self.ttl_seconds:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.name} WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self._counters["expirations"] += cursor.rowcount
+        rows = self._conn.execute(
+            f"SELECT key, size FROM {self.name} ORDER BY last_access DESC"
+        ).fetchall()
+        kept_bytes = 0
+        victims = []
+        for key, size in rows:
+            if kept_bytes + size <= target_bytes:
+                kept_bytes += size
+            else:
+                victims.append((key,))
+        if victims:
+            self._conn.executemany(f"DELETE FROM {self.name} WHERE key = ?", victims)
+            self._counters["evictions"] += len(victims)
+        self._conn.commit()
+        self._disk_bytes = kept_bytes
+    
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._touched.clear()
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self.name}")
+                self._conn.commit()
+                self._disk_bytes = 0
+    
+    def get_stats(self):
+        """
+        Get hit/miss counters and tier sizes
+        
+        Returns:
+            dict: Counters plus memory/disk usage
+        """
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_enabled": self._conn is not None,
+                "disk_bytes": self._disk_bytes
+            }
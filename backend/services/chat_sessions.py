@@ -0,0 +1,126 @@
+"""
+Chat Sessions - Server-side conversation history with a per-session token budget
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class ChatSession:
+    """
+    One conversation: system prompt, a running summary of compacted turns,
+    and the recent turns that are still sent verbatim
+    """
+    
+    def __init__(self, session_id, system_prompt, token_budget):
+        self.id = session_id
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.summary = ""
+        self.turns = []
+        # Estimated tokens of every turn ever added, as if nothing were compacted
+        self.history_tokens = 0
+        self.compactions = 0
+        self.updated_at = time.time()
+        # Serializes turns within one session; different sessions run in parallel
+        self.lock = threading.Lock()
+
+
+class ChatSessionStore:
+    """LRU store of chat sessions with idle expiry and token-savings metrics"""
+    
+    def __init__(self, default_token_budget=3000, max_sessions=1000, ttl_seconds=3600):
+        """
+        Args:
+            default_token_budget (int): Prompt token budget of new sessions
+            max_sessions (int): Sessions kept before the least recently used is dropped
+            ttl_seconds (float): Idle time after which a session expires
+        """
+        self.default_token_budget = default_token_budget
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "created": 0,
+            "expired": 0,
+            "turns": 0,
+            "compactions": 0,
+            "tokens_sent": 0,
+            "tokens_saved": 0
+        }
+    
+    def create(self, system_prompt="", token_budget=None):
+        """
+        Start a new session
+        
+        Args:
+            system_prompt (str): System prompt for every turn of the session
+            token_budget (int): Prompt token budget (defaults to the store default)
+        
+        Returns:
+            ChatSession: The new session
+        """
+        session = ChatSession(
+            uuid.uuid4().hex,
+            system_prompt or "",
+            int(token_budget or self.default_token_budget)
+        )
+        with self._lock:
+            self._sessions[session.id] = session
+            self._stats["created"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+    
+    def get(self, session_id):
+        """
+        Look up a live session
+        
+        Returns:
+            ChatSession | None: The session, or None if unknown or expired
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                self._stats["expired"] += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+    
+    def delete(self, session_id):
+        """Remove a session; returns True if it existed"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+    
+    def record_turn(self, session, tokens_sent, tokens_full_history, compacted):
+        """
+        Account for one completed turn
+        
+        Args:
+            session (ChatSession): Session the turn belongs to
+            tokens_sent (int): Estimated prompt tokens actually sent
+            tokens_full_history (int): Estimated tokens the full, uncompacted
+                history would have cost
+            compacted (bool): Whether this turn triggered a compaction
+        """
+        session.updated_at = time.time()
+        if compacted:
+            session.compactions += 1
+        with self._lock:
+            self._stats["turns"] += 1
+            self._stats["tokens_sent"] += tokens_sent
+            self._stats["tokens_saved"] += max(0, tokens_full_history - tokens_sent)
+            if compacted:
+                self._stats["compactions"] += 1
+    
+    def get_stats(self):
+        """Get session counts, compactions and estimated tokens saved"""
+        with self._lock:
+            return {**self._stats, "active_sessions": len(self._sessions)}
@@ -0,0 +1,159 @@
+"""
+Micro Batcher - Groups concurrent small requests into one batched call
+"""
+
+import threading
+
+
+class _Batch:
+    """Items collected for one key, plus the slots their callers wait on"""
+    
+    def __init__(self):
+        self.items = []
+        self.weight = 0
+        self.closed = False
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for the same key during a short window
+    and serves them with a single call to ``handler(key, items)``
+    
+    The first caller of a window becomes its leader: it waits up to
+    ``window_seconds`` (or until the batch is full), runs the handler on
+    everything collected and hands each caller its own result. Callers
+    block until their result is ready, so the batcher is transparent to
+    synchronous code. A result that is an exception instance is raised in
+    the caller that submitted the corresponding item. After close(), items
+    are no longer held back: each is sent on its own right away.
+    """
+    
+    # Upper bounds of the batch-size histogram buckets
+    HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+    
+    def __init__(self, name, handler, window_seconds=0.005, max_batch=16, max_weight=None, weight=None):
+        """
+        Args:
+            name (str): Name of the batched operation, for diagnostics
+            handler (callable): ``handler(key, items)`` returning one result per item
+            window_seconds (float): How long the leader waits for more items
+            max_batch (int): Items after which a batch is sent immediately
+            max_weight (int): Optional cap on the summed weight of a batch
+            weight (callable): Weight of one item (required with max_weight)
+        """
+        self.name = name
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.max_weight = max_weight
+        self.weight = weight
+        
+        self._lock = threading.Lock()
+        self._closed = False
+        self._open = {}  # key -> batch still accepting items
+        self._histogram = {bucket: 0 for bucket in self.HISTOGRAM_BUCKETS}
+        self._overflow = 0
+        self._stats = {"items": 0, "batches": 0, "errors": 0}
+    
+    def submit(self, key, item):
+        """
+        Submit one item and wait for its result
+        
+        Args:
+            key: Items are only batched with others of the same key
+            item: Request payload passed to the handler
+        
+        Returns:
+            The handler's result for this item
+        """
+        item_weight = self.weight(item) if self.weight else 0
+        with self._lock:
+            batch = self._open.get(key)
+            if batch is not None and self.max_weight and batch.weight + item_weight > self.max_weight:
+                # Doesn't fit: send the open batch now and start a new one
+                self._close(key, batch)
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._open[key] = batch
+            index = len(batch.items)
+            batch.items.append(item)
+            batch.weight += item_weight
+            if self._closed or len(batch.items) >= self.max_batch:
+                self._close(key, batch)
+        
+        if leader:
+            batch.full.wait(self.window_seconds)
+            with self._lock:
+                self._close(key, batch)
+            self._run(key, batch)
+        else:
+            batch.done.wait()
+        
+        if batch.error is not None:
+            raise batch.error
+        result = batch.results[index]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def close(self):
+        """Send every open batch now and stop batching later items (for shutdown)"""
+        with self._lock:
+            self._closed = True
+            for key, batch in list(self._open.items()):
+                self._close(key, batch)
+    
+    def _close(self, key, batch):
+        """Stop a batch from accepting items (caller holds the lock)"""
+        if not batch.closed:
+            batch.closed = True
+            if self._open.get(key) is batch:
+                del self._open[key]
+            batch.full.set()
+    
+    def _run(self, key, batch):
+        size = len(batch.items)
+        try:
+            batch.results = self.handler(key, batch.items)
+            if len(batch.results) != size:
+                raise ValueError(f"{self.name} batch handler returned {len(batch.results)} results for {size} items")
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self._stats["items"] += size
+                self._stats["batches"] += 1
+                if batch.error is not None:
+                    self._stats["errors"] += 1
+                bucket = next((bound for bound in self.HISTOGRAM_BUCKETS if size <= bound), None)
+                if bucket is None:
+                    self._overflow += 1
+                else:
+                    self._histogram[bucket] += 1
+            batch.done.set()
+    
+    def get_stats(self):
+        """
+        Get batching counters and the batch-size histogram
+        
+        Returns:
+            dict: Items, batches, mean batch size and a histogram keyed by
+                bucket upper bound ("le_N"), with larger batches under "gt_N"
+        """
+        with self._lock:
+            histogram = {f"le_{bound}": count for bound, count in self._histogram.items()}
+            histogram[f"gt_{self.HISTOGRAM_BUCKETS[-1]}"] = self._overflow
+            batches = self._stats["batches"]
+            return {
+                **self._stats,
+                "mean_batch_size": round(self._stats["items"] / batches, 2) if batches else 0.0,
+                "window_ms": round(self.window_seconds * 1000, 2),
+                "max_batch": self.max_batch,
+                "histogram": histogram
+            }
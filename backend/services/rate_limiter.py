@@ -0,0 +1,291 @@
+"""
+Rate Limiter - Token-bucket admission and 429 backoff for upstream API calls
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted within the maximum wait time"""
+    
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Continuously refilling token bucket (capacity = one minute of budget)"""
+    
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self, amount, now):
+        """Seconds until ``amount`` tokens are available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+    
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+    
+    def credit(self, amount, now):
+        """Return (or, if negative, charge) tokens after the real cost is known"""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+def is_rate_limit_error(error):
+    """Check whether an exception represents an HTTP 429 from the upstream API"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+def get_retry_after(error):
+    """
+    Extract the server-requested delay from a 429 error, if any
+    
+    Understands ``Retry-After`` (seconds or HTTP date) and Groq's
+    ``x-ratelimit-reset-*`` headers (e.g. "7.66s", "2m59.56s").
+    
+    Returns:
+        float | None: Delay in seconds
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    
+    delays = []
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(name)
+        if value:
+            delays.append(_parse_duration(value))
+    delays = [d for d in delays if d is not None]
+    return max(delays) if delays else None
+
+
+def _parse_duration(value):
+    """Parse durations like '1m30.5s', '7.66s' or '250ms' into seconds"""
+    total = 0.0
+    number = ""
+    index = 0
+    try:
+        while index < len(value):
+            char = value[index]
+            if char.isdigit() or char == ".":
+                number += char
+            elif value.startswith("ms", index):
+                total += float(number) / 1000
+                number = ""
+                index += 1
+            elif char in "hms":
+                total += float(number) * {"h": 3600, "m": 60, "s": 1}[char]
+                number = ""
+            index += 1
+        if number:
+            total += float(number)
+    except ValueError:
+        return None
+    return total
+
+
+class RateLimitScheduler:
+    """
+    Paces calls to a rate-limited upstream API
+    
+    Requests are admitted in FIFO order against request-per-minute and
+    token-per-minute buckets, wait at most ``max_wait_seconds`` in the queue,
+    and are retried with Retry-After-aware exponential backoff on 429s.
+    A 429 also pauses admission for every caller until the reset time.
+    """
+    
+    def __init__(self, requests_per_minute, tokens_per_minute, max_wait_seconds=30.0,
+                 max_retries=3, base_backoff_seconds=1.0):
+        """
+        Args:
+            requests_per_minute (float): Request budget per minute
+            tokens_per_minute (float): Estimated prompt + completion token budget per minute
+            max_wait_seconds (float): Longest a request may wait for admission
+            max_retries (int): Retries after a 429 before giving up
+            base_backoff_seconds (float): First backoff delay when no Retry-After is sent
+        """
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._blocked_until = 0.0
+        
+        self._cond = threading.Condition()
+        self._queue = deque()
+        
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "throttled_requests": 0,
+            "throttled_seconds": 0.0,
+            "rate_limited_responses": 0,
+            "retries": 0,
+            "peak_queue_depth": 0
+        }
+    
+    def _admission_delay(self, tokens, now):
+        return max(
+            self._requests.delay(1, now),
+            self._tokens.delay(tokens, now),
+            self._blocked_until - now
+        )
+    
+    def acquire(self, tokens, deadline=None):
+        """
+        Block until a request costing ``tokens`` may be sent
+        
+        Args:
+            tokens (int): Estimated prompt + completion tokens
+            deadline (float): time.monotonic() deadline (defaults to now + max wait)
+        
+        Raises:
+            RateLimitExceeded: If admission would take longer than the deadline
+        """
+        started = time.monotonic()
+        if deadline is None:
+            deadline = started + self.max_wait_seconds
+        ticket = object()
+        
+        with self._cond:
+            self._queue.append(ticket)
+            self._stats["peak_queue_depth"] = max(self._stats["peak_queue_depth"], len(self._queue))
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] is ticket:
+                        wait = self._admission_delay(tokens, now)
+                        if wait <= 0:
+                            self._requests.consume(1, now)
+                            self._tokens.consume(tokens, now)
+                            self._stats["admitted"] += 1
+                            break
+                        if now + wait > deadline:
+                            self._stats["rejected"] += 1
+                            raise RateLimitExceeded(
+                                "Upstream rate limit reached, please retry shortly",
+                                retry_after=round(wait, 2)
+                            )
+                    else:
+                        wait = deadline - now
+                    
+                    if deadline - now <= 0:
+                        self._stats["rejected"] += 1
+                        raise RateLimitExceeded(
+                            "Upstream rate limit reached, please retry shortly",
+                            retry_after=round(self._admission_delay(tokens, now), 2)
+                        )
+                    self._cond.wait(min(wait, deadline - now))
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+                waited = time.monotonic() - started
+                if waited > 0.001:
+                    self._stats["throttled_requests"] += 1
+                    self._stats["throttled_seconds"] += waited
+    
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the real usage of a request is known"""
+        with self._cond:
+            self._tokens.credit(estimated_tokens - actual_tokens, time.monotonic())
+            self._cond.notify_all()
+    
+    def call(self, fn, tokens, deadline=None):
+        """
+        Run ``fn`` under admission control, retrying on 429 responses
+        
+        Args:
+            fn (callable): Zero-argument function performing the upstream call
+            tokens (int): Estimated prompt + completion tokens of the call
+            deadline (float): time.monotonic() deadline for admission and
+                retries (defaults to now + max wait)
+        
+        Returns:
+            Whatever ``fn`` returns
+        
+        Raises:
+            RateLimitExceeded: If the call cannot be admitted or keeps being
+                rate limited within the maximum wait time
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.max_wait_seconds
+        attempt = 0
+        while True:
+            self.acquire(tokens, deadline)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                
+                retry_after = get_retry_after(e)
+                backoff = self.base_backoff_seconds * (2 ** attempt) * (1 + random.random() * 0.25)
+                delay = max(retry_after or 0.0, backoff)
+                
+                with self._cond:
+                    self._stats["rate_limited_responses"] += 1
+                    # Pause everyone, not just this caller, until the window resets
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                    self._cond.notify_all()
+                
+                attempt += 1
+                if attempt > self.max_retries or time.monotonic() + delay > deadline:
+                    raise RateLimitExceeded(
+                        "Upstream rate limit reached, please retry shortly",
+                        retry_after=round(delay, 2)
+                    )
+                
+                print(f"Rate limited by upstream, retrying in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+                with self._cond:
+                    self._stats["retries"] += 1
+    
+    def get_stats(self):
+        """
+        Get queue and throttling metrics
+        
+        Returns:
+            dict: Current queue depth, admission counters and time spent throttled
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._requests._refill(now)
+            self._tokens._refill(now)
+            return {
+                **self._stats,
+                "throttled_seconds": round(self._stats["throttled_seconds"], 3),
+                "queue_depth": len(self._queue),
+                "paused_seconds": round(max(0.0, self._blocked_until - now), 3),
+                "available_requests": round(self._requests.level, 2),
+                "available_tokens": round(self._tokens.level, 1)
+            }
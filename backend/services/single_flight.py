@@ -0,0 +1,92 @@
+"""
+Single Flight - Coalesces concurrent identical calls into one upstream computation
+"""
+
+import threading
+
+
+class _Call:
+    """One in-flight computation and the callers waiting on it"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Duplicate-call suppression keyed by request content
+    
+    While a call for a key is running, further calls with the same key wait
+    for it and receive its result (or its exception) instead of repeating
+    the upstream work. Nothing is retained once the call finishes; caching
+    is a separate concern.
+    """
+    
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Name of the coalesced operation, for diagnostics
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0
+        }
+    
+    def do(self, key, fn):
+        """
+        Run ``fn`` once for all concurrent callers with the same key
+        
+        Args:
+            key (str): Normalized request key
+            fn (callable): Zero-argument function performing the work
+        
+        Returns:
+            Whatever ``fn`` returns (the same object for every waiting caller)
+        
+        Raises:
+            Exception: Whatever ``fn`` raised, re-raised in every waiting caller
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    def get_stats(self):
+        """
+        Get coalescing counters
+        
+        Returns:
+            dict: Total calls, upstream executions, calls coalesced
+                (upstream calls saved) and calls currently in flight
+        """
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
@@ -3,8 +3,18 @@ Summarization Service - Handles text summarization using Groq API
 """
 
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from groq import Groq
 from dotenv import load_dotenv
+from services.cache import TieredCache, make_cache_key, normalize_text
+from services.rate_limiter import RateLimitScheduler, RateLimitExceeded
+from services.extractive_summarizer import ExtractiveSummarizer
+from services.chat_sessions import ChatSessionStore
+from services.single_flight import SingleFlight
 
 # Load environment variables
 load_dotenv()
@@ -12,8 +22,23 @@ load_dotenv()
 # Get GROQ API KEY from environment variable
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY environment variable is not set. Please add it to your .env file.")
+
+def estimate_tokens(text):
+    """
+    Cheaply estimate the number of LLM tokens in a piece of text
+    
+    Uses the common ~4 characters per token heuristic for English text,
+    which is close enough for budgeting without loading a tokenizer.
+    
+    Args:
+        text (str): Text to measure
+    
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
 
 
 class SummarizationService:
@@ -21,19 +46,109 @@ class SummarizationService:
     
     MODEL_NAME = "llama-3.1-8b-instant"
     
+    SYSTEM_PROMPT = "You are a helpful assistant that summarizes text clearly, simply, and concisely. Make summaries easy to understand for dyslexic readers."
+    SUMMARY_TEMPERATURE = 0.7
+    SUMMARY_MAX_TOKENS = 500
+    REDUCE_INSTRUCTION = (
+        "The following are summaries of consecutive parts of one document. "
+        "Combine them into a single summary:"
+    )
+    
+    # Hierarchical (map-reduce) summarization settings
+    CHUNK_TOKEN_BUDGET = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+    MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+    REDUCE_FAN_OUT = int(os.getenv("SUMMARY_FAN_OUT", "4"))
+    MAX_DEPTH = int(os.getenv("SUMMARY_MAX_DEPTH", "4"))
+    
+    # Batch summarization settings
+    BATCH_MAX_ITEMS = int(os.getenv("SUMMARY_BATCH_MAX_ITEMS", "500"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", "4"))
+    
+    # Incremental (document-versioned) summarization settings
+    MAX_DOCUMENTS = int(os.getenv("SUMMARY_MAX_DOCUMENTS", "1000"))
+    PARAGRAPH_MIN_TOKENS = int(os.getenv("SUMMARY_PARAGRAPH_MIN_TOKENS", "60"))
+    
+    # Server-side chat session settings
+    CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "3000"))
+    CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+    CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600"))
+    CHAT_SUMMARY_MAX_TOKENS = 300
+    COMPACTION_PROMPT = (
+        "You maintain a running summary of a tutoring conversation. "
+        "Keep every fact, question and decision that later turns may rely on. "
+        "Be concise."
+    )
+    
+    # Completion cache settings (set SUMMARY_CACHE_DB="" to keep it in memory only)
+    CACHE_DB_PATH = os.getenv("SUMMARY_CACHE_DB", "./cache/summaries.sqlite3")
+    CACHE_MEMORY_MB = float(os.getenv("SUMMARY_CACHE_MEMORY_MB", "32"))
+    CACHE_DISK_MB = float(os.getenv("SUMMARY_CACHE_DISK_MB", "512"))
+    CACHE_TTL_SECONDS = float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    
+    # Offline extractive tier, used for mode="fast" and when Groq is slow or down
+    LLM_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_LLM_TIMEOUT_SECONDS", "20"))
+    FALLBACK_ENABLED = os.getenv("SUMMARY_FALLBACK_ENABLED", "true").lower() == "true"
+    
+    # Groq rate limits (defaults match the free tier for MODEL_NAME)
+    RATE_LIMIT_RPM = float(os.getenv("GROQ_RPM", "30"))
+    RATE_LIMIT_TPM = float(os.getenv("GROQ_TPM", "6000"))
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("GROQ_MAX_WAIT_SECONDS", "30"))
+    RATE_LIMIT_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+    # A map-reduce document needs about (tokens / TPM) minutes of budget no
+    # matter how it is chunked (at 6000 TPM, three 3000-token chunks already
+    # exceed the 30 s per-request wait), so its calls share one deadline
+    # sized from the document, up to this cap
+    MAP_REDUCE_MAX_WAIT_SECONDS = float(os.getenv("SUMMARY_MAP_REDUCE_MAX_WAIT_SECONDS", "300"))
+    
     def __init__(self):
         self.client = None
         self.initialized = False
-        
+        self.extractive = ExtractiveSummarizer()
+        self._flight = SingleFlight("summarize")
+        self.sessions = ChatSessionStore(
+            default_token_budget=self.CHAT_TOKEN_BUDGET,
+            max_sessions=self.CHAT_MAX_SESSIONS,
+            ttl_seconds=self.CHAT_SESSION_TTL_SECONDS
+        )
+        self.scheduler = RateLimitScheduler(
+            requests_per_minute=self.RATE_LIMIT_RPM,
+            tokens_per_minute=self.RATE_LIMIT_TPM,
+            max_wait_seconds=self.RATE_LIMIT_MAX_WAIT_SECONDS,
+            max_retries=self.RATE_LIMIT_MAX_RETRIES
+        )
+        self.cache = TieredCache(
+            "summaries",
+            db_path=self.CACHE_DB_PATH or None,
+            max_memory_bytes=int(self.CACHE_MEMORY_MB * 1024 * 1024),
+            max_disk_bytes=int(self.CACHE_DISK_MB * 1024 * 1024),
+            ttl_seconds=self.CACHE_TTL_SECONDS
+        )
+        # document_id -> {"version": int, "paragraphs": {content hash: summary}}
+        self._documents = OrderedDict()
+        self._documents_lock = threading.Lock()
+        # Shared, bounded pool so concurrent long documents cannot flood Groq
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.MAX_WORKERS,
+            thread_name_prefix="summarize"
+        )
+    
     def initialize(self):
         """Initialize the Groq client"""
         if self.initialized:
             print("Groq client already initialized")
             return True
         
+        if not GROQ_API_KEY:
+            raise ValueError("GROQ_API_KEY environment variable is not set. Please add it to your .env file.")
+        
         print("Initializing Groq client for summarization...")
         try:
-            self.client = Groq(api_key=GROQ_API_KEY)
+            # Retries are owned by the rate-limit scheduler, not the SDK
+            self.client = Groq(
+                api_key=GROQ_API_KEY,
+                max_retries=0,
+                timeout=self.LLM_TIMEOUT_SECONDS
+            )
             self.initialized = True
             print("Groq client initialized successfully!")
             return True
@@ -41,59 +156,637 @@ class SummarizationService:
             print(f"Error initializing Groq client: {e}")
             raise
     
-    def summarize(self, text):
+    @staticmethod
+    def _estimate_request_tokens(messages, max_tokens):
+        """Estimated prompt tokens plus the completion budget of a request"""
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+        return prompt_tokens + int(max_tokens)
+    
+    def _cache_key(self, messages, temperature, max_tokens):
+        """Content-addressed key over model, prompts and sampling settings"""
+        return make_cache_key(
+            self.MODEL_NAME,
+            [(m.get("role"), normalize_text(m.get("content") or "")) for m in messages],
+            float(temperature),
+            int(max_tokens)
+        )
+    
+    def _complete(self, messages, temperature, max_tokens, deadline=None):
+        """
+        Run a single chat completion against Groq, served from cache when possible
+        
+        Args:
+            messages (list): Chat messages to send
+            temperature (float): Sampling temperature
+            max_tokens (int): Maximum tokens to generate
+            deadline (float): Optional time.monotonic() admission deadline
+                (defaults to the scheduler's maximum wait)
+        
+        Returns:
+            str: Content of the first completion choice
+        """
+        key = self._cache_key(messages, temperature, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        estimated = self._estimate_request_tokens(messages, max_tokens)
+        completion = self.scheduler.call(
+            lambda: self.client.chat.completions.create(
+                model=self.MODEL_NAME,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            ),
+            estimated,
+            deadline
+        )
+        usage = getattr(completion, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.scheduler.reconcile(estimated, usage.total_tokens)
+        content = completion.choices[0].message.content
+        if content:
+            self.cache.set(key, content)
+        return content
+    
+    def _complete_stream(self, messages, temperature, max_tokens, deadline=None):
+        """
+        Stream a chat completion from Groq, yielding content deltas
+        
+        A cache hit is yielded as a single delta; a fully streamed response
+        is written back to the cache once it completes. The limiter is
+        reconciled with the usage Groq reports on the final chunk.
+        
+        Args:
+            messages (list): Chat messages to send
+            temperature (float): Sampling temperature
+            max_tokens (int): Maximum tokens to generate
+            deadline (float): Optional time.monotonic() admission deadline
+        
+        Yields:
+            str: Content fragments in order
+        """
+        key = self._cache_key(messages, temperature, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        estimated = self._estimate_request_tokens(messages, max_tokens)
+        stream = self.scheduler.call(
+            lambda: self.client.chat.completions.create(
+                model=self.MODEL_NAME,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            ),
+            estimated,
+            deadline
+        )
+        parts = []
+        usage = None
+        try:
+            for chunk in stream:
+                # Groq reports usage on the final chunk, under x_groq
+                x_groq = getattr(chunk, "x_groq", None)
+                if getattr(x_groq, "usage", None) is not None:
+                    usage = x_groq.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            # Also reached when the client disconnects mid-stream: without
+            # usage, the prompt plus what was emitted is the best estimate
+            if usage is not None:
+                actual = usage.total_tokens
+            else:
+                actual = self._estimate_request_tokens(messages, 0) + estimate_tokens("".join(parts))
+            self.scheduler.reconcile(estimated, actual)
+        
+        content = "".join(parts)
+        if content:
+            self.cache.set(key, content)
+    
+    def _summary_messages(self, instruction, text):
+        """Build the system + user messages for one summarization request"""
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": f"{instruction}\n\n{text}"}
+        ]
+    
+    def _summarize_once(self, instruction, text, deadline=None):
+        """Summarize a single piece of text that fits in one request"""
+        summary = self._complete(
+            self._summary_messages(instruction, text),
+            temperature=self.SUMMARY_TEMPERATURE,
+            max_tokens=self.SUMMARY_MAX_TOKENS,
+            deadline=deadline
+        )
+        if not summary:
+            raise Exception("Failed to generate summary")
+        return summary
+    
+    def summarize(self, text, strategy="auto", fan_out=None, max_depth=None, mode="llm"):
         """
         Summarize the given text
         
         Args:
             text (str): Text to summarize
-            
+            strategy (str): "single" sends the text in one request,
+                "hierarchical" uses map-reduce over chunks, and "auto"
+                picks hierarchical only when the text exceeds one chunk
+            fan_out (int): Partial summaries merged per reduce call
+                (hierarchical only, defaults to REDUCE_FAN_OUT)
+            max_depth (int): Maximum number of reduce levels
+                (hierarchical only, defaults to MAX_DEPTH)
+            mode (str): "llm" summarizes with Groq, "fast" with the local
+                extractive summarizer
+        
         Returns:
             str: Summarized text
-            
+        
         Raises:
-            ValueError: If text is empty
+            ValueError: If text is empty or strategy/mode is unknown
             Exception: If summarization fails
         """
+        return self.summarize_detailed(text, strategy, fan_out, max_depth, mode)["summary"]
+    
+    def summarize_detailed(self, text, strategy="auto", fan_out=None, max_depth=None, mode="llm"):
+        """
+        Summarize the given text and report which engine produced the summary
+        
+        In "llm" mode, a missing client or an upstream failure (error,
+        timeout or rate limit) falls back to the extractive summarizer when
+        FALLBACK_ENABLED is set.
+        
+        Args:
+            text (str): Text to summarize
+            strategy (str): See summarize()
+            fan_out (int): See summarize()
+            max_depth (int): See summarize()
+            mode (str): "llm" or "fast"
+        
+        Returns:
+            dict: 'summary', 'mode' ("llm" or "fast") and, after a fallback,
+                'fallback_reason'
+        
+        Raises:
+            ValueError: If text is empty or strategy/mode is unknown
+            Exception: If summarization fails and no fallback is possible
+        """
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
         
+        if strategy not in ("auto", "single", "hierarchical"):
+            raise ValueError(f"Unsupported summarization strategy: {strategy}")
+        
+        if mode not in ("llm", "fast"):
+            raise ValueError(f"Unsupported summarization mode: {mode}")
+        
+        # Concurrent identical requests (e.g. a whole class) share one summary;
+        # only outer whitespace is ignored, since paragraph breaks drive chunking
+        key = make_cache_key("summarize", text.strip(), strategy, fan_out, max_depth, mode)
+        result = self._flight.do(
+            key, lambda: self._summarize_detailed(text, strategy, fan_out, max_depth, mode)
+        )
+        return dict(result)
+    
+    def _summarize_detailed(self, text, strategy, fan_out, max_depth, mode):
+        """Validated body of summarize_detailed(), run once per coalesced key"""
+        if mode == "fast":
+            return {"summary": self._summarize_extractive(text), "mode": "fast"}
+        
         if not self.initialized or self.client is None:
+            if self.FALLBACK_ENABLED:
+                return self._fallback(text, "Groq client not initialized")
             raise Exception("Groq client not initialized. Call initialize() first.")
         
-        print(f"Summarizing text (length: {len(text)} chars)...")
+        if strategy == "auto":
+            too_long = estimate_tokens(text) > self.CHUNK_TOKEN_BUDGET
+            strategy = "hierarchical" if too_long else "single"
+        
+        print(f"Summarizing text (length: {len(text)} chars, strategy: {strategy})...")
         
         try:
-            # Create completion with Groq
-            completion = self.client.chat.completions.create(
-                model=self.MODEL_NAME,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that summarizes text clearly, simply, and concisely. Make summaries easy to understand for dyslexic readers."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Please summarize the following text:\n\n{text}"
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            # Extract the summary
-            summary = completion.choices[0].message.content
-            
-            if not summary:
-                raise Exception("Failed to generate summary")
+            if strategy == "hierarchical":
+                summary = self._summarize_hierarchical(text, fan_out, max_depth)
+            else:
+                summary = self._summarize_once("Please summarize the following text:", text)
             
             print(f"Summary generated (length: {len(summary)} chars)")
-            return summary
-            
+            return {"summary": summary, "mode": "llm"}
+        
+        except RateLimitExceeded as e:
+            if self.FALLBACK_ENABLED:
+                return self._fallback(text, str(e))
+            raise
         except Exception as e:
             print(f"Error during summarization: {e}")
+            if self.FALLBACK_ENABLED:
+                return self._fallback(text, str(e))
             raise Exception(f"Summarization failed: {str(e)}")
     
+    def _summarize_extractive(self, text):
+        """Summarize locally with TextRank (no network)"""
+        summary = self.extractive.summarize(text)
+        print(f"Extractive summary generated (length: {len(summary)} chars)")
+        return summary
+    
+    def _fallback(self, text, reason):
+        """Serve an extractive summary in place of a failed LLM summary"""
+        print(f"Falling back to extractive summary: {reason}")
+        return {
+            "summary": self._summarize_extractive(text),
+            "mode": "fast",
+            "fallback_reason": reason
+        }
+    
+    def summarize_stream(self, text, fan_out=None, max_depth=None, mode="llm"):
+        """
+        Summarize the given text, streaming the summary as it is generated
+        
+        Input is validated immediately; generation starts when the returned
+        iterator is consumed. Long documents run the map-reduce levels first
+        and stream only the final merge.
+        
+        Args:
+            text (str): Text to summarize
+            fan_out (int): Partial summaries merged per reduce call
+            max_depth (int): Maximum number of reduce levels
+            mode (str): "llm" or "fast" (the extractive summary arrives
+                as a single fragment)
+        
+        Returns:
+            iterator: Summary text fragments in order
+        
+        Raises:
+            ValueError: If text is empty or mode is unknown
+            Exception: If the client is not initialized and fallback is disabled
+        """
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        
+        if mode not in ("llm", "fast"):
+            raise ValueError(f"Unsupported summarization mode: {mode}")
+        
+        if mode == "fast" or (self.FALLBACK_ENABLED and not self.initialized):
+            return iter([self._summarize_extractive(text)])
+        
+        if not self.initialized or self.client is None:
+            raise Exception("Groq client not initialized. Call initialize() first.")
+        
+        print(f"Streaming summary (length: {len(text)} chars)...")
+        
+        def generate():
+            streamed = False
+            deadline = None
+            try:
+                if estimate_tokens(text) > self.CHUNK_TOKEN_BUDGET:
+                    deadline = self._map_reduce_deadline(text)
+                    partials = self._map_reduce_partials(text, fan_out, max_depth, deadline)
+                    if len(partials) == 1:
+                        yield partials[0]
+                        return
+                    messages = self._summary_messages(
+                        self.REDUCE_INSTRUCTION, self._join_partials(partials)
+                    )
+                else:
+                    messages = self._summary_messages("Please summarize the following text:", text)
+                
+                for fragment in self._complete_stream(
+                    messages,
+                    temperature=self.SUMMARY_TEMPERATURE,
+                    max_tokens=self.SUMMARY_MAX_TOKENS,
+                    deadline=deadline
+                ):
+                    streamed = True
+                    yield fragment
+            except Exception as e:
+                # Nothing sent yet: the extractive summary can still stand in
+                if self.FALLBACK_ENABLED and not streamed:
+                    print(f"Falling back to extractive summary: {e}")
+                    yield self._summarize_extractive(text)
+                    return
+                if isinstance(e, RateLimitExceeded):
+                    raise
+                print(f"Error during streaming summarization: {e}")
+                raise Exception(f"Summarization failed: {str(e)}")
+        
+        return generate()
+    
+    def summarize_batch(self, texts, concurrency=None, strategy="auto", mode="llm"):
+        """
+        Summarize many texts with bounded concurrency
+        
+        Identical inputs (after whitespace normalization) are summarized once
+        and the result is shared by every position that requested it.
+        
+        Args:
+            texts (list): Texts to summarize
+            concurrency (int): Maximum in-flight summaries (capped at
+                BATCH_MAX_CONCURRENCY)
+            strategy (str): Summarization strategy passed to summarize()
+            mode (str): Summarization mode passed to summarize()
+        
+        Returns:
+            dict: 'results' in input order (each with 'summary' and 'mode', or 'error'),
+                plus 'total' and 'unique' counts
+        
+        Raises:
+            ValueError: If texts is not a non-empty list or is too large
+        """
+        if not isinstance(texts, list) or not texts:
+            raise ValueError("Texts must be a non-empty list")
+        
+        if len(texts) > self.BATCH_MAX_ITEMS:
+            raise ValueError(f"Batch too large: {len(texts)} items (max {self.BATCH_MAX_ITEMS})")
+        
+        concurrency = max(1, min(int(concurrency or self.BATCH_MAX_CONCURRENCY), self.BATCH_MAX_CONCURRENCY))
+        
+        # Group positions by normalized text so duplicates cost one call
+        positions = {}
+        for index, text in enumerate(texts):
+            key = normalize_text(text) if isinstance(text, str) else None
+            positions.setdefault(key, []).append(index)
+        
+        print(f"Batch summarizing {len(texts)} texts ({len(positions)} unique, concurrency {concurrency})...")
+        
+        def run(key):
+            if not key:
+                return {"error": "Text cannot be empty"}
+            try:
+                return self.summarize_detailed(texts[positions[key][0]], strategy=strategy, mode=mode)
+            except Exception as e:
+                return {"error": str(e)}
+        
+        # A dedicated pool: map-reduce work inside summarize() uses the shared pool
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="summarize-batch") as pool:
+            outcomes = dict(zip(positions, pool.map(run, positions)))
+        
+        results = [None] * len(texts)
+        for key, indexes in positions.items():
+            for index in indexes:
+                results[index] = {"index": index, **outcomes[key]}
+        
+        return {
+            "results": results,
+            "total": len(texts),
+            "unique": len(positions)
+        }
+    
+    def summarize_document(self, document_id, text):
+        """
+        Incrementally summarize a document that is edited between requests
+        
+        Per-paragraph summaries are kept per document, keyed by paragraph
+        content hash, so only new or edited paragraphs are re-summarized.
+        Paragraph summaries are then merged through a reduce tree whose
+        groups are chosen by content (not position); unchanged groups hit
+        the completion cache, so an edit costs roughly its own size plus
+        one path to the root.
+        
+        Args:
+            document_id (str): Client-chosen identifier of the document
+            text (str): Current full text of the document
+        
+        Returns:
+            dict: 'summary', 'mode', 'document_id', 'version', 'paragraphs'
+                and 'paragraphs_resummarized'
+        
+        Raises:
+            ValueError: If text or document_id is empty
+            Exception: If summarization fails and no fallback is possible
+        """
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        
+        if not isinstance(document_id, str) or not document_id.strip():
+            raise ValueError("Document ID cannot be empty")
+        
+        if not self.initialized or self.client is None:
+            result = self.summarize_detailed(text)
+            return {**result, "document_id": document_id, "version": None}
+        
+        paragraphs = self._split_paragraphs(text)
+        hashes = [make_cache_key(normalize_text(paragraph)) for paragraph in paragraphs]
+        
+        with self._documents_lock:
+            previous = self._documents.get(document_id)
+            known = dict(previous["paragraphs"]) if previous else {}
+            version = previous["version"] + 1 if previous else 1
+        
+        # Summarize each changed paragraph once, even if it appears twice
+        pending = {}
+        for paragraph, content_hash in zip(paragraphs, hashes):
+            if content_hash not in known:
+                pending.setdefault(content_hash, paragraph)
+        
+        print(f"Incremental summary of '{document_id}' v{version}: "
+              f"{len(pending)} of {len(paragraphs)} paragraphs changed")
+        
+        try:
+            summarize_all = len(paragraphs) == 1
+            known.update(zip(pending, self._executor.map(
+                lambda paragraph: self._summarize_paragraph(paragraph, summarize_all),
+                pending.values()
+            )))
+            summary = self._combine_incremental([known[content_hash] for content_hash in hashes])
+        except Exception as e:
+            print(f"Error during incremental summarization: {e}")
+            if self.FALLBACK_ENABLED:
+                return {**self._fallback(text, str(e)), "document_id": document_id, "version": None}
+            if isinstance(e, RateLimitExceeded):
+                raise
+            raise Exception(f"Summarization failed: {str(e)}")
+        
+        with self._documents_lock:
+            self._documents[document_id] = {
+                "version": version,
+                "paragraphs": {content_hash: known[content_hash] for content_hash in hashes}
+            }
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.MAX_DOCUMENTS:
+                self._documents.popitem(last=False)
+        
+        return {
+            "summary": summary,
+            "mode": "llm",
+            "document_id": document_id,
+            "version": version,
+            "paragraphs": len(paragraphs),
+            "paragraphs_resummarized": len(pending)
+        }
+    
+    def _split_paragraphs(self, text):
+        """Split text on blank lines, breaking oversized paragraphs into chunks"""
+        paragraphs = []
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if estimate_tokens(paragraph) > self.CHUNK_TOKEN_BUDGET:
+                paragraphs.extend(self._split_into_chunks(paragraph, self.CHUNK_TOKEN_BUDGET))
+            else:
+                paragraphs.append(paragraph)
+        return paragraphs
+    
+    def _summarize_paragraph(self, paragraph, force=False):
+        """Summarize one paragraph; short ones are already summary-sized"""
+        if not force and estimate_tokens(paragraph) < self.PARAGRAPH_MIN_TOKENS:
+            return paragraph
+        return self._summarize_once(
+            "Please summarize the following paragraph of a longer document:", paragraph
+        )
+    
+    def _combine_incremental(self, summaries):
+        """
+        Merge paragraph summaries with a content-defined reduce tree
+        
+        A group ends after any item whose content hash is divisible by the
+        fan-out (or when it reaches twice the fan-out), so inserting or
+        editing a paragraph only changes the groups around it.
+        """
+        fan_out = max(2, self.REDUCE_FAN_OUT)
+        items = summaries
+        while len(items) > 1:
+            groups = []
+            current = []
+            for item in items:
+                current.append(item)
+                if int(make_cache_key(item)[:8], 16) % fan_out == 0 or len(current) >= 2 * fan_out:
+                    groups.append(current)
+                    current = []
+            if current:
+                groups.append(current)
+            if len(groups) == len(items):
+                # Every item closed its own group; fall back to positional groups
+                groups = [items[i:i + fan_out] for i in range(0, len(items), fan_out)]
+            items = list(self._executor.map(self._reduce_group, groups))
+        return items[0]
+    
+    def _summarize_hierarchical(self, text, fan_out=None, max_depth=None):
+        """
+        Map-reduce summarization for documents larger than one request
+        
+        Chunks are summarized in parallel (map), then partial summaries are
+        merged in groups of ``fan_out`` (reduce) until one summary remains.
+        With enough workers, latency grows with log(chunks) rather than
+        with the number of chunks.
+        """
+        deadline = self._map_reduce_deadline(text)
+        partials = self._map_reduce_partials(text, fan_out, max_depth, deadline)
+        return self._reduce_group(partials, deadline)
+    
+    def _map_reduce_deadline(self, text):
+        """
+        Admission deadline shared by every call of one map-reduce summary
+        
+        The map and reduce calls together send roughly the document twice
+        (chunks, then their summaries) plus a completion per chunk; at the
+        configured TPM that takes a known time, which replaces the
+        per-request wait (bounded by MAP_REDUCE_MAX_WAIT_SECONDS).
+        """
+        chunks = -(-estimate_tokens(text) // self.CHUNK_TOKEN_BUDGET)
+        tokens = 2 * (estimate_tokens(text) + chunks * self.SUMMARY_MAX_TOKENS)
+        wait = tokens / self.RATE_LIMIT_TPM * 60 + self.RATE_LIMIT_MAX_WAIT_SECONDS
+        return time.monotonic() + min(wait, self.MAP_REDUCE_MAX_WAIT_SECONDS)
+    
+    def _map_reduce_partials(self, text, fan_out=None, max_depth=None, deadline=None):
+        """
+        Run the map step and all but the last reduce level
+        
+        Returns at most ``fan_out`` partial summaries (more only when the
+        depth limit is hit); the caller performs the final merge, which lets
+        the streaming path stream it.
+        """
+        fan_out = max(2, int(fan_out or self.REDUCE_FAN_OUT))
+        max_depth = max(1, int(max_depth or self.MAX_DEPTH))
+        if deadline is None:
+            deadline = self._map_reduce_deadline(text)
+        
+        chunks = self._split_into_chunks(text, self.CHUNK_TOKEN_BUDGET)
+        print(f"Map step: {len(chunks)} chunks (fan-out {fan_out}, max depth {max_depth})")
+        
+        partials = list(self._executor.map(
+            lambda chunk: self._summarize_once(
+                "Please summarize the following section of a longer document:", chunk, deadline
+            ),
+            chunks
+        ))
+        
+        # The caller's final merge is the last reduce level
+        depth = 1
+        while len(partials) > fan_out and depth < max_depth:
+            groups = [partials[i:i + fan_out] for i in range(0, len(partials), fan_out)]
+            print(f"Reduce level {depth}: {len(partials)} partial summaries -> {len(groups)}")
+            partials = list(self._executor.map(lambda group: self._reduce_group(group, deadline), groups))
+            depth += 1
+        
+        return partials
+    
+    @staticmethod
+    def _join_partials(summaries):
+        """Number and join partial summaries for a reduce request"""
+        return "\n\n".join(
+            f"Part {index}:\n{summary}" for index, summary in enumerate(summaries, 1)
+        )
+    
+    def _reduce_group(self, summaries, deadline=None):
+        """Merge a group of partial summaries into one"""
+        if len(summaries) == 1:
+            return summaries[0]
+        return self._summarize_once(self.REDUCE_INSTRUCTION, self._join_partials(summaries), deadline)
+    
+    @staticmethod
+    def _split_into_chunks(text, token_budget):
+        """
+        Split text into chunks that each fit within a token budget
+        
+        Paragraph boundaries are preferred, then sentence boundaries; a
+        single sentence larger than the budget is split by characters.
+        
+        Args:
+            text (str): Text to split
+            token_budget (int): Maximum estimated tokens per chunk
+        
+        Returns:
+            list: Non-empty text chunks in document order
+        """
+        char_budget = max(1, token_budget * 4)
+        
+        pieces = []
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if len(paragraph) <= char_budget:
+                pieces.append(paragraph)
+                continue
+            for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+                while len(sentence) > char_budget:
+                    pieces.append(sentence[:char_budget])
+                    sentence = sentence[char_budget:]
+                if sentence:
+                    pieces.append(sentence)
+        
+        chunks = []
+        current = ""
+        for piece in pieces:
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if len(candidate) <= char_budget:
+                current = candidate
+            else:
+                chunks.append(current)
+                current = piece
+        if current:
+            chunks.append(current)
+        
+        return chunks
+    
     def chat(self, messages, max_tokens=500, temperature=0.7):
         """
         General chat/text generation
@@ -102,7 +795,7 @@ class SummarizationService:
             messages (list): List of message dictionaries with 'role' and 'content'
             max_tokens (int): Maximum tokens to generate
             temperature (float): Sampling temperature
-            
+        
         Returns:
             str: Generated response
         """
@@ -113,26 +806,214 @@ class SummarizationService:
         
         try:
             # Generate response using Groq
-            completion = self.client.chat.completions.create(
-                model=self.MODEL_NAME,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            
-            # Extract the response
-            response = completion.choices[0].message.content
-            
-            return response
-            
+            return self._complete(messages, temperature, max_tokens)
+        
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             print(f"Error during chat generation: {e}")
             raise Exception(f"Chat generation failed: {str(e)}")
     
+    def chat_stream(self, messages, max_tokens=500, temperature=0.7):
+        """
+        General chat/text generation, streaming the response as it is generated
+        
+        Args:
+            messages (list): List of message dictionaries with 'role' and 'content'
+            max_tokens (int): Maximum tokens to generate
+            temperature (float): Sampling temperature
+        
+        Returns:
+            iterator: Response text fragments in order
+        """
+        if not self.initialized or self.client is None:
+            raise Exception("Groq client not initialized. Call initialize() first.")
+        
+        print(f"Streaming response for {len(messages)} messages...")
+        
+        def generate():
+            try:
+                yield from self._complete_stream(messages, temperature, max_tokens)
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                print(f"Error during streaming chat generation: {e}")
+                raise Exception(f"Chat generation failed: {str(e)}")
+        
+        return generate()
+    
+    def create_chat_session(self, system_prompt=None, token_budget=None):
+        """
+        Start a server-side chat session
+        
+        Args:
+            system_prompt (str): System prompt applied to every turn
+            token_budget (int): Prompt token budget before old turns are compacted
+        
+        Returns:
+            dict: 'session_id' and 'token_budget'
+        """
+        if token_budget is not None and int(token_budget) <= self.CHAT_SUMMARY_MAX_TOKENS:
+            raise ValueError(f"Token budget must be greater than {self.CHAT_SUMMARY_MAX_TOKENS}")
+        
+        session = self.sessions.create(system_prompt, token_budget)
+        return {"session_id": session.id, "token_budget": session.token_budget}
+    
+    def end_chat_session(self, session_id):
+        """Discard a chat session; returns True if it existed"""
+        return self.sessions.delete(session_id)
+    
+    @staticmethod
+    def _messages_tokens(messages):
+        return sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+    
+    def chat_session(self, session_id, messages, max_tokens=500, temperature=0.7):
+        """
+        Continue a server-side chat session with only the new turn(s)
+        
+        Once the prompt (system prompt, running summary, recent turns and
+        the completion budget) exceeds the session token budget, the oldest
+        turns are folded into the running summary.
+        
+        Args:
+            session_id (str): Session returned by create_chat_session()
+            messages (list): New message dictionaries with 'role' and 'content'
+            max_tokens (int): Maximum tokens to generate
+            temperature (float): Sampling temperature
+        
+        Returns:
+            dict: 'response', 'session_id', 'prompt_tokens' (estimated) and
+                'compacted'
+        
+        Raises:
+            ValueError: If the session is unknown or messages are invalid
+            Exception: If generation fails
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"Unknown or expired chat session: {session_id}")
+        
+        if not isinstance(messages, list) or not messages or not all(
+            isinstance(m, dict) and m.get("role") and isinstance(m.get("content"), str)
+            for m in messages
+        ):
+            raise ValueError("Messages must be a non-empty list of {'role', 'content'} objects")
+        
+        if not self.initialized or self.client is None:
+            raise Exception("Groq client not initialized. Call initialize() first.")
+        
+        with session.lock:
+            summary = session.summary
+            turns = session.turns + messages
+            compacted = False
+            
+            try:
+                if self._session_prompt_tokens(session, summary, turns) + max_tokens > session.token_budget:
+                    summary, turns, compacted = self._compact(session, summary, turns, max_tokens)
+                
+                prompt = self._session_messages(session, summary, turns)
+                response = self._complete(prompt, temperature, max_tokens)
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                print(f"Error during chat session generation: {e}")
+                raise Exception(f"Chat generation failed: {str(e)}")
+            
+            # What the client would have sent without server-side sessions
+            history_tokens = session.history_tokens + self._messages_tokens(messages)
+            full_history_tokens = self._messages_tokens([{"content": session.system_prompt}]) + history_tokens
+            prompt_tokens = self._messages_tokens(prompt)
+            
+            # Commit only after success so a failed turn can simply be retried
+            reply = {"role": "assistant", "content": response or ""}
+            session.summary = summary
+            session.turns = turns + [reply]
+            session.history_tokens = history_tokens + self._messages_tokens([reply])
+            self.sessions.record_turn(session, prompt_tokens, full_history_tokens, compacted)
+        
+        return {
+            "response": response,
+            "session_id": session.id,
+            "prompt_tokens": prompt_tokens,
+            "compacted": compacted
+        }
+    
+    def _session_messages(self, session, summary, turns):
+        """Prompt for a session given a (possibly tentative) summary and turns"""
+        system = session.system_prompt
+        if summary:
+            system = f"{system}\n\nSummary of the earlier conversation:\n{summary}".strip()
+        return ([{"role": "system", "content": system}] if system else []) + turns
+    
+    def _session_prompt_tokens(self, session, summary, turns):
+        return self._messages_tokens(self._session_messages(session, summary, turns))
+    
+    def _compact(self, session, summary, turns, max_tokens):
+        """
+        Fold the oldest turns into the running summary
+        
+        Recent turns are kept verbatim up to half of the budget left after
+        the completion and the summary; everything older is summarized.
+        
+        Returns:
+            tuple: (summary, remaining turns, whether anything was compacted)
+        """
+        keep_budget = max(0, (session.token_budget - max_tokens - self.CHAT_SUMMARY_MAX_TOKENS) // 2)
+        
+        # Always keep the newest turn; walk back while the recent turns fit
+        split = len(turns) - 1
+        kept_tokens = self._messages_tokens(turns[split:])
+        while split > 0:
+            cost = self._messages_tokens(turns[split - 1:split])
+            if kept_tokens + cost > keep_budget:
+                break
+            kept_tokens += cost
+            split -= 1
+        
+        old_turns = turns[:split]
+        if not old_turns:
+            return summary, turns, False
+        
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in old_turns)
+        new_summary = self._complete(
+            [
+                {"role": "system", "content": self.COMPACTION_PROMPT},
+                {"role": "user", "content": (
+                    f"Current summary:\n{summary or '(none)'}\n\n"
+                    f"New turns to fold in:\n{transcript}\n\n"
+                    "Write the updated summary."
+                )}
+            ],
+            temperature=0.3,
+            max_tokens=self.CHAT_SUMMARY_MAX_TOKENS
+        )
+        print(f"Compacted {len(old_turns)} turns of chat session {session.id}")
+        return new_summary or summary, turns[split:], True
+    
+    def get_coalescing_stats(self):
+        """Get counters of concurrent identical summaries that shared one computation"""
+        return self._flight.get_stats()
+    
+    def get_chat_session_stats(self):
+        """Get session counts, compactions and estimated tokens saved"""
+        return self.sessions.get_stats()
+    
     def is_initialized(self):
         """Check if the client is initialized"""
         return self.initialized
     
+    def has_fallback(self):
+        """Check if the offline extractive fallback is enabled"""
+        return self.FALLBACK_ENABLED
+    
+    def get_cache_stats(self):
+        """Get hit/miss counters and sizes of the completion cache"""
+        return self.cache.get_stats()
+    
+    def get_rate_limit_stats(self):
+        """Get queue depth and throttling metrics of the Groq scheduler"""
+        return self.scheduler.get_stats()
+    
     def get_device(self):
         """Get the device being used (API-based, so returns 'groq-api')"""
         return "groq-api"
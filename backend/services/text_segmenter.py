@@ -0,0 +1,149 @@
+"""
+Text Segmenter - Layout-preserving sentence splitting and request packing
+"""
+
+import re
+
+# A sentence runs up to terminal punctuation (including the Devanagari danda)
+# followed by whitespace, or to the end of its line
+SENTENCE_PATTERN = re.compile(r"\S[^\n]*?(?:[.!?।॥]+[\"'”’)\]]*(?=\s|$)|(?=\n)|$)")
+
+# Inline emotion tags understood by the TTS model, e.g. <laugh>, <sigh>, <whisper>
+EMOTION_TAG_PATTERN = re.compile(r"<[A-Za-z_]+>")
+
+
+def split_segments(text, max_chars=None):
+    """
+    Split text into sentences and the layout between them
+    
+    Whitespace between sentences (spaces, line breaks, blank lines between
+    paragraphs) is kept verbatim in ``gaps`` so that translated or
+    synthesized sentences can be put back into the original layout.
+    
+    Args:
+        text (str): Text to split
+        max_chars (int): If set, sentences longer than this are broken on
+            whitespace (or hard-split when a single word is too long)
+    
+    Returns:
+        tuple: (sentences, gaps) with ``len(gaps) == len(sentences) + 1`` and
+            ``join_segments(sentences, gaps) == text``
+    """
+    sentences = []
+    gaps = []
+    position = 0
+    for match in SENTENCE_PATTERN.finditer(text):
+        sentence = match.group(0).rstrip()
+        gaps.append(text[position:match.start()])
+        position = match.start() + len(sentence)
+        if max_chars and len(sentence) > max_chars:
+            pieces, inner_gaps = _split_long(sentence, max_chars)
+            sentences.extend(pieces)
+            gaps.extend(inner_gaps)
+        else:
+            sentences.append(sentence)
+    gaps.append(text[position:])
+    return sentences, gaps
+
+
+def _split_long(sentence, max_chars):
+    """Break an oversized sentence on whitespace into pieces of at most max_chars"""
+    pieces = []
+    gaps = []
+    current = ""
+    pending_gap = ""
+    for word, space in re.findall(r"(\S+)(\s*)", sentence):
+        if current and len(current) + len(pending_gap) + len(word) <= max_chars:
+            current += pending_gap + word
+        else:
+            if current:
+                pieces.append(current)
+                gaps.append(pending_gap)
+            # A single word longer than the budget is hard-split
+            while len(word) > max_chars:
+                pieces.append(word[:max_chars])
+                gaps.append("")
+                word = word[max_chars:]
+            current = word
+        pending_gap = space
+    pieces.append(current)
+    return pieces, gaps
+
+
+def join_segments(sentences, gaps):
+    """Interleave sentences back into their layout (inverse of split_segments)"""
+    parts = [gaps[0]]
+    for sentence, gap in zip(sentences, gaps[1:]):
+        parts.append(sentence)
+        parts.append(gap)
+    return "".join(parts)
+
+
+def pack_segments(sentences, max_chars, separator_chars=1):
+    """
+    Group consecutive sentences into requests of at most max_chars
+    
+    Args:
+        sentences (list): Sentences in document order
+        max_chars (int): Character budget per request
+        separator_chars (int): Characters added between packed sentences
+    
+    Returns:
+        list: (start, end) index ranges into ``sentences``, in order
+    """
+    packs = []
+    start = 0
+    size = 0
+    for index, sentence in enumerate(sentences):
+        added = len(sentence) + (separator_chars if index > start else 0)
+        if index > start and size + added > max_chars:
+            packs.append((start, index))
+            start = index
+            added = len(sentence)
+            size = 0
+        size += added
+    if start < len(sentences):
+        packs.append((start, len(sentences)))
+    return packs
+
+
+def group_speech_segments(sentences, max_chars, first_max_chars=None, separator_chars=1):
+    """
+    Group consecutive sentences into speech synthesis segments
+    
+    Like pack_segments, except that a sentence made only of emotion tags
+    (e.g. a "<laugh>" after "That's hilarious!") never starts a group: it
+    stays with the sentence it reacts to, even past the budget, so the tag is
+    voiced in context instead of as a segment on its own.
+    
+    Args:
+        sentences (list): Sentences in document order
+        max_chars (int): Character budget per segment
+        first_max_chars (int): Smaller budget for the first segment, so the
+            first audio is ready sooner
+        separator_chars (int): Characters added between grouped sentences
+    
+    Returns:
+        list: (start, end) index ranges into ``sentences``, in order
+    """
+    groups = []
+    start = 0
+    size = 0
+    budget = first_max_chars or max_chars
+    for index, sentence in enumerate(sentences):
+        added = len(sentence) + (separator_chars if index > start else 0)
+        if index > start and size + added > budget and not is_emotion_tags_only(sentence):
+            groups.append((start, index))
+            start = index
+            added = len(sentence)
+            size = 0
+            budget = max_chars
+        size += added
+    if start < len(sentences):
+        groups.append((start, len(sentences)))
+    return groups
+
+
+def is_emotion_tags_only(sentence):
+    """Check whether a sentence holds nothing but emotion tags (and punctuation)"""
+    return not re.sub(r"[\W_]+", "", EMOTION_TAG_PATTERN.sub("", sentence))
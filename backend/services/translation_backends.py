@@ -0,0 +1,439 @@
+"""
+Translation Backends - Pluggable translation engines with health-scored routing and failover
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class BackendUnavailable(Exception):
+    """Raised when no translation backend could serve a request"""
+
+
+class TranslationBackend:
+    """
+    Base class of a translation engine
+    
+    Subclasses implement ``translate_batch`` and may override ``prepare``
+    for one-off setup such as loading a model. ``cacheable`` tells callers
+    whether results are good enough to keep in the translation memory, and
+    ``degraded`` marks last-resort engines the router only uses when every
+    regular engine is unavailable.
+    """
+    
+    name = "backend"
+    cacheable = True
+    degraded = False
+    
+    def supports(self, source_code, target_code):
+        """Check whether this engine can translate between two language codes"""
+        return True
+    
+    def prepare(self, source_code, target_code):
+        """
+        Get ready to translate a language pair
+        
+        Called by the router before each attempt, outside the timed call,
+        so slow first-use setup neither times out nor counts against the
+        engine's health. Raising skips the engine for this request.
+        """
+    
+    def translate_batch(self, segments, source_code, target_code):
+        """
+        Translate segments
+        
+        Args:
+            segments (list): Non-empty texts, jointly under the request limit
+            source_code (str): Source language code (or "auto")
+            target_code (str): Target language code
+        
+        Returns:
+            list: One translation per segment, in order
+        """
+        raise NotImplementedError
+
+
+class DictionaryBackend(TranslationBackend):
+    """
+    Offline word-for-word engine backed by a glossary
+    
+    Words found in the glossary are replaced and everything else passes
+    through unchanged. A segment without a single glossary word (or a
+    target without a glossary) raises BackendUnavailable rather than
+    coming back untranslated, so the router reports the failure instead of
+    returning the source text. A last-resort engine (results are not
+    cached) and a deterministic stand-in in tests; off unless listed.
+    """
+    
+    name = "dictionary"
+    cacheable = False
+    degraded = True
+    
+    WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+    
+    def __init__(self, glossary=None):
+        """
+        Args:
+            glossary (dict | str): {target_code: {word: translation}}, or the
+                path of a JSON file with that structure
+        """
+        if isinstance(glossary, str):
+            with open(glossary, encoding="utf-8") as f:
+                glossary = json.load(f)
+        self.glossary = {
+            target: {word.lower(): translation for word, translation in words.items()}
+            for target, words in (glossary or {}).items()
+        }
+    
+    def translate_batch(self, segments, source_code, target_code):
+        words = self.glossary.get(target_code, {})
+        if not words:
+            raise BackendUnavailable(f"No glossary for '{target_code}'")
+        translations = []
+        for segment in segments:
+            if not any(match.group(0).lower() in words for match in self.WORD_PATTERN.finditer(segment)):
+                raise BackendUnavailable(f"Glossary for '{target_code}' covers no word of a segment")
+            translations.append(
+                self.WORD_PATTERN.sub(lambda match: words.get(match.group(0).lower(), match.group(0)), segment)
+            )
+        return translations
+
+
+class MarianBackend(TranslationBackend):
+    """
+    Local CPU engine using Helsinki-NLP MarianMT models from Hugging Face
+    
+    One model per language pair is loaded on first use (in prepare(), so
+    outside the router's timed attempt) and kept in memory. Pairs without a
+    published model are remembered and skipped afterwards.
+    The source language must be known, so "auto" is not supported.
+    """
+    
+    name = "marian"
+    
+    def __init__(self, model_template="Helsinki-NLP/opus-mt-{source}-{target}", max_length=512):
+        """
+        Args:
+            model_template (str): Model name pattern with {source} and {target}
+            max_length (int): Maximum generated tokens per segment
+        """
+        self.model_template = model_template
+        self.max_length = max_length
+        self._models = {}
+        self._unavailable = set()
+        self._lock = threading.Lock()
+    
+    def supports(self, source_code, target_code):
+        return source_code not in (None, "auto") and (source_code, target_code) not in self._unavailable
+    
+    def prepare(self, source_code, target_code):
+        self._load(source_code, target_code)
+    
+    def _load(self, source_code, target_code):
+        pair = (source_code, target_code)
+        with self._lock:
+            if pair in self._models:
+                return self._models[pair]
+            name = self.model_template.format(source=source_code, target=target_code)
+            try:
+                from transformers import MarianMTModel, MarianTokenizer
+                print(f"Loading MarianMT model {name}...")
+                tokenizer = MarianTokenizer.from_pretrained(name)
+                model = MarianMTModel.from_pretrained(name).eval()
+            except Exception as e:
+                print(f"MarianMT model {name} unavailable: {e}")
+                self._unavailable.add(pair)
+                raise
+            # Generation is not thread-safe per model instance
+            self._models[pair] = (tokenizer, model, threading.Lock())
+            return self._models[pair]
+    
+    def translate_batch(self, segments, source_code, target_code):
+        import torch
+        
+        tokenizer, model, lock = self._load(source_code, target_code)
+        with lock, torch.inference_mode():
+            inputs = tokenizer(list(segments), return_tensors="pt", padding=True, truncation=True)
+            outputs = model.generate(**inputs, max_length=self.max_length)
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open circuit breaker
+    
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_seconds``; then a single trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+    
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def available(self):
+        """Check whether allow() could let a call through, without claiming a half-open trial"""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.reset_seconds
+            return self.state == "closed" or not self._trial_in_flight
+    
+    def allow(self):
+        """Check whether a call may be attempted now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class BackendHealth:
+    """Exponentially weighted latency and error rate of one backend, plus its breaker"""
+    
+    ALPHA = 0.2
+    
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+    
+    def record(self, latency, ok):
+        with self._lock:
+            self.calls += 1
+            if latency is not None:
+                self.latency = latency if self.latency is None else (
+                    (1 - self.ALPHA) * self.latency + self.ALPHA * latency
+                )
+            self.error_rate = (1 - self.ALPHA) * self.error_rate + self.ALPHA * (0.0 if ok else 1.0)
+            if not ok:
+                self.failures += 1
+    
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+    
+    def score(self, timeout_seconds):
+        """Expected cost of a call in seconds; lower is better"""
+        latency = self.latency if self.latency is not None else 0.0
+        # Errors cost a full timeout plus the retry on the next backend
+        return latency + self.error_rate * 2 * timeout_seconds
+
+
+class BackendRouter:
+    """
+    Routes translation requests across backends by health score
+    
+    Regular backends are tried in order of expected cost (EWMA latency
+    plus an error penalty, with a small bias towards the configured order
+    so a preferred engine keeps traffic while it is healthy). Backends
+    whose circuit is open are skipped. A call that fails, or that has not
+    answered within ``timeout_seconds``, is failed over to the next one,
+    which bounds tail latency when a backend degrades; the timeout applies
+    to the last candidate too, so a request never waits on a hanging
+    backend. Degraded backends are only used when everything else failed.
+    
+    Each backend runs on its own bounded thread pool: calls abandoned on a
+    hanging backend keep only that backend's workers busy, so they cannot
+    delay (and time out) calls to the healthy ones.
+    """
+    
+    def __init__(self, backends, timeout_seconds=8.0, failure_threshold=5, reset_seconds=30.0,
+                 preference_seconds=0.5, max_workers=8):
+        """
+        Args:
+            backends (list): TranslationBackend instances in order of preference
+            timeout_seconds (float): Time after which a slow call is abandoned (and fails over)
+            failure_threshold (int): Consecutive failures that open a circuit
+            reset_seconds (float): How long an open circuit refuses calls
+            preference_seconds (float): Score bias per position in ``backends``
+            max_workers (int): Concurrent calls per backend
+        """
+        self.backends = list(backends)
+        self.timeout_seconds = timeout_seconds
+        self.preference_seconds = preference_seconds
+        self.health = {
+            backend.name: BackendHealth(CircuitBreaker(failure_threshold, reset_seconds))
+            for backend in self.backends
+        }
+        self._stats = {"requests": 0, "failovers": 0, "exhausted": 0}
+        self._stats_lock = threading.Lock()
+        self._executors = {
+            backend.name: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"translate-{backend.name}")
+            for backend in self.backends
+        }
+    
+    def _candidates(self, source_code, target_code):
+        ranked = []
+        for position, backend in enumerate(self.backends):
+            if not backend.supports(source_code, target_code):
+                continue
+            score = self.health[backend.name].score(self.timeout_seconds) + position * self.preference_seconds
+            ranked.append((backend.degraded, score, position, backend))
+        ranked.sort(key=lambda item: item[:3])
+        return [backend for *_, backend in ranked]
+    
+    def _call(self, backend, segments, source_code, target_code, abandoned):
+        health = self.health[backend.name]
+        started = time.monotonic()
+        try:
+            result = backend.translate_batch(segments, source_code, target_code)
+            if len(result) != len(segments):
+                raise ValueError(f"{backend.name} returned {len(result)} results for {len(segments)} segments")
+        except Exception:
+            health.record(time.monotonic() - started, ok=False)
+            # An abandoned call's failure was already counted as its timeout
+            if not abandoned.is_set():
+                health.breaker.record_failure()
+            raise
+        health.record(time.monotonic() - started, ok=True)
+        # A call the router already gave up on must not close the circuit
+        if not abandoned.is_set():
+            health.breaker.record_success()
+        return result
+    
+    def translate(self, segments, source_code, target_code):
+        """
+        Translate segments on the best available backend
+        
+        Returns:
+            tuple: (translations in order, TranslationBackend that produced them)
+        
+        Raises:
+            BackendUnavailable: If every backend failed or was unavailable
+        """
+        with self._stats_lock:
+            self._stats["requests"] += 1
+        
+        candidates = self._candidates(source_code, target_code)
+        errors = []
+        attempted = 0
+        for index, backend in enumerate(candidates):
+            health = self.health[backend.name]
+            if not health.breaker.available():
+                continue
+            # Candidates whose circuit would still let a call through
+            remaining = sum(self.health[other.name].breaker.available() for other in candidates[index + 1:])
+            next_step = "failing over" if remaining else "no backend left"
+            try:
+                backend.prepare(source_code, target_code)
+            except Exception as e:
+                # Setup failures are about the language pair, not the engine's health
+                errors.append(f"{backend.name}: {e}")
+                print(f"Translation backend {backend.name} could not prepare {source_code}->{target_code} ({e}), {next_step}")
+                continue
+            if not health.breaker.allow():
+                continue
+            if attempted:
+                with self._stats_lock:
+                    self._stats["failovers"] += 1
+            attempted += 1
+            
+            abandoned = threading.Event()
+            future = self._executors[backend.name].submit(self._call, backend, segments, source_code, target_code, abandoned)
+            try:
+                result = future.result(timeout=self.timeout_seconds)
+                return result, backend
+            except FutureTimeoutError:
+                # Let the slow call finish in the background; its latency still counts
+                abandoned.set()
+                health.record_timeout()
+                health.breaker.record_failure()
+                errors.append(f"{backend.name}: no answer within {self.timeout_seconds}s")
+                print(f"Translation backend {backend.name} timed out, {next_step}")
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+                print(f"Translation backend {backend.name} failed ({e}), {next_step}")
+        
+        with self._stats_lock:
+            self._stats["exhausted"] += 1
+        raise BackendUnavailable("No translation backend available: " + ("; ".join(errors) or "all circuits open"))
+    
+    def get_stats(self):
+        """
+        Get routing counters and per-backend health
+        
+        Returns:
+            dict: Request, failover and exhaustion counters plus each
+                backend's circuit state, EWMA latency, error rate and calls
+        """
+        backends = {}
+        for backend in self.backends:
+            health = self.health[backend.name]
+            backends[backend.name] = {
+                "state": health.breaker.state,
+                "circuit_opens": health.breaker.opens,
+                "latency_ms": round(health.latency * 1000, 1) if health.latency is not None else None,
+                "error_rate": round(health.error_rate, 3),
+                "calls": health.calls,
+                "failures": health.failures,
+                "timeouts": health.timeouts,
+                "degraded": backend.degraded
+            }
+        with self._stats_lock:
+            return {**self._stats, "backends": backends}
+
+
+def build_backends(names, extra=None):
+    """
+    Instantiate backends from a list of names
+    
+    Args:
+        names (list): Backend names in order of preference
+        extra (dict): Prebuilt backends by name (e.g. provider clients that
+            need service-specific setup)
+    
+    Returns:
+        list: TranslationBackend instances (unknown names are skipped)
+    """
+    extra = extra or {}
+    backends = []
+    for name in names:
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name in extra:
+            backends.append(extra[name])
+        elif name == "dictionary":
+            backends.append(DictionaryBackend(os.getenv("TRANSLATE_GLOSSARY_PATH") or None))
+        elif name == "marian":
+            backends.append(MarianBackend(
+                model_template=os.getenv("TRANSLATE_MARIAN_MODEL_TEMPLATE", "Helsinki-NLP/opus-mt-{source}-{target}")
+            ))
+        else:
+            print(f"Warning: unknown translation backend '{name}' ignored")
+    return backends
@@ -2,11 +2,182 @@
 Translation Service - Handles text translation using deep-translator library
 """
 
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
 from deep_translator import GoogleTranslator
-from langdetect import detect, DetectorFactory
+from deep_translator import google as deep_translator_google
+from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
+from deep_translator.exceptions import RequestError
+from services.cache import TieredCache, make_cache_key, normalize_text
+from services.single_flight import SingleFlight
+from services.text_segmenter import split_segments, join_segments, pack_segments
+from services.translator_pool import TranslatorPool
+from services.language_detector import LanguageDetector
+from services.translation_backends import BackendRouter, TranslationBackend, build_backends
+from services.micro_batcher import MicroBatcher
 
-# Make language detection deterministic
-DetectorFactory.seed = 0
+# Detector codes that Google Translate spells differently
+GOOGLE_CODES = {"zh-cn": "zh-CN", "zh-tw": "zh-TW", "he": "iw"}
+
+
+# deep-translator sends every request with deep_translator.google's
+# module-level requests.get; fail here rather than silently bypass the
+# pooled sessions if a release stops doing so
+if not callable(getattr(getattr(deep_translator_google, "requests", None), "get", None)):
+    raise ImportError("deep_translator.google does not expose requests.get; "
+                      "PooledGoogleTranslator cannot route its requests")
+
+
+class _SessionRequests:
+    """
+    Stand-in for the requests module inside deep_translator.google
+    
+    It is installed only while at least one PooledGoogleTranslator is
+    translating, and the original module is put back when the last one
+    finishes. While installed, get() goes through the translating thread's
+    client session with its timeouts; calls from other threads (e.g. a
+    plain GoogleTranslator) and every other attribute use the real module.
+    """
+    
+    def __init__(self, module):
+        self._module = module
+        self._original = module.requests
+        self._active = threading.local()
+        self._lock = threading.Lock()
+        self._users = 0
+    
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+    
+    @contextmanager
+    def using(self, client):
+        """Route this thread's library requests through ``client`` for a with-block"""
+        with self._lock:
+            if self._users == 0:
+                self._original = self._module.requests
+                self._module.requests = self
+            self._users += 1
+        outer = getattr(self._active, "client", None)
+        self._active.client = client
+        try:
+            yield
+        finally:
+            self._active.client = outer
+            with self._lock:
+                self._users -= 1
+                if self._users == 0:
+                    self._module.requests = self._original
+    
+    def get(self, url, **kwargs):
+        client = getattr(self._active, "client", None)
+        if client is None:
+            return self._original.get(url, **kwargs)
+        kwargs.setdefault("timeout", client.timeout)
+        return client.session.get(url, **kwargs)
+
+
+_session_requests = _SessionRequests(deep_translator_google)
+
+
+class PooledGoogleTranslator(GoogleTranslator):
+    """
+    GoogleTranslator that sends its requests through a keep-alive session
+    
+    deep-translator issues every request with a module-level requests.get,
+    so each call opens a fresh TCP/TLS connection and has no timeout. This
+    subclass keeps the library's request, parsing and retry logic and only
+    injects one requests.Session per client, with explicit connect/read
+    timeouts. The library keeps per-call state (URL parameters, source
+    language) on the instance, so a client must only be used by one thread
+    at a time (see TranslatorPool).
+    """
+    
+    def __init__(self, source="auto", target="en", timeout=(3.05, 10.0), **kwargs):
+        """
+        Args:
+            source (str): Source language code ("auto" to let Google detect it)
+            target (str): Target language code
+            timeout (tuple): (connect, read) timeouts in seconds
+        """
+        super().__init__(source=source, target=target, **kwargs)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+    
+    def translate(self, text, source=None, **kwargs):
+        """
+        Translate one text (at most 5000 characters)
+        
+        Args:
+            text (str): Text to translate
+            source (str): Source language code for this call (defaults to
+                the client's source)
+        
+        Returns:
+            str: Translated text
+        
+        Raises:
+            TooManyRequests: If Google rate limits the client
+            RequestError: If the request fails or times out
+            TranslationNotFound: If the response has no translation
+        """
+        previous = self.source
+        if source:
+            self.source = source
+        try:
+            with _session_requests.using(self):
+                return super().translate(text, **kwargs)
+        except requests.RequestException as e:
+            raise RequestError() from e
+        finally:
+            self.source = previous
+    
+    def close(self):
+        """Close the underlying HTTP session"""
+        self.session.close()
+
+
+class GoogleBackend(TranslationBackend):
+    """
+    Google Translate through pooled deep-translator clients
+    
+    Consecutive segments are sent as one newline-separated request. If the
+    provider merges or splits lines so that the result cannot be mapped
+    back one-to-one, the pack is retried segment by segment.
+    """
+    
+    name = "google"
+    
+    def __init__(self, translators):
+        """
+        Args:
+            translators (TranslatorPool): Pool of PooledGoogleTranslator clients
+        """
+        self.translators = translators
+    
+    def supports(self, source_code, target_code):
+        return GOOGLE_CODES.get(target_code, target_code) in GOOGLE_LANGUAGES_TO_CODES.values()
+    
+    def translate_batch(self, segments, source_code, target_code):
+        with self.translators.client(target_code) as translator:
+            if len(segments) == 1:
+                return [translator.translate(segments[0], source=source_code) or segments[0]]
+            
+            translated = translator.translate("\n".join(segments), source=source_code) or ""
+            lines = [line.strip() for line in translated.split("\n") if line.strip()]
+            if len(lines) == len(segments):
+                return lines
+            
+            print(f"Segment count mismatch ({len(lines)} != {len(segments)}), translating pack per segment")
+            return [
+                result or segment
+                for segment, result in zip(segments, translator.translate_batch(segments, source=source_code))
+            ]
 
 
 class TranslationService:
@@ -24,19 +195,103 @@ class TranslationService:
         "English": "en"
     }
     
+    # Segmented translation settings (Google Translate rejects requests over 5000 chars)
+    MAX_REQUEST_CHARS = int(os.getenv("TRANSLATE_MAX_REQUEST_CHARS", "4500"))
+    MAX_WORKERS = int(os.getenv("TRANSLATE_MAX_WORKERS", "4"))
+    # Smaller packs for streaming, so the first text appears after one short request
+    STREAM_PACK_CHARS = int(os.getenv("TRANSLATE_STREAM_PACK_CHARS", "800"))
+    
+    # Translator client pool (one keep-alive HTTP session per client)
+    POOL_SIZE = int(os.getenv("TRANSLATE_POOL_SIZE", "8"))
+    POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_POOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+    CONNECT_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_CONNECT_TIMEOUT_SECONDS", "3.05"))
+    READ_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_READ_TIMEOUT_SECONDS", "10"))
+    
+    # Translation backends, in order of preference ("google", "marian", "dictionary")
+    BACKENDS = os.getenv("TRANSLATE_BACKENDS", "google")
+    BACKEND_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_BACKEND_TIMEOUT_SECONDS", "8"))
+    BREAKER_FAILURES = int(os.getenv("TRANSLATE_BREAKER_FAILURES", "5"))
+    BREAKER_RESET_SECONDS = float(os.getenv("TRANSLATE_BREAKER_RESET_SECONDS", "30"))
+    
+    # Opt-in micro-batching of concurrent small requests into one upstream call
+    MICRO_BATCH_ENABLED = os.getenv("TRANSLATE_MICRO_BATCH", "false").lower() == "true"
+    MICRO_BATCH_WINDOW_MS = float(os.getenv("TRANSLATE_MICRO_BATCH_WINDOW_MS", "5"))
+    MICRO_BATCH_MAX_SIZE = int(os.getenv("TRANSLATE_MICRO_BATCH_MAX_SIZE", "16"))
+    
+    # Source language detection (below the confidence threshold Google auto-detects)
+    DETECT_SAMPLE_CHARS = int(os.getenv("TRANSLATE_DETECT_SAMPLE_CHARS", "512"))
+    DETECT_MIN_CONFIDENCE = float(os.getenv("TRANSLATE_DETECT_MIN_CONFIDENCE", "0.8"))
+    
+    # Segment translation memory (set TRANSLATION_MEMORY_DB="" to keep it in memory only)
+    MEMORY_DB_PATH = os.getenv("TRANSLATION_MEMORY_DB", "./cache/translation_memory.sqlite3")
+    MEMORY_MEMORY_MB = float(os.getenv("TRANSLATION_MEMORY_MEMORY_MB", "16"))
+    MEMORY_DISK_MB = float(os.getenv("TRANSLATION_MEMORY_DISK_MB", "256"))
+    MEMORY_TTL_SECONDS = float(os.getenv("TRANSLATION_MEMORY_TTL_SECONDS", str(30 * 24 * 3600)))
+    
     def __init__(self):
         self.initialized = False
-        
+        self._flight = SingleFlight("translate")
+        self.detector = LanguageDetector(sample_chars=self.DETECT_SAMPLE_CHARS)
+        # Translation memory of individual sentences, keyed by
+        # (normalized sentence, source language, target language)
+        self.memory = TieredCache(
+            "translation_memory",
+            db_path=self.MEMORY_DB_PATH or None,
+            max_memory_bytes=int(self.MEMORY_MEMORY_MB * 1024 * 1024),
+            max_disk_bytes=int(self.MEMORY_DISK_MB * 1024 * 1024),
+            ttl_seconds=self.MEMORY_TTL_SECONDS
+        )
+        self.translators = TranslatorPool(
+            lambda target_code: PooledGoogleTranslator(
+                source="auto",
+                target=target_code,
+                timeout=(self.CONNECT_TIMEOUT_SECONDS, self.READ_TIMEOUT_SECONDS)
+            ),
+            max_size=self.POOL_SIZE,
+            acquire_timeout=self.POOL_ACQUIRE_TIMEOUT_SECONDS
+        )
+        self.router = BackendRouter(
+            build_backends(self.BACKENDS.split(","), extra={"google": GoogleBackend(self.translators)}),
+            timeout_seconds=self.BACKEND_TIMEOUT_SECONDS,
+            failure_threshold=self.BREAKER_FAILURES,
+            reset_seconds=self.BREAKER_RESET_SECONDS,
+            max_workers=self.POOL_SIZE
+        )
+        self.translate_batcher = None
+        self.detect_batcher = None
+        if self.MICRO_BATCH_ENABLED:
+            # Packs for the same language pair are merged up to the request size limit
+            self.translate_batcher = MicroBatcher(
+                "translate",
+                self._translate_packs,
+                window_seconds=self.MICRO_BATCH_WINDOW_MS / 1000,
+                max_batch=self.MICRO_BATCH_MAX_SIZE,
+                max_weight=self.MAX_REQUEST_CHARS,
+                weight=lambda segments: sum(len(segment) + 1 for segment in segments)
+            )
+            self.detect_batcher = MicroBatcher(
+                "detect",
+                lambda key, texts: self.detector.detect_batch(texts),
+                window_seconds=self.MICRO_BATCH_WINDOW_MS / 1000,
+                max_batch=self.MICRO_BATCH_MAX_SIZE
+            )
+        # Shared, bounded pool so concurrent long documents cannot flood the provider
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.MAX_WORKERS,
+            thread_name_prefix="translate"
+        )
+    
     def initialize(self):
         """Initialize the translator"""
         if self.initialized:
             print("Translation service already initialized")
             return True
-            
+        
         try:
             print("Initializing translation service...")
-            # deep-translator doesn't need explicit initialization
-            # Just verify it's available
+            # deep-translator doesn't need explicit initialization; load the
+            # language profiles now so the first request doesn't pay for it
+            self.detector.warm_up()
             self.initialized = True
             print("Translation service initialized successfully!")
             return True
@@ -44,17 +299,19 @@ class TranslationService:
             print(f"Error initializing translation service: {e}")
             raise
     
-    def translate(self, text, target_language):
+    def translate(self, text, target_language, source_language=None):
         """
         Translate the given text to target language
         
         Args:
             text (str): Text to translate
             target_language (str): Target language name (e.g., "Hindi", "French")
-            
+            source_language (str): Optional source language name or code; when
+                given, language detection is skipped
+        
         Returns:
             dict: Dictionary with translated text and detected source language
-            
+        
         Raises:
             ValueError: If text is empty or language not supported
             Exception: If translation fails
@@ -69,44 +326,378 @@ class TranslationService:
         target_code = self.LANGUAGE_MAP.get(target_language)
         if not target_code:
             raise ValueError(f"Unsupported language: {target_language}")
+        source_code = self._resolve_source(source_language)
+        
+        # Concurrent identical requests share one upstream translation; the
+        # layout is part of the result, so only outer whitespace (stripped
+        # from the output anyway) is ignored
+        key = make_cache_key("translate", text.strip(), source_code, target_code)
+        return dict(self._flight.do(
+            key, lambda: self._translate(text, target_language, target_code, source_code)
+        ))
+    
+    def _resolve_source(self, source_language):
+        """
+        Map a client-supplied source language to a language code
         
+        Returns:
+            str | None: Language code, or None if detection is needed
+        
+        Raises:
+            ValueError: If the language is unknown or not a string
+        """
+        if source_language is None:
+            return None
+        if not isinstance(source_language, str):
+            raise ValueError(f"Source language must be a string, got {type(source_language).__name__}")
+        if not source_language or source_language == "auto":
+            return None
+        if source_language in self.LANGUAGE_MAP:
+            return self.LANGUAGE_MAP[source_language]
+        code = source_language.lower()
+        if GOOGLE_CODES.get(code, code) in GOOGLE_LANGUAGES_TO_CODES.values():
+            return code
+        raise ValueError(f"Unsupported source language: {source_language}")
+    
+    def _detect_source(self, text, source_code=None):
+        """
+        Determine the source language once per request
+        
+        Args:
+            text (str): Text to translate
+            source_code (str): Client-supplied source code (skips detection)
+        
+        Returns:
+            tuple: (source language code, confidence or None if supplied by
+                the client, code to send upstream)
+        """
+        if source_code:
+            return source_code, None, GOOGLE_CODES.get(source_code, source_code)
+        try:
+            detection = self._detect(text)
+        except Exception as e:
+            # Detection is only a hint: never fail the translation over it
+            print(f"Language detection failed: {e}")
+            return "auto", 0.0, "auto"
+        
+        language, confidence = detection["language"], detection["confidence"]
+        # Let Google decide when our guess is uncertain
+        upstream = GOOGLE_CODES.get(language, language) if confidence >= self.DETECT_MIN_CONFIDENCE else "auto"
+        return language, confidence, upstream
+    
+    def _translate(self, text, target_language, target_code, source_code=None):
+        """Validated body of translate(), run once per coalesced key"""
         print(f"Translating text to {target_language} ({target_code})...")
         print(f"Text length: {len(text)} chars")
         
         try:
-            # Detect source language
-            try:
-                source_lang = detect(text)
-            except:
-                source_lang = "auto"
+            source = self._detect_source(text, source_code)
+            segments = split_segments(text, self.MAX_REQUEST_CHARS)
+            result = self._translate_segments(segments, source, target_code)
             
-            # Perform translation using deep-translator
-            translator = GoogleTranslator(source='auto', target=target_code)
-            translated_text = translator.translate(text)
-            
-            print(f"Translation successful! Detected source language: {source_lang}")
-            print(f"Translated text length: {len(translated_text)} chars")
+            print(f"Translation successful! Source language: {source[0]} (confidence: {source[1]})")
+            print(f"Translated text length: {len(result['translated'])} chars "
+                  f"({result['segments']} segments, {result['segments_from_memory']} from memory, "
+                  f"{result['requests']} requests)")
             
             return {
-                "translated": translated_text,
-                "source_language": source_lang,
+                "translated": result["translated"],
+                "source_language": source[0],
+                "source_confidence": source[1],
                 "target_language": target_language,
-                "target_code": target_code
+                "target_code": target_code,
+                "segments": result["segments"],
+                "segments_from_memory": result["segments_from_memory"],
+                "requests": result["requests"],
+                "backends": result["backends"]
             }
-            
+        
         except Exception as e:
             print(f"Translation error: {e}")
             raise Exception(f"Translation failed: {str(e)}")
     
+    def _translate_segments(self, segments, source, target_code):
+        """
+        Translate already split text into one target language
+        
+        Args:
+            segments (tuple): (sentences, gaps) from split_segments
+            source (tuple): (source code, confidence, upstream code) from _detect_source
+            target_code (str): Target language code
+        
+        Returns:
+            dict: Translated text plus segment, memory-hit and request counts
+        """
+        sentences, gaps = segments
+        translated, from_memory, requests_sent, backends = self._translate_sentences(
+            sentences, source, target_code
+        )
+        return {
+            "translated": join_segments(translated, gaps).strip(),
+            "segments": len(sentences),
+            "segments_from_memory": from_memory,
+            "requests": requests_sent,
+            "backends": backends
+        }
+    
+    def _translate_sentences(self, sentences, source, target_code):
+        """
+        Translate sentences through the translation memory
+        
+        Known sentences are served from memory; each distinct missing
+        sentence is sent upstream once, packed into requests under the size
+        limit that run on the shared pool.
+        
+        Returns:
+            tuple: (translations in input order, sentences served from
+                memory, upstream requests sent, requests per backend name)
+        """
+        source_lang, _, upstream_source = source
+        # An uncertain detection must not file translations under its guess
+        memory_source = "auto" if upstream_source == "auto" else source_lang
+        
+        keys = [self._memory_key(sentence, memory_source, target_code) for sentence in sentences]
+        translated = [None] * len(sentences)
+        missing = {}
+        from_memory = 0
+        for index, key in enumerate(keys):
+            if key in missing:
+                continue
+            cached = self.memory.get(key)
+            if cached is not None:
+                translated[index] = cached
+                from_memory += 1
+            else:
+                missing[key] = sentences[index]
+        
+        pending = list(missing.values())
+        packs = pack_segments(pending, self.MAX_REQUEST_CHARS)
+        if len(packs) == 1:
+            results = [self._translate_pack(pending, upstream_source, target_code)]
+        else:
+            results = self._executor.map(
+                lambda pack: self._translate_pack(pending[pack[0]:pack[1]], upstream_source, target_code),
+                packs
+            )
+        
+        missing_keys = list(missing)
+        backends = {}
+        for (start, end), (pack_result, backend) in zip(packs, results):
+            backends[backend.name] = backends.get(backend.name, 0) + 1
+            for key, result in zip(missing_keys[start:end], pack_result):
+                missing[key] = result
+                # Keep last-resort output out of the memory so it gets retried
+                if backend.cacheable:
+                    self.memory.set(key, result)
+        
+        # Reassemble in input order
+        for index, key in enumerate(keys):
+            if translated[index] is None:
+                translated[index] = missing[key]
+        
+        return translated, from_memory, len(packs), backends
+    
+    def translate_stream(self, text, target_language, source_language=None):
+        """
+        Translate text and yield the result in document order as it becomes ready
+        
+        Sentences are packed into small requests that are all translated
+        concurrently; a pack is emitted as soon as it and every pack before
+        it are done, so the first text is visible after one request.
+        Validation happens eagerly so bad input fails before streaming starts.
+        
+        Args:
+            text (str): Text to translate
+            target_language (str): Target language name (e.g., "Hindi", "French")
+            source_language (str): Optional source language name or code
+        
+        Returns:
+            generator: Event dicts: one "start", a "segment" per pack whose
+                "text" values concatenate to the full translation, then "done"
+        
+        Raises:
+            ValueError: If text is empty or language not supported
+        """
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        
+        if not self.initialized:
+            raise Exception("Translation service not initialized. Call initialize() first.")
+        
+        target_code = self.LANGUAGE_MAP.get(target_language)
+        if not target_code:
+            raise ValueError(f"Unsupported language: {target_language}")
+        source_code = self._resolve_source(source_language)
+        
+        return self._translate_stream(text, target_language, target_code, source_code)
+    
+    def _translate_stream(self, text, target_language, target_code, source_code):
+        source = self._detect_source(text, source_code)
+        sentences, gaps = split_segments(text.strip(), self.MAX_REQUEST_CHARS)
+        packs = pack_segments(sentences, min(self.STREAM_PACK_CHARS, self.MAX_REQUEST_CHARS))
+        
+        yield {
+            "type": "start",
+            "source_language": source[0],
+            "source_confidence": source[1],
+            "target_language": target_language,
+            "target_code": target_code,
+            "segments": len(sentences),
+            "packs": len(packs)
+        }
+        
+        # Submitted in document order, so the shared pool works on the
+        # earliest packs first. Each pack holds at most STREAM_PACK_CHARS,
+        # so _translate_sentences sends it as a single inline request.
+        futures = [
+            self._executor.submit(self._translate_sentences, sentences[start:end], source, target_code)
+            for start, end in packs
+        ]
+        from_memory = 0
+        requests_sent = 0
+        backends = {}
+        try:
+            for index, ((start, end), future) in enumerate(zip(packs, futures)):
+                translated, pack_from_memory, pack_requests, pack_backends = future.result()
+                from_memory += pack_from_memory
+                requests_sent += pack_requests
+                for name, count in pack_backends.items():
+                    backends[name] = backends.get(name, 0) + count
+                
+                # Put each sentence back after the layout that preceded it
+                parts = []
+                for offset, sentence in enumerate(translated):
+                    if start + offset > 0:
+                        parts.append(gaps[start + offset])
+                    parts.append(sentence)
+                yield {"type": "segment", "index": index, "text": "".join(parts)}
+        finally:
+            # Client went away or a pack failed: drop packs that haven't started
+            for future in futures:
+                future.cancel()
+        
+        yield {
+            "type": "done",
+            "segments_from_memory": from_memory,
+            "requests": requests_sent,
+            "backends": backends
+        }
+    
+    def translate_multi(self, text, target_languages, source_language=None):
+        """
+        Translate one text into several languages at once
+        
+        The source language is detected and the text segmented a single
+        time; every target is then translated concurrently, sharing the
+        translation memory and the client pool.
+        
+        Args:
+            text (str): Text to translate
+            target_languages (list): Target language names from LANGUAGE_MAP
+            source_language (str): Optional source language name or code
+        
+        Returns:
+            dict: Source language, per-language results with timings, and
+                per-language errors for targets that failed
+        
+        Raises:
+            ValueError: If text is empty or a language is not supported
+        """
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        
+        if not self.initialized:
+            raise Exception("Translation service not initialized. Call initialize() first.")
+        
+        if not isinstance(target_languages, list) or not target_languages:
+            raise ValueError("'targetLangs' must be a non-empty list")
+        targets = list(dict.fromkeys(target_languages))
+        unsupported = [language for language in targets if language not in self.LANGUAGE_MAP]
+        if unsupported:
+            raise ValueError(f"Unsupported language: {', '.join(map(str, unsupported))}")
+        source_code = self._resolve_source(source_language)
+        
+        print(f"Translating text to {len(targets)} languages: {', '.join(targets)}")
+        started = time.perf_counter()
+        source = self._detect_source(text, source_code)
+        segments = split_segments(text, self.MAX_REQUEST_CHARS)
+        
+        def run(target_language):
+            target_started = time.perf_counter()
+            result = self._translate_segments(segments, source, self.LANGUAGE_MAP[target_language])
+            result["target_code"] = self.LANGUAGE_MAP[target_language]
+            result["elapsed_ms"] = round((time.perf_counter() - target_started) * 1000, 1)
+            return result
+        
+        # Targets get their own short-lived pool: their packs already run on
+        # the shared executor, and nesting both on it could deadlock
+        results = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="translate-multi") as pool:
+            futures = {language: pool.submit(run, language) for language in targets}
+            for language, future in futures.items():
+                try:
+                    results[language] = future.result()
+                except Exception as e:
+                    print(f"Translation to {language} failed: {e}")
+                    errors[language] = str(e)
+        
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"Multi-target translation finished in {elapsed_ms} ms ({len(errors)} failed)")
+        return {
+            "source_language": source[0],
+            "source_confidence": source[1],
+            "segments": len(segments[0]),
+            "results": results,
+            "errors": errors,
+            "elapsed_ms": elapsed_ms
+        }
+    
+    @staticmethod
+    def _memory_key(sentence, source_code, target_code):
+        """Translation memory key of one sentence"""
+        return make_cache_key("tm", normalize_text(sentence), source_code, target_code)
+    
+    def _translate_pack(self, segments, source_code, target_code):
+        """
+        Translate consecutive segments on the best available backend
+        
+        Returns:
+            tuple: (one translation per segment, TranslationBackend used)
+        """
+        if self.translate_batcher is not None:
+            return self.translate_batcher.submit((source_code, target_code), segments)
+        return self.router.translate(segments, source_code, target_code)
+    
+    def _translate_packs(self, key, packs):
+        """Micro-batch handler: translate packs from several requests in one backend call"""
+        source_code, target_code = key
+        merged = [segment for pack in packs for segment in pack]
+        translations, backend = self.router.translate(merged, source_code, target_code)
+        
+        results = []
+        offset = 0
+        for pack in packs:
+            results.append((translations[offset:offset + len(pack)], backend))
+            offset += len(pack)
+        return results
+    
+    def _detect(self, text):
+        """Detect a language, batched with concurrent requests when enabled"""
+        if self.detect_batcher is not None:
+            return self.detect_batcher.submit("detect", text)
+        return self.detector.detect(text)
+    
     def detect_language(self, text):
         """
         Detect the language of the given text
         
         Args:
             text (str): Text to detect language from
-            
+        
         Returns:
-            dict: Dictionary with detected language code and confidence
+            dict: Dictionary with detected language code, its probability and
+                the top candidate languages
         """
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
@@ -115,11 +706,7 @@ class TranslationService:
             raise Exception("Translation service not initialized. Call initialize() first.")
         
         try:
-            language = detect(text)
-            return {
-                "language": language,
-                "confidence": 1.0  # langdetect doesn't provide confidence scores
-            }
+            return self._detect(text)
         except Exception as e:
             print(f"Language detection error: {e}")
             raise Exception(f"Language detection failed: {str(e)}")
@@ -128,6 +715,31 @@ class TranslationService:
         """Check if the service is initialized"""
         return self.initialized
     
+    def get_coalescing_stats(self):
+        """Get counters of concurrent identical translations that shared one call"""
+        return self._flight.get_stats()
+    
+    def get_memory_stats(self):
+        """Get translation memory hit/miss counters and tier sizes"""
+        return self.memory.get_stats()
+    
+    def get_pool_stats(self):
+        """Get translator client pool sizes and reuse counters"""
+        return self.translators.get_stats()
+    
+    def get_backend_stats(self):
+        """Get routing counters and per-backend health"""
+        return self.router.get_stats()
+    
+    def get_micro_batch_stats(self):
+        """Get micro-batching counters and batch-size histograms (None when disabled)"""
+        if self.translate_batcher is None:
+            return None
+        return {
+            "translate": self.translate_batcher.get_stats(),
+            "detect": self.detect_batcher.get_stats()
+        }
+    
     @staticmethod
     def get_supported_languages():
         """Get list of supported languages"""
@@ -0,0 +1,136 @@
+"""
+Translator Pool - Thread-safe pool of reusable translator clients keyed by target language
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class TranslatorPool:
+    """
+    Pool of translator clients keyed by target language
+    
+    Each key holds up to ``max_size`` clients created on demand by
+    ``factory(key)``. A client is checked out by exactly one thread at a
+    time and returned afterwards, so its HTTP connection stays warm for the
+    next request instead of being rebuilt on every call. When all clients
+    of a key are busy, callers wait up to ``acquire_timeout`` seconds.
+    """
+    
+    def __init__(self, factory, max_size=4, acquire_timeout=30.0):
+        """
+        Args:
+            factory (callable): Builds a new client for a key
+            max_size (int): Maximum clients per key
+            acquire_timeout (float): Longest a caller waits for a free client
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        
+        self._cond = threading.Condition()
+        self._idle = {}     # key -> deque of idle clients
+        self._sizes = {}    # key -> clients created (idle + in use)
+        self._stats = {
+            "checkouts": 0,
+            "reused": 0,
+            "created": 0,
+            "discarded": 0,
+            "waits": 0,
+            "wait_seconds": 0.0
+        }
+    
+    @contextmanager
+    def client(self, key):
+        """
+        Check out a client for ``key`` for the duration of a with-block
+        
+        A client whose block raises is discarded rather than returned, so a
+        broken connection is never handed to the next caller.
+        
+        Raises:
+            TimeoutError: If no client becomes free within acquire_timeout
+        """
+        client = self._acquire(key)
+        try:
+            yield client
+        except Exception:
+            self._discard(key, client)
+            raise
+        self._release(key, client)
+    
+    def _acquire(self, key):
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        waited = False
+        with self._cond:
+            self._stats["checkouts"] += 1
+            while True:
+                idle = self._idle.setdefault(key, deque())
+                if idle:
+                    self._stats["reused"] += 1
+                    client = idle.pop()
+                    break
+                if self._sizes.get(key, 0) < self.max_size:
+                    # Reserve the slot, then build the client outside the lock
+                    self._sizes[key] = self._sizes.get(key, 0) + 1
+                    self._stats["created"] += 1
+                    client = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No free translator client for '{key}' within {self.acquire_timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+        
+        if client is None:
+            try:
+                client = self.factory(key)
+            except Exception:
+                with self._cond:
+                    self._sizes[key] -= 1
+                    self._cond.notify()
+                raise
+        return client
+    
+    def _release(self, key, client):
+        with self._cond:
+            self._idle[key].append(client)
+            self._cond.notify()
+    
+    def _discard(self, key, client):
+        close = getattr(client, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+        with self._cond:
+            self._sizes[key] -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+    
+    def get_stats(self):
+        """
+        Get pool size and reuse metrics
+        
+        Returns:
+            dict: Checkout counters, time spent waiting for a client and
+                per-key pool sizes (idle and in use)
+        """
+        with self._cond:
+            pools = {}
+            for key, size in self._sizes.items():
+                idle = len(self._idle.get(key, ()))
+                pools[key] = {"size": size, "idle": idle, "in_use": size - idle}
+            return {
+                **self._stats,
+                "wait_seconds": round(self._stats["wait_seconds"], 3),
+                "max_size": self.max_size,
+                "pools": pools
+            }
@@ -0,0 +1,83 @@
+"""
+TTS Audio Cache - Sentence-level synthesized audio keyed by text, voice and sampling settings
+"""
+
+import os
+import struct
+import numpy as np
+from services.cache import TieredCache, make_cache_key, normalize_text
+
+
+class TTSAudioCache:
+    """
+    Content-addressed store of synthesized sentences
+    
+    Each entry is the 16-bit PCM audio of one sentence, keyed by the
+    normalized sentence text, the voice description and the sampling
+    settings (temperature, top_p, seed). Sampling is seeded per sentence
+    from the same key material (see sentence_seed), so a cached entry is
+    exactly what a fresh synthesis would produce, and a sentence sounds the
+    same in every document it appears in. That makes entries reusable
+    across documents: a new text that shares sentences with an old one only
+    synthesizes the new sentences.
+    """
+    
+    # Cache settings (set TTS_CACHE_DB="" to keep it in memory only)
+    DB_PATH = os.getenv("TTS_CACHE_DB", "./cache/tts_audio.sqlite3")
+    MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+    DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "1024"))
+    TTL_SECONDS = float(os.getenv("TTS_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    
+    def __init__(self, namespace):
+        """
+        Args:
+            namespace (str): Model/pipeline identifier mixed into every key, so
+                audio from different models never collides
+        """
+        self.namespace = namespace
+        self.store = TieredCache(
+            "tts_audio",
+            db_path=self.DB_PATH or None,
+            max_memory_bytes=int(self.MEMORY_MB * 1024 * 1024),
+            max_disk_bytes=int(self.DISK_MB * 1024 * 1024),
+            ttl_seconds=self.TTL_SECONDS
+        )
+    
+    def key(self, sentence, settings):
+        """
+        Cache key of one sentence
+        
+        Args:
+            sentence (str): Sentence text
+            settings (dict): Voice description and sampling settings
+        
+        Returns:
+            str: Content-addressed key
+        """
+        return make_cache_key("tts_audio", self.namespace, normalize_text(sentence), settings)
+    
+    @staticmethod
+    def sentence_seed(key):
+        """Deterministic 31-bit sampling seed derived from a sentence key"""
+        return int(key[:8], 16) & 0x7FFFFFFF
+    
+    def get(self, key):
+        """
+        Look up a sentence
+        
+        Returns:
+            tuple: (int16 numpy array, sampling rate), or None on a miss
+        """
+        blob = self.store.get(key)
+        if blob is None:
+            return None
+        sampling_rate, = struct.unpack_from("<I", blob)
+        return np.frombuffer(blob, dtype=np.int16, offset=4), sampling_rate
+    
+    def set(self, key, audio, sampling_rate):
+        """Store one sentence's int16 audio"""
+        self.store.set(key, struct.pack("<I", int(sampling_rate)) + np.asarray(audio, dtype=np.int16).tobytes())
+    
+    def get_stats(self):
+        """Get hit/miss counters and tier sizes of the underlying store"""
+        return self.store.get_stats()
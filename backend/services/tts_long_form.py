@@ -0,0 +1,187 @@
+"""
+TTS Long Form - Sentence-chunked, pipelined synthesis of long texts with in-order streaming
+"""
+
+import asyncio
+import numpy as np
+from services.text_segmenter import group_speech_segments, split_segments
+
+_END = object()  # Marks the end of one segment's audio in its queue
+
+
+class LongFormSpeechPipeline:
+    """
+    Streams speech for texts longer than one generation can hold
+    
+    A single Maya1 generation stops at max_tokens SNAC tokens (about 24 s of
+    audio), so a long text is split into sentence groups (emotion tags stay
+    with their sentence) and each group is generated by the wrapped
+    streaming pipeline. Up to ``max_concurrency`` groups are generated at
+    once, starting with the one being played, so the engine batches them
+    while playback catches up. Audio is still yielded strictly in text
+    order, with a short crossfade where consecutive groups meet.
+    
+    The first group gets a smaller character budget: time to first audio
+    depends only on that group, not on the length of the document.
+    
+    Has the same ``generate_speech_stream`` interface as
+    Maya1VoiceStreamingPipeline, so TTSStreamService can serve either.
+    """
+    
+    def __init__(self, pipeline, segment_chars=300, first_segment_chars=80, max_concurrency=3,
+                 crossfade_samples=240):
+        """
+        Args:
+            pipeline: Streaming pipeline with an async
+                ``generate_speech_stream(description, text, ...)`` yielding
+                int16 PCM bytes
+            segment_chars (int): Character budget per sentence group (keep it
+                well below what fits in one generation)
+            first_segment_chars (int): Character budget of the first group
+            max_concurrency (int): Groups generated at the same time
+            crossfade_samples (int): Crossfade length between groups
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        
+        self.pipeline = pipeline
+        self.segment_chars = segment_chars
+        self.first_segment_chars = first_segment_chars
+        self.max_concurrency = max_concurrency
+        self.crossfade_samples = crossfade_samples
+    
+    @property
+    def decode_scheduler(self):
+        """The wrapped pipeline's decode scheduler (reported in stream stats)"""
+        return getattr(self.pipeline, "decode_scheduler", None)
+    
+    def plan(self, text):
+        """
+        Split a text into the segments generated one by one
+        
+        Returns:
+            list: Segment texts in order
+        """
+        sentences, _ = split_segments(text, max_chars=self.segment_chars)
+        groups = group_speech_segments(sentences, self.segment_chars, self.first_segment_chars)
+        return [" ".join(sentences[start:end]) for start, end in groups]
+    
+    async def generate_speech_stream(self, description, text, seed=None, **options):
+        """
+        Generate speech for a long text, segment by segment
+        
+        Args:
+            description (str): Voice description
+            text (str): Text to synthesize (with optional <emotion> tags)
+            seed (int): Optional seed; segment i is sampled with seed + i
+            **options: Sampling options passed to each segment's generation
+        
+        Yields:
+            bytes: int16 PCM chunks in text order
+        """
+        segments = self.plan(text)
+        print(f"Long-form TTS: {len(text)} chars in {len(segments)} segments "
+              f"(up to {self.max_concurrency} generated at once)")
+        
+        queues = []
+        tasks = []
+        joiner = _SegmentJoiner(self.crossfade_samples)
+        try:
+            for index in range(len(segments)):
+                # Keep the segments up to max_concurrency ahead of playback generating
+                while len(tasks) < min(len(segments), index + self.max_concurrency):
+                    position = len(tasks)
+                    queue = asyncio.Queue()
+                    queues.append(queue)
+                    tasks.append(asyncio.ensure_future(self._generate_segment(
+                        queue, description, segments[position],
+                        None if seed is None else seed + position, options
+                    )))
+                
+                if index:
+                    audio = joiner.next_segment()
+                    if audio.size:
+                        yield audio.tobytes()
+                while True:
+                    item = await queues[index].get()
+                    if item is _END:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    audio = joiner.push(np.frombuffer(item, dtype=np.int16))
+                    if audio.size:
+                        yield audio.tobytes()
+            
+            audio = joiner.finish()
+            if audio.size:
+                yield audio.tobytes()
+        finally:
+            # Client went away or a segment failed: stop the generations still running
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _generate_segment(self, queue, description, text, seed, options):
+        """Run one segment's generation, handing its chunks (then _END or the error) to the queue"""
+        chunks = self.pipeline.generate_speech_stream(description=description, text=text, seed=seed, **options)
+        try:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+            queue.put_nowait(_END)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            await chunks.aclose()
+
+
+class _SegmentJoiner:
+    """
+    Joins consecutive audio segments with an equal-power crossfade
+    
+    The last ``overlap`` samples of the audio pushed so far are held back;
+    when the next segment starts they are blended with its first samples.
+    Segments are separate utterances (uncorrelated), hence the sine/cosine
+    ramps rather than the linear ones used between decode windows.
+    """
+    
+    def __init__(self, overlap):
+        self.overlap = max(int(overlap), 0)
+        self._pending = np.empty(0, dtype=np.float32)
+        self._tail = None  # Previous segment's held-back end, waiting for the next one
+    
+    def push(self, samples):
+        """Add int16 samples of the current segment, return the int16 samples now final"""
+        self._pending = np.concatenate([self._pending, samples.astype(np.float32)])
+        if self._tail is not None:
+            n = len(self._tail)
+            if len(self._pending) < n:
+                return np.empty(0, dtype=np.int16)
+            fade_in = np.sin(0.5 * np.pi * (np.arange(n, dtype=np.float32) + 0.5) / n)
+            fade_out = np.sqrt(1.0 - fade_in ** 2)
+            self._pending[:n] = self._tail * fade_out + self._pending[:n] * fade_in
+            self._tail = None
+        return self._emit(len(self._pending) - self.overlap)
+    
+    def next_segment(self):
+        """Start a new segment, return any samples that can no longer be blended"""
+        emitted = np.empty(0, dtype=np.int16)
+        if self._tail is not None:
+            # The previous segment was shorter than the crossfade: play it as is
+            self._pending = np.concatenate([self._tail, self._pending])
+            emitted = self._emit(len(self._pending) - self.overlap)
+        self._tail = self._pending if len(self._pending) else None
+        self._pending = np.empty(0, dtype=np.float32)
+        return emitted
+    
+    def finish(self):
+        """Return everything still held back (call after the last segment)"""
+        if self._tail is not None:
+            self._pending = np.concatenate([self._tail, self._pending])
+            self._tail = None
+        return self._emit(len(self._pending))
+    
+    def _emit(self, count):
+        count = max(count, 0)
+        audio, self._pending = self._pending[:count], self._pending[count:]
+        return np.clip(np.rint(audio), -32768, 32767).astype(np.int16)
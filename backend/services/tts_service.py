@@ -4,13 +4,18 @@ TTS Service - Handles text-to-speech synthesis using Maya1 model
 
 import torch
 import io
+import threading
 import numpy as np
-import scipy.io.wavfile as wavfile
 from transformers import pipeline
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.model_manager import ModelManager
+from services.audio_encoding import audio_content_type, check_output, encode_audio
+from services.cache import make_cache_key, normalize_text
+from services.single_flight import SingleFlight
+from services.text_segmenter import split_segments
+from services.tts_audio_cache import TTSAudioCache
 
 
 class TTSService:
@@ -19,10 +24,24 @@ class TTSService:
     MODEL_NAME = "maya-research/maya1"
     MODEL_DIR = "./maya1_model"
     
+    # Sentences longer than this are synthesized (and cached) in pieces
+    MAX_SEGMENT_CHARS = int(os.getenv("TTS_MAX_SEGMENT_CHARS", "400"))
+    # Silence inserted between sentences and between paragraphs
+    SENTENCE_PAUSE_MS = float(os.getenv("TTS_SENTENCE_PAUSE_MS", "150"))
+    PARAGRAPH_PAUSE_MS = float(os.getenv("TTS_PARAGRAPH_PAUSE_MS", "400"))
+    # Seed used when a request does not pass one
+    DEFAULT_SEED = int(os.getenv("TTS_SEED", "0"))
+    
     def __init__(self):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.pipeline = None
-        
+        self._flight = SingleFlight("tts")
+        self._generate_lock = threading.Lock()
+        # Sentence audio reused across requests and restarts
+        self.audio_cache = TTSAudioCache(self.MODEL_NAME)
+        self._stats_lock = threading.Lock()
+        self._segment_stats = {"segments": 0, "segments_from_cache": 0}
+    
     def initialize(self):
         """Initialize and load the TTS model"""
         if self.pipeline is not None:
@@ -52,16 +71,62 @@ class TTSService:
         print("TTS service initialization skipped (model downloading disabled)")
         return False
     
-    def synthesize(self, text):
+    def synthesize(self, text, **options):
         """
-        Synthesize speech from text
+        Synthesize speech from text as a WAV file
         
         Args:
             text (str): Text to convert to speech
-            
+            **options: Voice and sampling options (see synthesize_audio)
+        
         Returns:
             tuple: (audio_buffer, sampling_rate) - BytesIO buffer containing WAV audio and sampling rate
-            
+        """
+        audio_bytes, sampling_rate, _ = self.synthesize_encoded(text, **options)
+        return io.BytesIO(audio_bytes), sampling_rate
+    
+    def synthesize_encoded(self, text, audio_format="wav", quality="high", **options):
+        """
+        Synthesize speech from text in an output format and quality tier
+        
+        Args:
+            text (str): Text to convert to speech
+            audio_format (str): "wav", "flac", "opus" or "pcm"
+            quality (str): "high", "medium" (16 kHz) or "low" (8 kHz)
+            **options: Voice and sampling options (see synthesize_audio)
+        
+        Returns:
+            tuple: (encoded bytes, sampling rate, content type)
+        
+        Raises:
+            ValueError: If text is empty or the format or quality is not supported
+        """
+        # Fail on a bad format before spending time on synthesis
+        check_output(audio_format, quality)
+        audio_data, sampling_rate = self.synthesize_audio(text, **options)
+        audio_bytes, output_rate = encode_audio(audio_data, sampling_rate, audio_format, quality)
+        return audio_bytes, output_rate, audio_content_type(audio_format, output_rate)
+    
+    def synthesize_audio(self, text, description=None, temperature=None, top_p=None, seed=None):
+        """
+        Synthesize speech from text
+        
+        Sentences already synthesized with the same voice and sampling
+        settings (in this or any earlier document) are served from the
+        audio cache; only the others go through the model.
+        
+        Args:
+            text (str): Text to convert to speech
+            description (str): Optional voice description
+            temperature (float): Optional sampling temperature
+            top_p (float): Optional nucleus sampling threshold
+            seed (int): Optional seed; together with each sentence's text it
+                determines that sentence's sampling seed
+        
+        Returns:
+            tuple: (audio, sampling_rate) - int16 numpy array shared with
+                concurrent identical requests (do not modify) and sampling rate
+        
         Raises:
             ValueError: If text is empty
             Exception: If synthesis fails
@@ -72,10 +137,90 @@ class TTSService:
         if self.pipeline is None:
             raise Exception("Model not initialized. Call initialize() first.")
         
+        settings = {
+            "description": description,
+            "temperature": temperature,
+            "top_p": top_p,
+            "seed": self.DEFAULT_SEED if seed is None else int(seed)
+        }
+        
+        # Concurrent identical requests share one synthesis. The key covers
+        # what the audio depends on: each sentence and which gaps between
+        # them are paragraph breaks (those get the longer pause)
+        sentences, gaps = split_segments(text, max_chars=self.MAX_SEGMENT_CHARS)
+        key = make_cache_key(
+            "tts",
+            [normalize_text(sentence) for sentence in sentences],
+            ["\n\n" in gap for gap in gaps[1:-1]],
+            settings
+        )
+        return self._flight.do(key, lambda: self._synthesize_document(sentences, gaps, settings))
+    
+    def _synthesize_document(self, sentences, gaps, settings):
+        """Synthesize split text sentence by sentence through the audio cache, return (int16 audio, rate)"""
+        
+        pieces = []
+        sampling_rate = None
+        from_cache = 0
+        for sentence in sentences:
+            key = self.audio_cache.key(sentence, settings)
+            cached = self.audio_cache.get(key)
+            if cached is not None:
+                audio, rate = cached
+                from_cache += 1
+            else:
+                audio, rate = self._synthesize_sentence(sentence, settings, self.audio_cache.sentence_seed(key))
+                self.audio_cache.set(key, audio, rate)
+            if sampling_rate is None:
+                sampling_rate = rate
+            elif rate != sampling_rate:
+                raise Exception(f"Inconsistent sampling rates in synthesized audio ({rate} vs {sampling_rate})")
+            pieces.append(audio)
+        
+        with self._stats_lock:
+            self._segment_stats["segments"] += len(sentences)
+            self._segment_stats["segments_from_cache"] += from_cache
+        
+        audio_data = self._stitch(pieces, gaps, sampling_rate)
+        
+        print(f"Synthesis complete, audio length: {len(audio_data)} samples "
+              f"({len(sentences)} sentences, {from_cache} from cache)")
+        return audio_data, sampling_rate
+    
+    def _stitch(self, pieces, gaps, sampling_rate):
+        """Join sentence audio, with a short pause between sentences and a longer one between paragraphs"""
+        sentence_pause = np.zeros(int(sampling_rate * self.SENTENCE_PAUSE_MS / 1000), dtype=np.int16)
+        paragraph_pause = np.zeros(int(sampling_rate * self.PARAGRAPH_PAUSE_MS / 1000), dtype=np.int16)
+        parts = []
+        for index, audio in enumerate(pieces):
+            if index:
+                parts.append(paragraph_pause if "\n\n" in gaps[index] else sentence_pause)
+            parts.append(audio)
+        return np.concatenate(parts)
+    
+    def _synthesize_sentence(self, text, settings, seed):
+        """Run the TTS pipeline on one sentence with a fixed seed and return (int16 audio, sampling rate)"""
         print(f"Synthesizing: {text[:50]}...")
         
-        # Generate speech
-        output = self.pipeline(text)
+        prompt = text
+        if settings["description"]:
+            prompt = f'<description="{settings["description"]}"> {text}'
+        generate_kwargs = {}
+        if settings["temperature"] is not None or settings["top_p"] is not None:
+            generate_kwargs["do_sample"] = True
+            if settings["temperature"] is not None:
+                generate_kwargs["temperature"] = settings["temperature"]
+            if settings["top_p"] is not None:
+                generate_kwargs["top_p"] = settings["top_p"]
+        
+        # The seed goes into torch's global RNG, so seeding and generation
+        # must not interleave with another request's
+        with self._generate_lock:
+            torch.manual_seed(seed)
+            if generate_kwargs:
+                output = self.pipeline(prompt, generate_kwargs=generate_kwargs)
+            else:
+                output = self.pipeline(prompt)
         
         # Validate output
         if output is None:
@@ -103,48 +248,57 @@ class TTSService:
         if audio_data.size == 0:
             raise Exception("Audio data is empty")
         
-        # Ensure audio is in correct format (int16)
+        # Ensure audio is in correct format (int16, mono)
+        audio_data = audio_data.reshape(-1)
         if audio_data.dtype != np.int16:
             # Normalize to [-1, 1] range if needed
             if np.abs(audio_data).max() > 1.0:
                 audio_data = audio_data / np.abs(audio_data).max()
             audio_data = (audio_data * 32767).astype(np.int16)
         
-        # Create WAV file in memory
-        audio_buffer = io.BytesIO()
-        wavfile.write(audio_buffer, sampling_rate, audio_data)
-        audio_buffer.seek(0)
-        
-        print(f"Synthesis complete, audio length: {len(audio_data)} samples")
-        return audio_buffer, sampling_rate
+        return audio_data, int(sampling_rate)
     
-    def synthesize_base64(self, text):
+    def synthesize_base64(self, text, audio_format="wav", quality="high", **options):
         """
         Synthesize speech and return as base64 encoded string
         
         Args:
             text (str): Text to convert to speech
-            
+            audio_format (str): "wav", "flac", "opus" or "pcm"
+            quality (str): "high", "medium" (16 kHz) or "low" (8 kHz)
+            **options: Voice and sampling options passed to synthesize_audio()
+        
         Returns:
-            dict: Dictionary with 'audio' (base64), 'sampling_rate', and 'format'
+            dict: Dictionary with 'audio' (base64), 'sampling_rate', 'format' and 'content_type'
         """
         import base64
         
-        audio_buffer, sampling_rate = self.synthesize(text)
+        audio_bytes, sampling_rate, content_type = self.synthesize_encoded(text, audio_format, quality, **options)
         
         # Encode to base64
-        audio_base64 = base64.b64encode(audio_buffer.read()).decode('utf-8')
+        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
         
         return {
             "audio": audio_base64,
             "sampling_rate": int(sampling_rate),
-            "format": "wav"
+            "format": audio_format,
+            "content_type": content_type
         }
     
     def is_initialized(self):
         """Check if the model is initialized"""
         return self.pipeline is not None
     
+    def get_coalescing_stats(self):
+        """Get counters of concurrent identical syntheses that shared one run"""
+        return self._flight.get_stats()
+    
+    def get_cache_stats(self):
+        """Get sentence audio cache counters and how many sentences were reused"""
+        with self._stats_lock:
+            segment_stats = dict(self._segment_stats)
+        return {**self.audio_cache.get_stats(), **segment_stats}
+    
     def get_device(self):
         """Get the device being used"""
         return self.device
@@ -0,0 +1,303 @@
+"""
+TTS Stream Service - Low-latency streaming speech synthesis with the Maya1 vLLM pipeline
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from maya1_model.vllm_streaming_inference import (
+    DEFAULT_DECODE_MAX_BATCH,
+    DEFAULT_DECODE_TICK_SECONDS,
+    DEFAULT_HOP_FRAMES,
+    DEFAULT_LEFT_CONTEXT_FRAMES,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_OVERLAP_SAMPLES,
+    DEFAULT_RIGHT_CONTEXT_FRAMES,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_TOP_P,
+    SNAC_SAMPLE_RATE,
+    torch
+)
+from services.tts_long_form import LongFormSpeechPipeline
+
+SAMPLE_WIDTH = 2  # int16 PCM
+
+
+async def _next_chunk(chunks):
+    """Await the next item of an async generator (run_coroutine_threadsafe needs a coroutine)"""
+    return await chunks.__anext__()
+
+
+async def _close(chunks):
+    await chunks.aclose()
+
+
+class TTSStreamService:
+    """
+    Service serving Maya1VoiceStreamingPipeline as a chunked audio stream
+    
+    The pipeline is asynchronous (vLLM's AsyncLLMEngine), while Flask
+    handlers are synchronous, so the service runs one asyncio event loop on a
+    background thread and every stream pulls its next chunk from that loop.
+    Chunks are only generated as fast as the client reads them, and a client
+    that disconnects closes its generator, which aborts the engine request.
+    
+    Any pipeline with an async ``generate_speech_stream(description, text,
+    ...)`` yielding int16 PCM bytes can be plugged in, e.g. one built on a
+    fake token engine for tests.
+    """
+    
+    MODEL_DIR = os.getenv("TTS_STREAM_MODEL_DIR", "./maya1_model")
+    ENABLED = os.getenv("TTS_STREAM_ENABLED", "false").lower() == "true"
+    DTYPE = os.getenv("TTS_STREAM_DTYPE", "bfloat16")
+    MAX_MODEL_LEN = int(os.getenv("TTS_STREAM_MAX_MODEL_LEN", "8192"))
+    GPU_MEMORY_UTILIZATION = float(os.getenv("TTS_STREAM_GPU_MEMORY_UTILIZATION", "0.85"))
+    DEFAULT_DESCRIPTION = os.getenv(
+        "TTS_STREAM_DEFAULT_DESCRIPTION",
+        "Realistic female voice in the 20s age with american accent. "
+        "Normal pitch, warm timbre, conversational pacing, neutral tone delivery at med intensity."
+    )
+    # Streaming SNAC decode: frames per decoder call, context and crossfade
+    HOP_FRAMES = int(os.getenv("TTS_STREAM_HOP_FRAMES", str(DEFAULT_HOP_FRAMES)))
+    LEFT_CONTEXT_FRAMES = int(os.getenv("TTS_STREAM_LEFT_CONTEXT_FRAMES", str(DEFAULT_LEFT_CONTEXT_FRAMES)))
+    RIGHT_CONTEXT_FRAMES = int(os.getenv("TTS_STREAM_RIGHT_CONTEXT_FRAMES", str(DEFAULT_RIGHT_CONTEXT_FRAMES)))
+    OVERLAP_SAMPLES = int(os.getenv("TTS_STREAM_OVERLAP_SAMPLES", str(DEFAULT_OVERLAP_SAMPLES)))
+    # Batch SNAC decoding across concurrent streams
+    DECODE_BATCHING = os.getenv("TTS_STREAM_DECODE_BATCHING", "true").lower() == "true"
+    DECODE_TICK_MS = float(os.getenv("TTS_STREAM_DECODE_TICK_MS", str(DEFAULT_DECODE_TICK_SECONDS * 1000)))
+    DECODE_MAX_BATCH = int(os.getenv("TTS_STREAM_DECODE_MAX_BATCH", str(DEFAULT_DECODE_MAX_BATCH)))
+    # Long-form mode: texts beyond one segment are generated in sentence groups
+    LONG_FORM_SEGMENT_CHARS = int(os.getenv("TTS_STREAM_LONG_FORM_SEGMENT_CHARS", "300"))
+    LONG_FORM_FIRST_SEGMENT_CHARS = int(os.getenv("TTS_STREAM_LONG_FORM_FIRST_SEGMENT_CHARS", "80"))
+    LONG_FORM_MAX_CONCURRENCY = int(os.getenv("TTS_STREAM_LONG_FORM_MAX_CONCURRENCY", "3"))
+    LONG_FORM_CROSSFADE_MS = float(os.getenv("TTS_STREAM_LONG_FORM_CROSSFADE_MS", "10"))
+    SAMPLE_RATE = SNAC_SAMPLE_RATE
+    # Streams kept for the latency percentiles in get_stats()
+    METRICS_WINDOW = 256
+    
+    def __init__(self, pipeline=None):
+        """
+        Args:
+            pipeline: Optional ready-made streaming pipeline; if omitted,
+                initialize() builds the Maya1 vLLM pipeline
+        """
+        self.device = "cuda" if torch is not None and torch.cuda.is_available() else "cpu"
+        self.pipeline = pipeline
+        self.long_form = None
+        
+        self._loop = None
+        self._loop_thread = None
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=self.METRICS_WINDOW)  # (ttfa seconds, rtf) per stream
+        self._stats = {
+            "streams": 0,
+            "long_form_streams": 0,
+            "active": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "errors": 0,
+            "audio_seconds": 0.0
+        }
+    
+    def initialize(self):
+        """Build the streaming pipeline (unless one was given) and start the event loop"""
+        if self.pipeline is None:
+            if not self.ENABLED:
+                print("TTS streaming disabled (set TTS_STREAM_ENABLED=true to load the vLLM pipeline)")
+                return False
+            
+            from maya1_model.vllm_streaming_inference import (
+                Maya1VoiceModel,
+                Maya1VoiceStreamingPipeline,
+                SNACDecodeScheduler,
+                SNACDecoder
+            )
+            
+            print(f"Loading streaming TTS pipeline from {self.MODEL_DIR} on {self.device}...")
+            model = Maya1VoiceModel(
+                model_path=self.MODEL_DIR,
+                dtype=self.DTYPE,
+                max_model_len=self.MAX_MODEL_LEN,
+                gpu_memory_utilization=self.GPU_MEMORY_UTILIZATION
+            )
+            snac_decoder = SNACDecoder(device=self.device)
+            scheduler = None
+            if self.DECODE_BATCHING:
+                scheduler = SNACDecodeScheduler(
+                    snac_decoder,
+                    tick_seconds=self.DECODE_TICK_MS / 1000,
+                    max_batch=self.DECODE_MAX_BATCH
+                )
+            self.pipeline = Maya1VoiceStreamingPipeline(
+                model,
+                snac_decoder,
+                hop_frames=self.HOP_FRAMES,
+                left_context_frames=self.LEFT_CONTEXT_FRAMES,
+                right_context_frames=self.RIGHT_CONTEXT_FRAMES,
+                overlap_samples=self.OVERLAP_SAMPLES,
+                decode_scheduler=scheduler
+            )
+        
+        self.long_form = LongFormSpeechPipeline(
+            self.pipeline,
+            segment_chars=self.LONG_FORM_SEGMENT_CHARS,
+            first_segment_chars=self.LONG_FORM_FIRST_SEGMENT_CHARS,
+            max_concurrency=self.LONG_FORM_MAX_CONCURRENCY,
+            crossfade_samples=int(self.SAMPLE_RATE * self.LONG_FORM_CROSSFADE_MS / 1000)
+        )
+        self._start_loop()
+        print("TTS streaming pipeline ready!")
+        return True
+    
+    def _start_loop(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(
+                target=self._loop.run_forever,
+                name="tts-stream-loop",
+                daemon=True
+            )
+            self._loop_thread.start()
+    
+    def _run(self, coroutine):
+        """Run a coroutine on the background loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+    
+    def stream(self, text, description=None, temperature=DEFAULT_TEMPERATURE, top_p=DEFAULT_TOP_P,
+               max_tokens=DEFAULT_MAX_TOKENS, seed=None, long_form=None):
+        """
+        Synthesize speech as a stream of audio chunks
+        
+        Args:
+            text (str): Text to speak (may contain <emotion> tags)
+            description (str): Voice description (defaults to DEFAULT_DESCRIPTION)
+            temperature (float): Sampling temperature
+            top_p (float): Nucleus sampling threshold
+            max_tokens (int): Maximum SNAC tokens to generate
+            seed (int): Optional sampling seed for reproducible audio
+            long_form (bool): Generate sentence groups concurrently and stream
+                them in order (see LongFormSpeechPipeline); max_tokens then
+                applies per group. Defaults to on for texts longer than
+                LONG_FORM_SEGMENT_CHARS
+        
+        Returns:
+            generator: int16 PCM chunks (mono, SAMPLE_RATE Hz) in playback order
+        
+        Raises:
+            ValueError: If text is empty
+            Exception: If the pipeline is not initialized
+        """
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        
+        if not self.is_initialized():
+            raise Exception("Streaming pipeline not initialized. Call initialize() first.")
+        
+        if long_form is None:
+            long_form = len(text) > self.LONG_FORM_SEGMENT_CHARS
+        pipeline = self.long_form if long_form else self.pipeline
+        
+        chunks = pipeline.generate_speech_stream(
+            description=description or self.DEFAULT_DESCRIPTION,
+            text=text,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            seed=seed
+        )
+        return self._iterate(chunks, long_form)
+    
+    def _iterate(self, chunks, long_form=False):
+        """Pull chunks of an async generator through the loop, recording latency metrics"""
+        started = time.perf_counter()
+        first_chunk_at = None
+        audio_bytes = 0
+        outcome = "cancelled"
+        with self._lock:
+            self._stats["streams"] += 1
+            self._stats["long_form_streams"] += int(long_form)
+            self._stats["active"] += 1
+        
+        try:
+            while True:
+                try:
+                    chunk = self._run(_next_chunk(chunks))
+                except StopAsyncIteration:
+                    break
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                audio_bytes += len(chunk)
+                yield chunk
+            outcome = "completed"
+        except Exception:
+            outcome = "errors"
+            raise
+        finally:
+            if outcome != "completed":
+                # Client went away or generation failed: abort the engine request
+                try:
+                    self._run(_close(chunks))
+                except Exception as e:
+                    print(f"TTS stream close error: {e}")
+            self._record(outcome, started, first_chunk_at, audio_bytes)
+    
+    def _record(self, outcome, started, first_chunk_at, audio_bytes):
+        elapsed = time.perf_counter() - started
+        audio_seconds = audio_bytes / SAMPLE_WIDTH / self.SAMPLE_RATE
+        ttfa = first_chunk_at - started if first_chunk_at is not None else None
+        # Real-time factor: wall time per second of audio (below 1 keeps up with playback)
+        rtf = elapsed / audio_seconds if audio_seconds else None
+        
+        with self._lock:
+            self._stats["active"] -= 1
+            self._stats[outcome] += 1
+            self._stats["audio_seconds"] += audio_seconds
+            if outcome == "completed" and ttfa is not None:
+                self._recent.append((ttfa, rtf))
+        
+        ttfa_text = f"{ttfa * 1000:.0f} ms" if ttfa is not None else "n/a"
+        rtf_text = f"{rtf:.2f}" if rtf is not None else "n/a"
+        print(f"TTS stream {outcome}: {audio_seconds:.2f}s audio, "
+              f"time to first audio {ttfa_text}, RTF {rtf_text}")
+    
+    def get_stats(self):
+        """
+        Get stream counters and latency metrics
+        
+        Returns:
+            dict: Stream counters, total audio produced, and time-to-first-audio
+                percentiles and mean real-time factor over recent completed streams
+        """
+        with self._lock:
+            recent = list(self._recent)
+            stats = dict(self._stats)
+        
+        ttfas = sorted(ttfa for ttfa, _ in recent)
+        rtfs = [rtf for _, rtf in recent if rtf is not None]
+        
+        def percentile(q):
+            return round(ttfas[min(len(ttfas) - 1, int(q * len(ttfas)))] * 1000, 1) if ttfas else None
+        
+        scheduler = getattr(self.pipeline, "decode_scheduler", None)
+        return {
+            **stats,
+            "audio_seconds": round(stats["audio_seconds"], 2),
+            "decode_batching": scheduler.get_stats() if scheduler is not None else None,
+            "ttfa_ms_p50": percentile(0.5),
+            "ttfa_ms_p95": percentile(0.95),
+            "rtf_mean": round(sum(rtfs) / len(rtfs), 3) if rtfs else None
+        }
+    
+    def is_initialized(self):
+        """Check if the streaming pipeline is ready"""
+        return self.pipeline is not None and self._loop is not None
+    
+    def get_device(self):
+        """Get the device being used"""
+        return self.device
@@ -36,7 +36,46 @@ def test_summarization_service():
         print(f"\n  Summary: {summary}\n")
         
         return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_extractive_summarizer():
+    """Test the offline extractive summarizer (no API key needed)"""
+    print("\n" + "="*60)
+    print("Testing Extractive Summarizer")
+    print("="*60)
+    
+    try:
+        import time
+        from services.extractive_summarizer import ExtractiveSummarizer
         
+        summarizer = ExtractiveSummarizer()
+        test_text = (
+            "Dyslexia is a learning difference that affects reading. "
+            "Students with dyslexia may find it hard to decode words. "
+            "Special fonts can make letters easier to tell apart. "
+            "Audio support lets students listen while they read. "
+            "Short summaries help students with dyslexia follow long texts. "
+            "Teachers can combine fonts, audio and summaries in class. "
+        ) * 200
+        
+        start = time.perf_counter()
+        summary = summarizer.summarize(test_text)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        print(f"✓ Summary generated in {elapsed_ms:.1f} ms:")
+        print(f"  Input length: {len(test_text.split())} words")
+        print(f"  Output length: {len(summary)} chars")
+        print(f"\n  Summary: {summary}\n")
+        
+        assert summary and len(summary) < len(test_text)
+        return True
+    
     except Exception as e:
         print(f"✗ Error: {e}")
         import traceback
@@ -76,7 +115,1217 @@ def test_tts_service():
         print(f"  ✓ Audio saved to test_output.wav\n")
         
         return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_tts_stream_service():
+    """Test the streaming TTS pipeline with a fake token engine (no GPU needed)"""
+    print("\n" + "="*60)
+    print("Testing TTS Stream Service")
+    print("="*60)
+    
+    try:
+        import asyncio
+        import numpy as np
+        from types import SimpleNamespace
+        from maya1_model.vllm_streaming_inference import (
+            CODE_END_TOKEN_ID,
+            CODE_START_TOKEN_ID,
+            SNAC_MIN_ID,
+            Maya1VoiceStreamingPipeline
+        )
+        from services.tts_stream_service import TTSStreamService
+        
+        class FakeEngine:
+            """Emits SOS, 10 SNAC frames and EOS, a few tokens per step like vLLM"""
+            async def generate(self, prompt, sampling_params, request_id):
+                tokens = [CODE_START_TOKEN_ID] + [SNAC_MIN_ID + i % 4096 for i in range(70)] + [CODE_END_TOKEN_ID]
+                for end in range(3, len(tokens) + 3, 3):
+                    await asyncio.sleep(0.001)
+                    yield SimpleNamespace(outputs=[SimpleNamespace(token_ids=tokens[:end])])
+        
+        class FakeDecoder:
+            def decode(self, tokens):
+                return np.zeros(len(tokens) // 7 * 2048, dtype=np.float32)
+        
+        model = SimpleNamespace(engine=FakeEngine(), build_prompt=lambda description, text: text)
+        service = TTSStreamService(pipeline=Maya1VoiceStreamingPipeline(model, FakeDecoder()))
+        service.initialize()
         
+        chunks = list(service.stream("Hello, this is a streaming test."))
+        stats = service.get_stats()
+        print(f"✓ Streamed {len(chunks)} chunks")
+        print(f"  Time to first audio: {stats['ttfa_ms_p50']} ms, RTF: {stats['rtf_mean']}\n")
+        
+        # Hop of 3 frames with 1 frame of look-ahead, the last frame flushed at the end
+        assert [len(chunk) for chunk in chunks] == [3 * 4096, 3 * 4096, 3 * 4096, 4096]
+        assert stats["completed"] == 1 and stats["active"] == 0
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_tts_long_form():
+    """Test long-form streaming: concurrent sentence groups played back in order"""
+    print("\n" + "="*60)
+    print("Testing Long-Form TTS Streaming")
+    print("="*60)
+    
+    try:
+        import asyncio
+        import random
+        import numpy as np
+        from types import SimpleNamespace
+        from maya1_model.vllm_streaming_inference import (
+            CODE_END_TOKEN_ID,
+            CODE_START_TOKEN_ID,
+            SNAC_MIN_ID,
+            Maya1VoiceStreamingPipeline
+        )
+        from services.tts_stream_service import TTSStreamService
+        
+        sentences = [f"Sentence number {i} of a long reading passage." for i in range(12)]
+        sentences[4] += " <laugh>"
+        text = " ".join(sentences[:5]) + "\n" + " ".join(sentences[5:])
+        running = {"now": 0, "peak": 0}
+        
+        class FakeEngine:
+            """Every frame of a segment carries the segment's first sentence number"""
+            async def generate(self, prompt, sampling_params, request_id):
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+                try:
+                    number = int(prompt.split("number ")[1].split()[0])
+                    tokens = [CODE_START_TOKEN_ID] + [SNAC_MIN_ID + number] * 70 + [CODE_END_TOKEN_ID]
+                    for end in range(7, len(tokens) + 7, 7):
+                        await asyncio.sleep(random.uniform(0, 0.002))
+                        yield SimpleNamespace(outputs=[SimpleNamespace(token_ids=tokens[:end])])
+                finally:
+                    running["now"] -= 1
+        
+        class FakeDecoder:
+            def decode(self, tokens):
+                return np.full(len(tokens) // 7 * 2048, (tokens[0] - SNAC_MIN_ID) / 100, dtype=np.float32)
+        
+        model = SimpleNamespace(engine=FakeEngine(), build_prompt=lambda description, text: text)
+        service = TTSStreamService(pipeline=Maya1VoiceStreamingPipeline(model, FakeDecoder()))
+        service.LONG_FORM_SEGMENT_CHARS = 100
+        service.LONG_FORM_FIRST_SEGMENT_CHARS = 50
+        service.initialize()
+        
+        segments = service.long_form.plan(text)
+        audio = np.frombuffer(b"".join(service.stream(text)), dtype=np.int16)
+        stats = service.get_stats()
+        print(f"✓ {len(segments)} segments, peak {running['peak']} generations at once")
+        print(f"  {len(audio) / service.SAMPLE_RATE:.2f}s of audio\n")
+        
+        # Small first segment, the trailing tag kept with its sentence, then two sentences per segment
+        assert segments[0] == sentences[0] and any(segment.endswith(sentences[4]) for segment in segments)
+        assert len(segments) == 7 and 1 < running["peak"] <= service.LONG_FORM_MAX_CONCURRENCY
+        # Every segment's 10 frames, overlapping by one crossfade, in text order
+        step = 10 * 2048 - service.long_form.crossfade_samples
+        assert len(audio) == len(segments) * step + service.long_form.crossfade_samples
+        numbers = [int(segment.split("number ")[1].split()[0]) for segment in segments]
+        levels = (np.array(numbers, dtype=np.float32) / 100 * 32767).astype(np.int16)
+        assert audio[step // 2::step].tolist() == levels.tolist()
+        assert stats["long_form_streams"] == 1 and stats["completed"] == 1
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_audio_encoding():
+    """Test chunk-by-chunk audio encoding and the downsampled tiers"""
+    print("\n" + "="*60)
+    print("Testing Audio Encoding")
+    print("="*60)
+    
+    try:
+        import io
+        import numpy as np
+        from scipy.signal import resample_poly
+        from services.audio_encoding import AudioEncoder, Resampler, available_formats, encode_audio
+        
+        rng = np.random.default_rng(0)
+        audio = (rng.standard_normal(30000) * 3000).astype(np.int16)
+        
+        # Streaming resampler == resample_poly on the whole signal, for any chunking
+        resampler = Resampler(24000, 16000)
+        pieces = [resampler.process(audio[i:i + 4097]) for i in range(0, len(audio), 4097)]
+        streamed = np.concatenate(pieces + [resampler.finish()])
+        assert np.allclose(streamed, resample_poly(audio.astype(np.float64), 2, 3))
+        print("✓ Streaming resampler matches resample_poly")
+        
+        # A WAV stream carries the same samples as the one-shot file
+        encoder = AudioEncoder("wav", 24000, "medium")
+        stream = b"".join([encoder.encode(audio[i:i + 6144].tobytes()) for i in range(0, len(audio), 6144)])
+        stream += encoder.finish()
+        wav, rate = encode_audio(audio, 24000, "wav", "medium")
+        assert rate == encoder.sample_rate == 16000 and stream[44:] == wav[44:]
+        print(f"✓ WAV 16 kHz: {len(wav)} bytes, streamed and one-shot identical")
+        
+        # audio/L16 is big-endian (RFC 2586), WAV data little-endian; streamed and one-shot agree
+        encoder = AudioEncoder("pcm", 24000)
+        assert encoder.content_type == "audio/L16;rate=24000;channels=1"
+        pcm = encoder.encode(audio[:1000].tobytes()) + encoder.encode(audio[1000:]) + encoder.finish()
+        assert pcm == encode_audio(audio, 24000, "pcm")[0]
+        assert np.array_equal(np.frombuffer(pcm, dtype=">i2"), audio)
+        wav, _ = encode_audio(audio, 24000, "wav")
+        assert np.array_equal(np.frombuffer(wav[44:], dtype="<i2"), audio)
+        print("✓ PCM sent in network byte order as audio/L16 declares")
+        
+        print(f"  Formats available: {', '.join(available_formats())}")
+        if "flac" in available_formats():
+            import soundfile
+            flac, _ = encode_audio(audio, 24000, "flac")
+            decoded, rate = soundfile.read(io.BytesIO(flac), dtype="int16")
+            assert rate == 24000 and np.array_equal(decoded, audio)
+            print(f"✓ FLAC: {len(flac)} bytes, lossless\n")
+        
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_tiered_cache():
+    """Test LRU eviction by bytes, TTL expiry, disk promotion and disk eviction"""
+    print("\n" + "="*60)
+    print("Testing Tiered Cache")
+    print("="*60)
+    
+    try:
+        import os
+        import tempfile
+        import time
+        from services.cache import TieredCache
+        
+        # Memory tier: the least recently used entry goes once the byte budget is exceeded
+        cache = TieredCache("lru_test", max_memory_bytes=10)
+        cache.set("a", "aaaa")
+        cache.set("b", b"bbbb")
+        assert cache.get("a") == "aaaa"
+        cache.set("c", "cccc")
+        assert cache.get("b") is None and cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+        stats = cache.get_stats()
+        assert stats["evictions"] == 1 and stats["memory_bytes"] == 8
+        cache.set("huge", "x" * 11)
+        assert cache.get("huge") is None and cache.get("a") == "aaaa"
+        print("✓ LRU eviction by bytes")
+        
+        # TTL expiry
+        cache = TieredCache("ttl_test", ttl_seconds=0.05)
+        cache.set("k", "value")
+        assert cache.get("k") == "value"
+        time.sleep(0.1)
+        assert cache.get("k") is None and cache.get_stats()["expirations"] == 1
+        print("✓ TTL expiry")
+        
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, "cache.sqlite3")
+            
+            # A new instance (e.g. after a restart) finds entries on disk and promotes them
+            TieredCache("disk_test", db_path=db_path).set("k", b"\x00\x01binary")
+            cache = TieredCache("disk_test", db_path=db_path)
+            assert cache.get("k") == b"\x00\x01binary" and cache.get("k") == b"\x00\x01binary"
+            stats = cache.get_stats()
+            assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+            print("✓ Disk hit promoted to memory")
+            
+            # Disk tier: least recently accessed entries go first, down to 90% of the budget
+            cache = TieredCache("bounded_test", db_path=db_path, max_disk_bytes=100)
+            for index in range(3):
+                cache.set(f"k{index}", str(index) * 30)
+            cache._memory.clear()
+            assert cache.get("k0") is not None  # Disk hit: k0 is now the most recently used
+            cache.set("k3", "3" * 30)
+            cache._memory.clear()
+            assert cache.get_stats()["disk_bytes"] == 90
+            assert cache.get("k1") is None
+            assert [cache.get(key) is not None for key in ("k0", "k2", "k3")] == [True, True, True]
+            print("✓ Size-bounded disk eviction")
+            
+            # Memory hits count as disk accesses too: the hot entry survives disk eviction
+            hot = TieredCache("touch_test", db_path=db_path, max_disk_bytes=100)
+            for index in range(3):
+                hot.set(f"k{index}", str(index) * 30)
+                time.sleep(0.01)
+            assert hot.get("k0") is not None and hot.get_stats()["memory_hits"] == 1
+            hot.set("k3", "3" * 30)
+            hot._memory.clear()
+            assert hot.get("k1") is None and hot.get("k0") is not None
+            
+            # Updates are batched: nothing is written until the batch fills
+            assert hot.get("k2") is not None and hot.get("k3") is not None
+            hot.TOUCH_BATCH_SIZE = 3
+            
+            def last_access():
+                return hot._conn.execute("SELECT last_access FROM touch_test WHERE key = 'k2'").fetchone()[0]
+            
+            before = last_access()
+            time.sleep(0.01)
+            hot.get("k0")
+            hot.get("k2")
+            assert last_access() == before and len(hot._touched) == 2
+            hot.get("k3")
+            assert hot._touched == {} and last_access() > before
+            hot._conn.close()
+            print("✓ Memory hits refresh disk last_access in batches")
+            
+            # Disk errors degrade to misses instead of failing the caller
+            cache._memory.clear()
+            cache._conn.execute("DROP TABLE bounded_test")
+            misses = cache.get_stats()["misses"]
+            assert cache.get("k0") is None and cache.get_stats()["misses"] == misses + 1
+            cache.set("k4", "value")
+            assert cache.get("k4") == "value"
+            cache._conn.close()
+            print("✓ SQLite errors treated as misses\n")
+        
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_rate_limit_scheduler():
+    """Test FIFO admission, deadlines, 429 handling and token reconciliation"""
+    print("\n" + "="*60)
+    print("Testing Rate Limit Scheduler")
+    print("="*60)
+    
+    try:
+        import threading
+        import time
+        from types import SimpleNamespace
+        from services.rate_limiter import RateLimitExceeded, RateLimitScheduler, _parse_duration, get_retry_after
+        
+        class RateLimited(Exception):
+            status_code = 429
+            
+            def __init__(self, headers):
+                super().__init__("429 Too Many Requests")
+                self.response = SimpleNamespace(headers=headers)
+        
+        # Header parsing
+        assert abs(_parse_duration("2m59.56s") - 179.56) < 1e-9
+        assert abs(_parse_duration("250ms") - 0.25) < 1e-9
+        assert _parse_duration("1h") == 3600 and _parse_duration("7.66s") == 7.66
+        assert get_retry_after(RateLimited({"retry-after": "3"})) == 3.0
+        assert get_retry_after(RateLimited({
+            "x-ratelimit-reset-requests": "2m59.56s",
+            "x-ratelimit-reset-tokens": "250ms"
+        })) == 179.56
+        assert get_retry_after(RateLimited({})) is None
+        print("✓ Retry-After and x-ratelimit-reset-* parsing")
+        
+        # FIFO: a cheap request queued behind an expensive one waits its turn
+        scheduler = RateLimitScheduler(requests_per_minute=6000, tokens_per_minute=6000, max_wait_seconds=5)
+        scheduler.acquire(6000)
+        admitted = []
+        
+        def admit(name, tokens):
+            scheduler.acquire(tokens)
+            admitted.append(name)
+        
+        threads = []
+        for name, tokens in (("first", 20), ("second", 1), ("third", 10)):
+            threads.append(threading.Thread(target=admit, args=(name, tokens)))
+            threads[-1].start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        assert admitted == ["first", "second", "third"], admitted
+        assert scheduler.get_stats()["peak_queue_depth"] == 3
+        print("✓ FIFO admission")
+        
+        # A deadline that cannot be met is rejected at once, with the expected wait
+        started = time.monotonic()
+        try:
+            scheduler.acquire(3000, deadline=time.monotonic() + 0.5)
+            raise AssertionError("expected RateLimitExceeded")
+        except RateLimitExceeded as e:
+            assert e.retry_after > 0.5 and time.monotonic() - started < 0.1
+        assert scheduler.get_stats()["rejected"] == 1
+        print("✓ RateLimitExceeded when the deadline cannot be met")
+        
+        # reconcile() credits tokens that were estimated but not used
+        scheduler.reconcile(estimated_tokens=4000, actual_tokens=1000)
+        started = time.monotonic()
+        scheduler.acquire(3000)
+        assert time.monotonic() - started < 0.1
+        print("✓ reconcile() credit")
+        
+        # A 429 is retried after Retry-After, and pauses every caller until then
+        scheduler = RateLimitScheduler(requests_per_minute=6000, tokens_per_minute=60000, max_retries=1,
+                                       base_backoff_seconds=0.01)
+        attempts = []
+        
+        def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RateLimited({"retry-after": "0.2"})
+            return "ok"
+        
+        assert scheduler.call(flaky, tokens=10) == "ok"
+        assert attempts[1] - attempts[0] >= 0.19
+        stats = scheduler.get_stats()
+        assert stats["rate_limited_responses"] == 1 and stats["retries"] == 1
+        
+        def rate_limited():
+            raise RateLimited({"retry-after": "0.2"})
+        
+        scheduler.max_retries = 0
+        try:
+            scheduler.call(rate_limited, tokens=10)
+            raise AssertionError("expected RateLimitExceeded")
+        except RateLimitExceeded as e:
+            assert e.retry_after >= 0.2
+        started = time.monotonic()
+        scheduler.acquire(1)
+        assert time.monotonic() - started >= 0.15
+        print("✓ 429 backoff and global pause\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_chat_sessions():
+    """Test budget-triggered compaction, the running summary, expiry and tokens_saved"""
+    print("\n" + "="*60)
+    print("Testing Chat Sessions")
+    print("="*60)
+    
+    try:
+        import time
+        from types import SimpleNamespace
+        from services.chat_sessions import ChatSessionStore
+        from services.summarization_service import SummarizationService, estimate_tokens
+        
+        class FakeGroq:
+            """Answers chat turns with "Reply n" and compaction requests with "Summary n" """
+            def __init__(self):
+                self.requests = []
+                self.compactions = []
+                self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+            
+            def create(self, model, messages, temperature, max_tokens, stream=False):
+                self.requests.append(messages)
+                if messages[0]["content"] == SummarizationService.COMPACTION_PROMPT:
+                    self.compactions.append(messages[1]["content"])
+                    content = f"Summary {len(self.compactions)}"
+                else:
+                    content = f"Reply {len(self.requests)}"
+                return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+        
+        class OfflineSummarizationService(SummarizationService):
+            CACHE_DB_PATH = ""
+        
+        service = OfflineSummarizationService()
+        service.client = FakeGroq()
+        service.initialized = True
+        
+        budget, max_tokens = 800, 50
+        session_id = service.create_chat_session("You are a patient tutor.", token_budget=budget)["session_id"]
+        session = service.sessions.get(session_id)
+        
+        def tokens(messages):
+            return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+        
+        history = [{"role": "system", "content": "You are a patient tutor."}]
+        expected_saved = 0
+        results = []
+        for turn in range(12):
+            message = {"role": "user", "content": f"Question {turn}: " + "explain this step again " * 16}
+            history.append(message)
+            result = service.chat_session(session_id, [message], max_tokens=max_tokens)
+            results.append(result)
+            expected_saved += max(0, tokens(history) - result["prompt_tokens"])
+            history.append({"role": "assistant", "content": result["response"]})
+            # The prompt never exceeds the budget once the completion is reserved
+            assert result["prompt_tokens"] + max_tokens <= budget
+        
+        compacted = [index for index, result in enumerate(results) if result["compacted"]]
+        print(f"✓ {len(results)} turns, compacted at turns {compacted}")
+        assert compacted and compacted[0] > 0 and len(service.client.compactions) == len(compacted)
+        assert session.compactions == len(compacted)
+        
+        # Before the first compaction the whole history was sent, so nothing was saved
+        assert all(result["prompt_tokens"] == tokens(history[:2 * index + 2])
+                   for index, result in enumerate(results[:compacted[0]]))
+        
+        # The running summary replaces the old turns and is carried into the next compaction
+        assert session.summary == f"Summary {len(compacted)}"
+        assert len(session.turns) < 2 * len(results)
+        last_prompt = service.client.requests[-1]
+        assert last_prompt[0]["role"] == "system" and session.summary in last_prompt[0]["content"]
+        assert "Question 0:" not in " ".join(m["content"] for m in last_prompt)
+        if len(compacted) > 1:
+            assert "Current summary:\nSummary 1" in service.client.compactions[1]
+        
+        stats = service.get_chat_session_stats()
+        assert stats["turns"] == 12 and stats["compactions"] == len(compacted)
+        assert stats["tokens_saved"] == expected_saved > 0
+        print(f"✓ Running summary kept, {stats['tokens_saved']} tokens saved")
+        
+        # Unknown sessions are a client error
+        try:
+            service.chat_session("missing", [{"role": "user", "content": "Hi"}])
+            raise AssertionError("expected ValueError")
+        except ValueError:
+            pass
+        
+        # LRU and idle expiry
+        store = ChatSessionStore(max_sessions=2, ttl_seconds=0.05)
+        first, second = store.create(), store.create()
+        assert store.get(first.id) is first
+        third = store.create()
+        assert store.get(second.id) is None and store.get(third.id) is third
+        time.sleep(0.1)
+        assert store.get(first.id) is None
+        stats = store.get_stats()
+        assert stats["expired"] == 1 and stats["active_sessions"] == 1
+        print("✓ LRU eviction and idle expiry\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_tts_sentence_cache():
+    """Test that documents sharing sentences only synthesize the new ones, with stable seeds"""
+    print("\n" + "="*60)
+    print("Testing TTS Sentence Cache")
+    print("="*60)
+    
+    try:
+        import threading
+        import time
+        import numpy as np
+        import torch
+        from services.tts_audio_cache import TTSAudioCache
+        from services.tts_service import TTSService
+        
+        class MemoryAudioCache(TTSAudioCache):
+            DB_PATH = ""
+        
+        class CountingPipeline:
+            """Records each prompt with the seed it was sampled with"""
+            def __init__(self):
+                self.calls = []
+            
+            def __call__(self, prompt, generate_kwargs=None):
+                self.calls.append((prompt, torch.initial_seed()))
+                time.sleep(0.05)
+                return {"audio": np.full(100, 0.5, dtype=np.float32), "sampling_rate": 1000}
+        
+        def make_service():
+            service = TTSService()
+            service.pipeline = CountingPipeline()
+            service.audio_cache = MemoryAudioCache("test")
+            return service
+        
+        service = make_service()
+        service.synthesize_audio("The cat sat down. It was tired.")
+        audio, rate = service.synthesize_audio("It was tired. The dog barked.")
+        prompts = [prompt for prompt, _ in service.pipeline.calls]
+        assert prompts == ["The cat sat down.", "It was tired.", "The dog barked."], prompts
+        # Two sentences of 100 samples and one 150 ms sentence pause
+        assert rate == 1000 and len(audio) == 2 * 100 + 150
+        print("✓ Second document only synthesized its new sentence")
+        
+        # A sentence's seed depends on its text and settings, not on the document or the cache
+        seeds = dict(service.pipeline.calls)
+        other = make_service()
+        other.synthesize_audio("It was tired.")
+        assert other.pipeline.calls == [("It was tired.", seeds["It was tired."])]
+        assert seeds["It was tired."] == service.audio_cache.sentence_seed(
+            service.audio_cache.key("It was tired.", {
+                "description": None, "temperature": None, "top_p": None, "seed": service.DEFAULT_SEED
+            })
+        )
+        print("✓ Sentence seeds are stable across documents")
+        
+        # Concurrent requests differing only in paragraph breaks are not coalesced
+        service = make_service()
+        texts = ["First part. Second part.", "First part.\n\nSecond part."]
+        results = [None, None]
+        barrier = threading.Barrier(2)
+        
+        def synthesize(index):
+            barrier.wait()
+            results[index] = service.synthesize_audio(texts[index])[0]
+        
+        threads = [threading.Thread(target=synthesize, args=(index,)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [len(audio) for audio in results] == [200 + 150, 200 + 400]
+        print("✓ Paragraph breaks kept in the coalescing key\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+class FakeGroqClient:
+    """Stand-in for the Groq client: answers with ``respond(messages)`` and records every request"""
+    
+    def __init__(self, respond, chunk_chars=8):
+        import threading
+        from types import SimpleNamespace
+        self.respond = respond
+        self.chunk_chars = chunk_chars
+        self.requests = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def create(self, model, messages, temperature, max_tokens, stream=False, **kwargs):
+        from types import SimpleNamespace
+        with self._lock:
+            self.requests.append(messages)
+        content = self.respond(messages)
+        usage = SimpleNamespace(total_tokens=sum(len(m["content"]) // 4 for m in messages) + len(content) // 4)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+        # Content deltas, then Groq's final chunk: an empty delta and the usage under x_groq
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + self.chunk_chars]))])
+            for i in range(0, len(content), self.chunk_chars)
+        ]
+        chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))],
+                                      x_groq=SimpleNamespace(usage=usage)))
+        return iter(chunks)
+
+
+def offline_summarization_service(respond):
+    """SummarizationService with an in-memory cache and a fake Groq client"""
+    from services.summarization_service import SummarizationService
+    
+    class OfflineSummarizationService(SummarizationService):
+        CACHE_DB_PATH = ""
+    
+    service = OfflineSummarizationService()
+    service.client = FakeGroqClient(respond)
+    service.initialized = True
+    return service
+
+
+def test_incremental_summarization():
+    """Test that editing one paragraph only re-summarizes it and its path up the reduce tree"""
+    print("\n" + "="*60)
+    print("Testing Incremental Document Summarization")
+    print("="*60)
+    
+    try:
+        from services.cache import make_cache_key
+        
+        def respond(messages):
+            prompt = messages[-1]["content"]
+            kind = "reduce" if prompt.startswith("The following are summaries") else "map"
+            return f"{kind}-{make_cache_key(prompt)[:12]}"
+        
+        service = offline_summarization_service(respond)
+        client = service.client
+        paragraphs = [
+            f"Paragraph {index} describes step {index} of the experiment in detail. " * 5
+            for index in range(16)
+        ]
+        
+        result = service.summarize_document("doc", "\n\n".join(paragraphs))
+        first_calls = list(client.requests)
+        maps = [m for m in first_calls if not m[-1]["content"].startswith("The following")]
+        assert len(maps) == 16 and result["version"] == 1 and result["paragraphs_resummarized"] == 16
+        reduces_before = len(first_calls) - len(maps)
+        print(f"✓ First version: 16 map calls, {reduces_before} reduce calls")
+        
+        paragraphs[9] = "Paragraph 9 was rewritten: the experiment now uses a second sample. " * 5
+        client.requests.clear()
+        hits_before = service.get_cache_stats()["memory_hits"]
+        result = service.summarize_document("doc", "\n\n".join(paragraphs))
+        calls = list(client.requests)
+        assert result["version"] == 2 and result["paragraphs_resummarized"] == 1
+        
+        # One map call for the edited paragraph, then each reduce call merges the previous new output
+        assert calls[0][-1]["content"].endswith(paragraphs[9].strip())
+        previous = respond(calls[0])
+        for messages in calls[1:]:
+            assert previous in messages[-1]["content"], "reduce call off the edited paragraph's path"
+            previous = respond(messages)
+        assert result["summary"] == previous
+        assert 1 <= len(calls) - 1 < reduces_before
+        # Groups that did not change came from the completion cache
+        assert service.get_cache_stats()["memory_hits"] > hits_before
+        print(f"✓ Edit re-summarized 1 paragraph and {len(calls) - 1} reduce groups on its path\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_map_reduce_summarization():
+    """Test map fan-out, reduce depth and the shared map-reduce admission deadline"""
+    print("\n" + "="*60)
+    print("Testing Map-Reduce Summarization")
+    print("="*60)
+    
+    try:
+        import time
+        from services.cache import make_cache_key
+        
+        def kind(messages):
+            return "reduce" if messages[-1]["content"].startswith("The following are summaries") else "map"
+        
+        def respond(messages):
+            return f"{kind(messages)}-{make_cache_key(messages[-1]['content'])[:12]}"
+        
+        service = offline_summarization_service(respond)
+        service.CHUNK_TOKEN_BUDGET = 50
+        # Nine paragraphs of ~190 characters: one 50-token chunk each
+        text = "\n\n".join(f"Section {index} reports the measurements of run {index}. " * 3 for index in range(9))
+        
+        deadlines = []
+        call = service.scheduler.call
+        service.scheduler.call = lambda fn, tokens, deadline=None: deadlines.append(deadline) or call(fn, tokens, deadline)
+        
+        # 9 maps -> 3 reduce groups -> final merge
+        result = service.summarize_detailed(text, strategy="hierarchical", fan_out=3, max_depth=3)
+        kinds = [kind(messages) for messages in service.client.requests]
+        assert result["summary"].startswith("reduce-") and result["mode"] == "llm"
+        assert kinds.count("map") == 9 and kinds.count("reduce") == 4, kinds
+        print("✓ fan_out=3: 9 map calls, 3 reduce groups and 1 final merge")
+        
+        # The final merge counts as a level: max_depth=2 allows 9 -> 5 partials
+        # (4 calls, one group of one) before it, max_depth=1 merges all 9 at once
+        for max_depth, reduces in ((2, 5), (1, 1)):
+            service.client.requests.clear()
+            service.cache.clear()
+            service.summarize_detailed(text, strategy="hierarchical", fan_out=2, max_depth=max_depth)
+            kinds = [kind(messages) for messages in service.client.requests]
+            assert kinds.count("map") == 9 and kinds.count("reduce") == reduces, kinds
+        print("✓ fan_out=2: max_depth bounds the number of reduce levels")
+        
+        # Every call of one document shares a deadline sized from the document, not the 30 s wait
+        assert len(set(deadlines[-10:])) == 1 and deadlines[-1] is not None
+        service.CHUNK_TOKEN_BUDGET = 3000
+        remaining = service._map_reduce_deadline("word " * (9000 * 4 // 5)) - time.monotonic()
+        assert service.RATE_LIMIT_MAX_WAIT_SECONDS < remaining <= service.MAP_REDUCE_MAX_WAIT_SECONDS
+        print(f"✓ A 3-chunk (~9000-token) document at {service.RATE_LIMIT_TPM} TPM gets {remaining:.0f}s of admission wait\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_summarize_stream_sse():
+    """Test the SSE framing of /summarize/stream: token events, ttft_ms and a terminal done/error event"""
+    print("\n" + "="*60)
+    print("Testing Streaming Summarization (SSE)")
+    print("="*60)
+    
+    try:
+        import json
+        import time
+        import app as api
+        
+        def parse(body):
+            events = []
+            for message in body.split("\n\n"):
+                if not message:
+                    continue
+                event_line, data_line = message.split("\n")
+                assert event_line.startswith("event: ") and data_line.startswith("data: "), message
+                events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+            return events
+        
+        service = offline_summarization_service(lambda messages: "A short streamed summary of the text.")
+        api.summarization_service = service
+        client = api.app.test_client()
+        
+        response = client.post("/summarize/stream", json={"text": "Some text worth summarizing."})
+        assert response.status_code == 200 and response.mimetype == "text/event-stream"
+        events = parse(response.get_data(as_text=True))
+        names = [name for name, _ in events]
+        assert names[-1] == "done" and set(names[:-1]) == {"token"} and len(names) > 2
+        assert "".join(data["text"] for _, data in events[:-1]) == "A short streamed summary of the text."
+        done = events[-1][1]
+        assert done["chars"] == len("A short streamed summary of the text.")
+        assert 0 <= done["ttft_ms"] <= done["total_ms"]
+        print(f"✓ {len(names) - 1} token events, then done {done}")
+        
+        # ttft_ms is taken at the first token, not at the end of the stream
+        def fragments():
+            time.sleep(0.1)
+            yield "first"
+            time.sleep(0.3)
+            yield "second"
+        
+        with api.app.test_request_context():
+            body = "".join(api._sse_response(fragments(), "failed").response)
+        done = parse(body)[-1][1]
+        assert 100 <= done["ttft_ms"] < 300 and done["total_ms"] >= 400
+        print(f"✓ ttft_ms={done['ttft_ms']} measured at the first token, total_ms={done['total_ms']}")
+        
+        # An upstream failure with no fallback ends the stream with an error event
+        def fail(messages):
+            raise RuntimeError("upstream down")
+        
+        service = offline_summarization_service(fail)
+        service.FALLBACK_ENABLED = False
+        api.summarization_service = service
+        events = parse(client.post("/summarize/stream", json={"text": "Text."}).get_data(as_text=True))
+        assert [name for name, _ in events] == ["error"] and "upstream down" in events[0][1]["details"]
+        print("✓ Failure ends the stream with a single error event\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_summarize_batch():
+    """Test that batch summarization dedupes identical texts and isolates per-item errors"""
+    print("\n" + "="*60)
+    print("Testing Batch Summarization")
+    print("="*60)
+    
+    try:
+        import app as api
+        
+        def respond(messages):
+            if "Beta" in messages[-1]["content"]:
+                raise RuntimeError("upstream rejected Beta")
+            return "Summary of " + messages[-1]["content"].split("\n\n")[-1]
+        
+        service = offline_summarization_service(respond)
+        service.FALLBACK_ENABLED = False
+        texts = ["Alpha text.", "  Alpha   text. ", "Beta fails.", "", "Gamma text.", "Alpha text."]
+        
+        result = service.summarize_batch(texts, concurrency=3)
+        results = result["results"]
+        assert result["total"] == 6 and result["unique"] == 4
+        assert [item["index"] for item in results] == list(range(6))
+        # Whitespace variants share one upstream call
+        assert len(service.client.requests) == 3
+        assert results[0]["summary"] == results[1]["summary"] == results[5]["summary"] == "Summary of Alpha text."
+        assert results[4]["summary"] == "Summary of Gamma text." and results[4]["mode"] == "llm"
+        # Failures stay on their own items
+        assert "upstream rejected Beta" in results[2]["error"] and "summary" not in results[2]
+        assert results[3] == {"index": 3, "error": "Text cannot be empty"}
+        print(f"✓ 6 texts, 4 unique, {len(service.client.requests)} upstream calls; errors isolated per item")
+        
+        api.summarization_service = service
+        client = api.app.test_client()
+        response = client.post("/summarize/batch", json={"texts": texts})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body["unique"] == 4 and "error" in body["results"][2] and "summary" in body["results"][1]
+        # Successful summaries come from the cache; only the failed item is retried upstream
+        assert len(service.client.requests) == 4
+        assert client.post("/summarize/batch", json={"texts": "not a list"}).status_code == 400
+        print("✓ /summarize/batch returns per-item results and rejects a non-list with 400\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_summarize_single_flight():
+    """Test that concurrent summaries coalesce on the text, ignoring only outer whitespace"""
+    print("\n" + "="*60)
+    print("Testing Summarization Single-Flight")
+    print("="*60)
+    
+    try:
+        import threading
+        import time
+        
+        def respond(messages):
+            time.sleep(0.3)
+            return "Two points."
+        
+        service = offline_summarization_service(respond)
+        runs = []
+        summarize = service._summarize_detailed
+        
+        def counting_summarize(text, *args):
+            runs.append(text)
+            return summarize(text, *args)
+        
+        service._summarize_detailed = counting_summarize
+        texts = [
+            "First point.\n\nSecond point.",
+            "  First point.\n\nSecond point.\n",
+            "First point. Second point."
+        ]
+        results = [None] * len(texts)
+        
+        def run(index):
+            results[index] = service.summarize_detailed(texts[index])
+        
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(texts))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+        
+        # Outer whitespace joins the first flight; a different layout gets its own
+        assert sorted(runs) == sorted([texts[0], texts[2]]), runs
+        assert all(result["summary"] == "Two points." for result in results)
+        print(f"✓ 3 concurrent requests, {len(runs)} summaries computed\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_snac_unpack():
+    """Test that the vectorized SNAC unpack matches the reference per-frame loop"""
+    print("\n" + "="*60)
+    print("Testing SNAC Frame Unpacking")
+    print("="*60)
+    
+    try:
+        import random
+        import numpy as np
+        from bench_snac_unpack import unpack_loop
+        from maya1_model.vllm_streaming_inference import (
+            CODE_END_TOKEN_ID,
+            SNAC_MAX_ID,
+            SNAC_MIN_ID,
+            unpack_snac_frames
+        )
+        
+        rng = random.Random(0)
+        cases = [[], [CODE_END_TOKEN_ID], [SNAC_MIN_ID] * 5, [SNAC_MAX_ID] * 7 + [CODE_END_TOKEN_ID]]
+        for frames in (1, 3, 4, 16, 285):
+            tokens = [rng.randint(SNAC_MIN_ID, SNAC_MAX_ID) for _ in range(frames * 7 + rng.randint(0, 6))]
+            cases += [tokens, tokens + [CODE_END_TOKEN_ID]]
+        
+        for tokens in cases:
+            expected = unpack_loop(tokens)
+            # Lists and the decoder's int64 buffer views take the same path
+            for given in (tokens, np.asarray(tokens, dtype=np.int64)):
+                levels = unpack_snac_frames(given)
+                assert [level.dtype for level in levels] == [np.int64] * 3
+                assert [level.tolist() for level in levels] == expected, f"mismatch for {len(tokens)} tokens"
+        print(f"✓ Vectorized unpack matches the loop on {len(cases)} inputs (lists and arrays)\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_streaming_snac_decoder():
+    """Test StreamingSNACDecoder against the original sliding window and its overlap-add"""
+    print("\n" + "="*60)
+    print("Testing Streaming SNAC Decoder")
+    print("="*60)
+    
+    try:
+        import random
+        import numpy as np
+        from maya1_model.vllm_streaming_inference import (
+            SNAC_MAX_ID,
+            SNAC_MIN_ID,
+            SNAC_SAMPLES_PER_FRAME,
+            StreamingSNACDecoder,
+            unpack_snac_frames
+        )
+        
+        class ContextDecoder:
+            """Audio of each frame depends on its code and on the window it was decoded in"""
+            def decode(self, tokens):
+                l1 = unpack_snac_frames(tokens)[0]
+                frames = (l1 + 0.25 * l1[0] + 0.125 * len(l1)) / 4096
+                ramp = np.linspace(0.0, 1.0, SNAC_SAMPLES_PER_FRAME, dtype=np.float32)
+                return (frames[:, None] + ramp[None, :]).reshape(-1).astype(np.float32)
+        
+        class FrameDecoder:
+            """Context-free: every window predicts the same samples for the same frame"""
+            def decode(self, tokens):
+                l1 = unpack_snac_frames(tokens)[0]
+                ramp = np.linspace(0.0, 1.0, SNAC_SAMPLES_PER_FRAME, dtype=np.float32)
+                return (l1[:, None] / 4096 + ramp[None, :]).reshape(-1).astype(np.float32)
+        
+        def run(decoder, tokens, *scheme):
+            stream = StreamingSNACDecoder(decoder, *scheme, initial_tokens=8)
+            chunks = [audio for audio in map(stream.push, tokens) if audio is not None]
+            return chunks, stream.flush(), stream
+        
+        rng = random.Random(0)
+        frames = 20
+        tokens = [rng.randint(SNAC_MIN_ID, SNAC_MAX_ID) for _ in range(frames * 7)]
+        
+        # The original loop: the last 4 frames every frame, keeping samples 2048:4096
+        decoder = ContextDecoder()
+        original = np.concatenate([
+            decoder.decode(tokens[size - 28:size])[2048:4096] for size in range(28, len(tokens) + 1, 7)
+        ])
+        chunks, tail, stream = run(decoder, tokens, 1, 1, 2, 0)
+        audio = np.concatenate(chunks)
+        # Hop 1 also emits frame 0 first and flushes the 2 look-ahead frames at the end
+        assert all(len(chunk) == SNAC_SAMPLES_PER_FRAME for chunk in chunks)
+        assert np.array_equal(audio[SNAC_SAMPLES_PER_FRAME:], original)
+        assert len(tail) == 2 * SNAC_SAMPLES_PER_FRAME and stream.decoder_calls == frames - 1
+        print(f"✓ hop=1, left=1, right=2, overlap=0 reproduces the sliding window ({len(original)} samples)")
+        
+        # Identical predictions crossfade to themselves: the stream equals one full decode
+        decoder = FrameDecoder()
+        chunks, tail, _ = run(decoder, tokens, 3, 1, 1, 512)
+        assert [len(chunk) for chunk in chunks] == [3 * SNAC_SAMPLES_PER_FRAME] * 6
+        assert np.allclose(np.concatenate(chunks + [tail]), decoder.decode(tokens), atol=1e-6)
+        
+        # With context-dependent windows the first 512 samples of each hop blend the
+        # previous window's look-ahead into the new window with complementary ramps
+        decoder = ContextDecoder()
+        chunks, tail, stream = run(decoder, tokens, 3, 1, 1, 512)
+        ramp = (np.arange(512, dtype=np.float32) + 0.5) / 512
+        for index in range(1, len(chunks)):
+            start = 3 * index * SNAC_SAMPLES_PER_FRAME
+            previous = decoder.decode(tokens[max(0, start // 2048 - 4) * 7:(start // 2048 + 1) * 7])
+            current = decoder.decode(tokens[(start // 2048 - 1) * 7:(start // 2048 + 4) * 7])
+            expected = previous[-SNAC_SAMPLES_PER_FRAME:][:512] * (1 - ramp) + current[2048:2048 + 512] * ramp
+            assert np.allclose(chunks[index][:512], expected, atol=1e-6), f"hop {index}"
+            assert np.allclose(chunks[index][512:], current[2048 + 512:2048 + 3 * 2048], atol=1e-6)
+        # The flushed remainder still crossfades in but keeps no tail of its own
+        assert len(tail) == 2 * SNAC_SAMPLES_PER_FRAME and stream._tail is None
+        print("✓ Overlap-add blends each hop boundary and the flushed remainder\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_snac_decode_scheduler():
+    """Test that batched decoding hands every stream its own windows' audio"""
+    print("\n" + "="*60)
+    print("Testing SNAC Decode Scheduler")
+    print("="*60)
+    
+    try:
+        import asyncio
+        import numpy as np
+        from maya1_model.vllm_streaming_inference import SNAC_MIN_ID, SNACDecodeScheduler, unpack_snac_frames
+        
+        class EchoDecoder:
+            """Returns each window's L1 codes as its audio"""
+            def __init__(self):
+                self.batches = []
+            
+            def decode_batch(self, windows):
+                self.batches.append(len(windows))
+                return [unpack_snac_frames(tokens)[0].astype(np.float32) for tokens in windows]
+        
+        async def stream(scheduler, stream_id, windows):
+            try:
+                received = []
+                for step in range(windows):
+                    # Frame codes encode (stream, step) so a mix-up is visible
+                    code = stream_id * 100 + step
+                    tokens = np.array([SNAC_MIN_ID + code] * 7 * 2, dtype=np.int64)
+                    audio = await scheduler.decode(tokens)
+                    received.append(audio)
+                    assert audio.tolist() == [code, code], f"stream {stream_id} got {audio.tolist()}"
+                    await asyncio.sleep(0)
+                return received
+            finally:
+                scheduler.close_stream()
+        
+        async def main(decoder, streams, windows):
+            scheduler = SNACDecodeScheduler(decoder, tick_seconds=0.05)
+            # Requests register when they start, before their first window is ready
+            for _ in range(streams):
+                scheduler.open_stream()
+            results = await asyncio.gather(*(stream(scheduler, index, windows) for index in range(streams)))
+            return scheduler, results
+        
+        decoder = EchoDecoder()
+        scheduler, results = asyncio.run(main(decoder, 6, 5))
+        stats = scheduler.get_stats()
+        assert all(len(received) == 5 for received in results)
+        # Every open stream waiting releases the batch: 6 windows per pass, no tick wait
+        assert decoder.batches == [6] * 5 and stats["windows"] == 30 and stats["mean_batch_size"] == 6.0
+        print(f"✓ 6 streams x 5 windows decoded in {stats['batches']} batches, each stream got its own audio")
+        
+        # A failing batch fails every window in it
+        class FailingDecoder:
+            def decode_batch(self, windows):
+                raise RuntimeError("decoder crashed")
+        
+        async def failing():
+            scheduler = SNACDecodeScheduler(FailingDecoder(), tick_seconds=0.01)
+            return await asyncio.gather(
+                *(scheduler.decode(np.array([SNAC_MIN_ID] * 7)) for _ in range(3)), return_exceptions=True
+            )
+        
+        errors = asyncio.run(failing())
+        assert all(isinstance(error, RuntimeError) for error in errors)
+        print("✓ A decoder error reaches every stream in the batch\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_audio_only_logits_processor():
+    """Test that the V1 audio constraint follows vLLM's add, remove and move batch updates"""
+    print("\n" + "="*60)
+    print("Testing Audio-Only Logits Processor")
+    print("="*60)
+    
+    try:
+        from types import SimpleNamespace
+        import maya1_model.vllm_streaming_inference as inference
+        from maya1_model.vllm_streaming_inference import CODE_START_TOKEN_ID, AudioOnlyLogitsProcessor
+        
+        def update(added=(), removed=(), moved=()):
+            return SimpleNamespace(added=list(added), removed=list(removed), moved=list(moved))
+        
+        swap, unidirectional = SimpleNamespace(name="SWAP"), SimpleNamespace(name="UNIDIRECTIONAL")
+        audio, text_only = SimpleNamespace(extra_args=None), SimpleNamespace(extra_args={"audio_only": False})
+        outputs = {name: [] for name in "abcd"}
+        
+        processor = AudioOnlyLogitsProcessor()
+        processor.update_state(None)
+        processor.update_state(update(added=[
+            (0, audio, [1, 2], outputs["a"]),                    # newer 4-tuple form
+            (1, audio, outputs["b"]),                            # older 3-tuple form
+            (2, text_only, [1], outputs["c"]),                   # opted out
+            (3, audio, [1, CODE_START_TOKEN_ID], outputs["d"]),  # SOS already in the prompt
+        ]))
+        
+        def rows():
+            """Batch row -> request name, matching the output lists by identity"""
+            names = {id(output): name for name, output in outputs.items()}
+            return {index: names.get(id(output)) for index, (_, output) in processor._rows.items()}
+        
+        assert rows() == {0: "a", 1: "b", 3: "d"}
+        
+        masked = []
+        original = inference.AUDIO_VOCABULARY_MASK
+        inference.AUDIO_VOCABULARY_MASK = SimpleNamespace(apply_=masked.append)
+        try:
+            logits = ["row0", "row1", "row2", "row3"]
+            processor.apply(logits)
+            assert masked == ["row3"]
+            # SOS generated by request b: its row is masked from then on
+            outputs["b"].extend([7, CODE_START_TOKEN_ID])
+            masked.clear()
+            processor.apply(logits)
+            assert sorted(masked) == ["row1", "row3"]
+            
+            # Remove a, swap b and d, then move d (now in row 1) into the freed row 0
+            processor.update_state(update(removed=[0], moved=[(1, 3, swap)]))
+            assert rows() == {1: "d", 3: "b"}
+            processor.update_state(update(moved=[(1, 0, unidirectional)]))
+            assert rows() == {0: "d", 3: "b"}
+            # A new request reusing a row starts without SOS state
+            processor.update_state(update(added=[(1, audio, [1], [])]))
+            masked.clear()
+            processor.apply(logits)
+            assert sorted(masked) == ["row0", "row3"]
+        finally:
+            inference.AUDIO_VOCABULARY_MASK = original
+        print("✓ Per-row SOS state follows add, remove, swap and move updates\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_stream_reconcile():
+    """Test that streamed completions reconcile the rate limiter with their real usage"""
+    print("\n" + "="*60)
+    print("Testing Streamed Usage Reconciliation")
+    print("="*60)
+    
+    try:
+        from services.summarization_service import estimate_tokens
+        
+        summary = "A streamed summary that is long enough to arrive in several chunks."
+        service = offline_summarization_service(lambda messages: summary)
+        reconciled = []
+        reconcile = service.scheduler.reconcile
+        service.scheduler.reconcile = lambda estimated, actual: reconciled.append((estimated, actual)) or reconcile(estimated, actual)
+        
+        text = "Some text worth summarizing in one request."
+        assert "".join(service.summarize_stream(text)) == summary
+        messages = service.client.requests[0]
+        usage = sum(len(m["content"]) // 4 for m in messages) + len(summary) // 4
+        estimated = service._estimate_request_tokens(messages, service.SUMMARY_MAX_TOKENS)
+        assert reconciled == [(estimated, usage)], reconciled
+        print(f"✓ Reconciled {estimated} estimated tokens to the {usage} reported on the final chunk")
+        
+        # A stream closed early (client gone) has no usage: prompt + emitted text is charged
+        stream = service.summarize_stream("Another text, so nothing comes from the cache.")
+        first = next(stream)
+        stream.close()
+        messages = service.client.requests[1]
+        assert reconciled[1] == (
+            service._estimate_request_tokens(messages, service.SUMMARY_MAX_TOKENS),
+            service._estimate_request_tokens(messages, 0) + estimate_tokens(first)
+        ), reconciled
+        print("✓ Early close reconciled from the emitted text\n")
+        return True
+    
     except Exception as e:
         print(f"✗ Error: {e}")
         import traceback
@@ -102,7 +1351,7 @@ def test_model_manager():
         print(f"  TTS model exists: {tts_exists}\n")
         
         return True
-        
+    
     except Exception as e:
         print(f"✗ Error: {e}")
         import traceback
@@ -118,7 +1367,25 @@ if __name__ == "__main__":
     results = {
         "Model Manager": test_model_manager(),
         "Summarization Service": test_summarization_service(),
-        "TTS Service": test_tts_service()
+        "Extractive Summarizer": test_extractive_summarizer(),
+        "TTS Service": test_tts_service(),
+        "TTS Stream Service": test_tts_stream_service(),
+        "Long-Form TTS Streaming": test_tts_long_form(),
+        "Audio Encoding": test_audio_encoding(),
+        "Tiered Cache": test_tiered_cache(),
+        "Rate Limit Scheduler": test_rate_limit_scheduler(),
+        "Chat Sessions": test_chat_sessions(),
+        "TTS Sentence Cache": test_tts_sentence_cache(),
+        "Incremental Summarization": test_incremental_summarization(),
+        "Map-Reduce Summarization": test_map_reduce_summarization(),
+        "Streaming Summarization (SSE)": test_summarize_stream_sse(),
+        "Batch Summarization": test_summarize_batch(),
+        "Summarization Single-Flight": test_summarize_single_flight(),
+        "SNAC Frame Unpacking": test_snac_unpack(),
+        "Streaming SNAC Decoder": test_streaming_snac_decoder(),
+        "SNAC Decode Scheduler": test_snac_decode_scheduler(),
+        "Audio-Only Logits Processor": test_audio_only_logits_processor(),
+        "Streamed Usage Reconciliation": test_stream_reconcile()
     }
     
     print("\n" + "="*60)
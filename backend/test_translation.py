@@ -1,7 +1,14 @@
 """
 Test script for translation service
 """
-from services.translation_service import TranslationService
+import threading
+import time
+from services.micro_batcher import MicroBatcher
+from services.single_flight import SingleFlight
+from services.translation_backends import BackendRouter, BackendUnavailable, DictionaryBackend, TranslationBackend
+from services.text_segmenter import join_segments, pack_segments, split_segments
+from services.translation_service import GoogleBackend, PooledGoogleTranslator, TranslationService
+from services.translator_pool import TranslatorPool
 
 def test_translation():
     print("=" * 50)
@@ -54,5 +61,786 @@ def test_translation():
     print("All tests completed!")
     print(f"{'='*50}")
 
+
+
+class OfflineTranslationService(TranslationService):
+    """Translation service with an in-memory translation memory, for tests without network"""
+    MEMORY_DB_PATH = ""
+
+
+def test_short_text_detection():
+    """Test that one-word inputs are not trusted as a source language"""
+    print("\n" + "="*60)
+    print("Testing Short Text Language Detection")
+    print("="*60)
+    
+    try:
+        service = OfflineTranslationService()
+        
+        for text in ["yes", "hi", "thanks"]:
+            detection = service.detector.detect(text)
+            source = service._detect_source(text)
+            print(f"  {text!r}: {detection['language']} (confidence: {detection['confidence']}) -> {source[2]}")
+            assert detection["confidence"] < service.DETECT_MIN_CONFIDENCE
+            assert source[2] == "auto"
+        
+        # Enough text is still trusted
+        source = service._detect_source("Bonjour tout le monde, comment allez-vous aujourd'hui ?")
+        assert source[0] == "fr" and source[2] == "fr"
+        
+        # An uncertain guess files translations under "auto", not the guess
+        keys = []
+        service.memory.get = lambda key: keys.append(key)
+        service.router = BackendRouter([DictionaryBackend({"fr": {"yes": "oui"}})])
+        service._translate_sentences(["yes"], service._detect_source("yes"), "fr")
+        assert keys == [service._memory_key("yes", "auto", "fr")]
+        
+        # A failing detector falls back to auto-detection instead of failing the request
+        def broken_detect(text):
+            raise RuntimeError("detector crashed")
+        service._detect = broken_detect
+        assert service._detect_source("Hello there, how are you today?") == ("auto", 0.0, "auto")
+        print("✓ Short inputs and detector failures fall back to auto")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+class FakeBackend(TranslationBackend):
+    """Upper-cases segments after ``delay`` seconds, or raises while ``failing``"""
+    
+    def __init__(self, name, delay=0.0, failing=False):
+        self.name = name
+        self.delay = delay
+        self.failing = failing
+        self.calls = 0
+        self.segments = []
+    
+    def translate_batch(self, segments, source_code, target_code):
+        self.calls += 1
+        self.segments.extend(segments)
+        time.sleep(self.delay)
+        if self.failing:
+            raise ConnectionError(f"{self.name} is down")
+        return [segment.upper() for segment in segments]
+
+
+def test_backend_routing():
+    """Test failover order, circuit breaking, timeouts and health-scored preference"""
+    print("\n" + "="*60)
+    print("Testing Translation Backend Routing")
+    print("="*60)
+    
+    try:
+        # Failover order and the breaker's closed -> open -> half-open -> closed cycle
+        primary, secondary = FakeBackend("primary", failing=True), FakeBackend("secondary")
+        # (a large preference keeps the configured order regardless of health)
+        router = BackendRouter([primary, secondary], timeout_seconds=1.0, failure_threshold=2, reset_seconds=0.2,
+                               preference_seconds=10)
+        breaker = router.health["primary"].breaker
+        
+        result, backend = router.translate(["hello"], "en", "fr")
+        assert result == ["HELLO"] and backend is secondary and breaker.state == "closed"
+        router.translate(["hello"], "en", "fr")
+        assert breaker.state == "open" and breaker.opens == 1
+        assert router.get_stats()["failovers"] == 2
+        
+        # Open: the primary is skipped without counting a failover
+        _, backend = router.translate(["hello"], "en", "fr")
+        assert backend is secondary and primary.calls == 2 and router.get_stats()["failovers"] == 2
+        
+        # Half-open: one trial call; failing it re-opens the circuit
+        time.sleep(0.25)
+        router.translate(["hello"], "en", "fr")
+        assert primary.calls == 3 and breaker.state == "open" and breaker.opens == 2
+        
+        # Half-open again: a successful trial closes it
+        time.sleep(0.25)
+        primary.failing = False
+        _, backend = router.translate(["hello"], "en", "fr")
+        assert backend is primary and breaker.state == "closed" and breaker.failures == 0
+        print("✓ Failover order and breaker transitions")
+        
+        # Every backend failing raises BackendUnavailable
+        primary.failing = secondary.failing = True
+        try:
+            router.translate(["hello"], "en", "fr")
+            raise AssertionError("expected BackendUnavailable")
+        except BackendUnavailable:
+            pass
+        assert router.get_stats()["exhausted"] == 1
+        
+        # A backend that does not answer in time fails over; its late failure is not counted twice
+        hanging, healthy = FakeBackend("hanging", delay=0.3, failing=True), FakeBackend("healthy")
+        router = BackendRouter([hanging, healthy], timeout_seconds=0.1, failure_threshold=5)
+        started = time.monotonic()
+        _, backend = router.translate(["hello"], "en", "fr")
+        assert backend is healthy and time.monotonic() - started < 0.25
+        time.sleep(0.3)
+        stats = router.get_stats()
+        assert stats["failovers"] == 1 and stats["backends"]["hanging"]["timeouts"] == 1
+        assert router.health["hanging"].breaker.failures == 1
+        print("✓ Timeout failover")
+        
+        # The timeout also bounds the last candidate, including when the others' circuits are open
+        for backends in ([FakeBackend("alone", delay=0.3)], [FakeBackend("slow", delay=0.3), FakeBackend("open")]):
+            router = BackendRouter(backends, timeout_seconds=0.1, failure_threshold=1, reset_seconds=60)
+            if len(backends) > 1:
+                router.health["open"].breaker.record_failure()
+            started = time.monotonic()
+            try:
+                router.translate(["hello"], "en", "fr")
+                raise AssertionError("expected BackendUnavailable")
+            except BackendUnavailable:
+                pass
+            assert time.monotonic() - started < 0.25 and backends[-1].calls == (1 if len(backends) == 1 else 0)
+        print("✓ Timeout applied to the last candidate")
+        
+        # Slow setup (e.g. a model load) runs outside the timed attempt; failed setup skips the backend
+        class LoadingBackend(FakeBackend):
+            def __init__(self, name, load_seconds=0.0, load_error=None):
+                super().__init__(name)
+                self.load_seconds = load_seconds
+                self.load_error = load_error
+                self.prepared = []
+            
+            def prepare(self, source_code, target_code):
+                self.prepared.append((source_code, target_code))
+                time.sleep(self.load_seconds)
+                if self.load_error:
+                    raise self.load_error
+        
+        loading, missing = LoadingBackend("loading", load_seconds=0.3), LoadingBackend("missing", load_error=OSError("no model"))
+        router = BackendRouter([missing, loading], timeout_seconds=0.1, failure_threshold=1, preference_seconds=10)
+        _, backend = router.translate(["hello"], "en", "fr")
+        assert backend is loading and loading.prepared == [("en", "fr")] and missing.calls == 0
+        stats = router.get_stats()
+        assert stats["backends"]["loading"]["timeouts"] == 0 and stats["backends"]["missing"]["state"] == "closed"
+        print("✓ Backend setup outside the timed attempt")
+        
+        # Hanging calls occupy only their own backend's workers
+        hanging.failing = False
+        router = BackendRouter([hanging, healthy], timeout_seconds=0.1, failure_threshold=100, max_workers=1)
+        started = time.monotonic()
+        for _ in range(3):
+            _, backend = router.translate(["hello"], "en", "fr")
+            assert backend is healthy
+        assert time.monotonic() - started < 0.6
+        assert router.get_stats()["backends"]["healthy"]["timeouts"] == 0
+        print("✓ Healthy backend unaffected by hanging calls")
+        
+        # Health scoring: a consistently slower preferred backend loses traffic
+        slower, faster = FakeBackend("slower", delay=0.05), FakeBackend("faster")
+        router = BackendRouter([slower, faster], timeout_seconds=1.0, preference_seconds=0.01)
+        chosen = [router.translate(["hello"], "en", "fr")[1].name for _ in range(3)]
+        assert chosen == ["slower", "faster", "faster"], chosen
+        assert router.get_stats()["failovers"] == 0
+        print("✓ Health-scored preference")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+class FakeTranslator:
+    """Brackets every line; with ``merge_lines`` it joins a multi-line request into one line"""
+    
+    def __init__(self, merge_lines=False):
+        self.merge_lines = merge_lines
+        self.requests = []
+    
+    def translate(self, text, source="auto"):
+        self.requests.append(text)
+        lines = [f"[{line}]" for line in text.split("\n")]
+        return " ".join(lines) if self.merge_lines else "\n".join(lines)
+    
+    def translate_batch(self, batch, source="auto"):
+        return [self.translate(text, source=source) for text in batch]
+
+
+def test_segmented_round_trip():
+    """Test segmentation, newline-joined packing and reassembly into the original layout"""
+    print("\n" + "="*60)
+    print("Testing Segmented Translation Round Trip")
+    print("="*60)
+    
+    try:
+        text = (
+            "First paragraph opens here. It has a second sentence!\n"
+            "A line break inside the paragraph.\n\n"
+            "Second paragraph with a sentence that is far longer than the tiny request budget of this test.\n\n\n"
+            "  Third paragraph? Short."
+        )
+        
+        for merge_lines in (False, True):
+            service = OfflineTranslationService()
+            service.MAX_REQUEST_CHARS = 60
+            service.initialize()
+            translator = FakeTranslator(merge_lines=merge_lines)
+            service.router = BackendRouter([GoogleBackend(TranslatorPool(lambda target_code: translator))])
+            
+            sentences, gaps = split_segments(text, service.MAX_REQUEST_CHARS)
+            assert join_segments(sentences, gaps) == text
+            assert all(len(sentence) <= service.MAX_REQUEST_CHARS for sentence in sentences)
+            assert len(sentences) == 7
+            
+            result = service.translate(text, "French", source_language="English")
+            expected = join_segments([f"[{sentence}]" for sentence in sentences], gaps).strip()
+            assert result["translated"] == expected, result["translated"]
+            assert result["segments"] == len(sentences)
+            # One request per pack, plus one per segment of each pack whose lines were merged
+            packs = pack_segments(sentences, service.MAX_REQUEST_CHARS)
+            fallbacks = sum(end - start for start, end in packs if end - start > 1) if merge_lines else 0
+            assert result["requests"] == len(packs) > 1
+            assert len(translator.requests) == len(packs) + fallbacks
+            print(f"✓ {'Merged' if merge_lines else 'Line-preserving'} translator: "
+                  f"{result['segments']} segments in {result['requests']} requests, layout kept")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_translation_memory():
+    """Test that a document sharing sentences with an earlier one only sends the new ones upstream"""
+    print("\n" + "="*60)
+    print("Testing Translation Memory Reuse")
+    print("="*60)
+    
+    try:
+        service = OfflineTranslationService()
+        service.initialize()
+        backend = FakeBackend("counting")
+        service.router = BackendRouter([backend])
+        
+        first = "The meeting starts at nine. Please bring your notes. Lunch is provided."
+        second = "Please bring your notes.\nLunch is provided. The room has changed."
+        
+        result = service.translate(first, "French", source_language="English")
+        assert result["segments_from_memory"] == 0 and len(backend.segments) == 3
+        
+        backend.segments.clear()
+        result = service.translate(second, "French", source_language="English")
+        assert backend.segments == ["The room has changed."], backend.segments
+        assert result["segments_from_memory"] == 2
+        assert result["translated"] == "PLEASE BRING YOUR NOTES.\nLUNCH IS PROVIDED. THE ROOM HAS CHANGED."
+        
+        # A different target language is a different memory entry
+        backend.segments.clear()
+        service.translate(second, "Spanish", source_language="English")
+        assert len(backend.segments) == 3
+        print("✓ Only new sentences were sent upstream")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def run_concurrently(fn, count):
+    """Call fn(index) from ``count`` threads released together; returns results or exceptions by index"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+    
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = fn(index)
+        except Exception as e:
+            results[index] = e
+    
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_single_flight():
+    """Test that concurrent identical calls share one execution, its result and its exception"""
+    print("\n" + "="*60)
+    print("Testing Single Flight Coalescing")
+    print("="*60)
+    
+    try:
+        flight = SingleFlight("test")
+        executions = []
+        
+        def work():
+            executions.append(1)
+            time.sleep(0.1)
+            return {"value": 42}
+        
+        results = run_concurrently(lambda index: flight.do("key", work), 5)
+        assert len(executions) == 1 and all(result is results[0] for result in results)
+        stats = flight.get_stats()
+        assert stats["executions"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+        print("✓ Five concurrent calls, one execution")
+        
+        def failing():
+            executions.append(1)
+            time.sleep(0.1)
+            raise ValueError("upstream failed")
+        
+        executions.clear()
+        results = run_concurrently(lambda index: flight.do("key", failing), 5)
+        assert len(executions) == 1 and all(isinstance(result, ValueError) for result in results)
+        print("✓ The exception reached every waiter")
+        
+        # Translations differing only in layout are not coalesced
+        service = OfflineTranslationService()
+        service.initialize()
+        service.router = BackendRouter([FakeBackend("slow", delay=0.1)])
+        texts = ["First line.\nSecond line.", "First line. Second line."]
+        results = run_concurrently(lambda index: service.translate(texts[index], "French", "English"), 2)
+        assert [result["translated"] for result in results] == [text.upper() for text in texts]
+        print("✓ Layout-only differences translated separately")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_translator_pool():
+    """Test client checkout and reuse, acquire timeouts, pool metrics and the pooled session"""
+    print("\n" + "="*60)
+    print("Testing Translator Pool")
+    print("="*60)
+    
+    try:
+        import requests
+        from types import SimpleNamespace
+        from deep_translator import GoogleTranslator
+        from deep_translator import google as deep_translator_google
+        from deep_translator.exceptions import RequestError
+        
+        class FakeClient:
+            def __init__(self, key):
+                self.key = key
+                self.closed = False
+            
+            def close(self):
+                self.closed = True
+        
+        pool = TranslatorPool(FakeClient, max_size=2, acquire_timeout=0.1)
+        with pool.client("fr") as first:
+            with pool.client("fr") as second:
+                assert first is not second and first.key == "fr"
+                # Both clients of the key are busy: the next caller times out
+                started = time.monotonic()
+                try:
+                    with pool.client("fr"):
+                        pass
+                    raise AssertionError("expected TimeoutError")
+                except TimeoutError:
+                    assert time.monotonic() - started >= 0.1
+                # Other keys have their own clients
+                with pool.client("de") as other:
+                    assert other.key == "de"
+        
+        with pool.client("fr") as again:
+            assert again in (first, second)
+        
+        # A client whose block raised is closed and replaced
+        try:
+            with pool.client("fr") as broken:
+                raise ConnectionError("connection reset")
+        except ConnectionError:
+            pass
+        assert broken.closed
+        
+        # A waiting caller gets the client as soon as it is released
+        pool.acquire_timeout = 1.0
+        def checkout():
+            with pool.client("fr"):
+                pass
+        
+        with pool.client("fr"):
+            waiter = threading.Thread(target=checkout)
+            with pool.client("fr"):
+                waiter.start()
+                time.sleep(0.05)
+            waiter.join()
+        
+        stats = pool.get_stats()
+        assert stats["checkouts"] == 9 and stats["created"] == 4 and stats["discarded"] == 1
+        assert stats["reused"] == 4 and stats["waits"] == 1 and stats["wait_seconds"] > 0
+        assert stats["pools"]["fr"] == {"size": 2, "idle": 2, "in_use": 0}
+        print(f"✓ Checkout, reuse, timeout and metrics: {stats}")
+        
+        # Requests go through the client's session with its timeouts, via the library's translate()
+        class FakeSession:
+            def __init__(self, error=None):
+                self.error = error
+                self.requests = []
+            
+            def get(self, url, params=None, timeout=None, **kwargs):
+                self.requests.append((dict(params), timeout))
+                if self.error:
+                    raise self.error
+                return SimpleNamespace(status_code=200, text='<div class="result-container">Bonjour</div>',
+                                       close=lambda: None)
+        
+        translator = PooledGoogleTranslator(target="fr", timeout=(1.0, 2.0))
+        translator.session = FakeSession()
+        assert translator.translate("Hello", source="en") == "Bonjour"
+        params, timeout = translator.session.requests[0]
+        assert params["sl"] == "en" and params["tl"] == "fr" and params["q"] == "Hello" and timeout == (1.0, 2.0)
+        assert translator.source == "auto"
+        assert translator.translate_batch(["Hello", "Hi"], source="en") == ["Bonjour", "Bonjour"]
+        
+        translator.session = FakeSession(error=requests.ReadTimeout("read timed out"))
+        try:
+            translator.translate("Hello")
+            raise AssertionError("expected RequestError")
+        except RequestError:
+            pass
+        print("✓ Pooled session used with its timeouts")
+        
+        # The library's requests module is only swapped while a pooled client translates
+        assert deep_translator_google.requests is requests
+        plain_requests = []
+        real_get = requests.get
+        requests.get = lambda url, **kwargs: plain_requests.append(url) or SimpleNamespace(
+            status_code=200, text='<div class="result-container">Salut</div>', close=lambda: None)
+        try:
+            translator.session = FakeSession()
+            assert GoogleTranslator(source="en", target="fr").translate("Hi") == "Salut"
+        finally:
+            requests.get = real_get
+        assert len(plain_requests) == 1 and translator.session.requests == []
+        print("✓ Plain GoogleTranslator requests bypass the pooled sessions")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_translate_multi():
+    """Test multi-target translation: one detection and segmentation, per-target results and errors"""
+    print("\n" + "="*60)
+    print("Testing Multi-Target Translation")
+    print("="*60)
+    
+    try:
+        import services.translation_service as translation_module
+        
+        class TargetFailingBackend(FakeBackend):
+            """Fails for one target language only"""
+            def translate_batch(self, segments, source_code, target_code):
+                if target_code == "ta":
+                    raise ConnectionError("no route to the Tamil model")
+                return [f"{target_code}:{segment}" for segment in segments]
+        
+        service = OfflineTranslationService()
+        service.initialize()
+        service.router = BackendRouter([TargetFailingBackend("partial")])
+        
+        calls = {"detect": 0, "split": 0}
+        detect, split = service._detect, translation_module.split_segments
+        
+        def counting_detect(text):
+            calls["detect"] += 1
+            return detect(text)
+        
+        def counting_split(*args, **kwargs):
+            calls["split"] += 1
+            return split(*args, **kwargs)
+        
+        service._detect = counting_detect
+        translation_module.split_segments = counting_split
+        try:
+            text = "Good morning everyone. The lesson starts now.\n\nPlease open your books."
+            result = service.translate_multi(text, ["Hindi", "French", "Hindi", "Tamil"])
+        finally:
+            translation_module.split_segments = split
+        
+        assert calls == {"detect": 1, "split": 1}, calls
+        assert list(result["results"]) == ["Hindi", "French"] and list(result["errors"]) == ["Tamil"]
+        assert "no route to the Tamil model" in result["errors"]["Tamil"]
+        for language, code in (("Hindi", "hi"), ("French", "fr")):
+            entry = result["results"][language]
+            assert entry["target_code"] == code and entry["elapsed_ms"] >= 0
+            assert entry["translated"].startswith(f"{code}:Good morning everyone.")
+            assert f"\n\n{code}:Please open your books." in entry["translated"]
+        assert result["segments"] == 3 and result["source_language"] == "en"
+        print(f"✓ One detection and segmentation for {len(result['results'])} targets, Tamil failed alone")
+        
+        try:
+            service.translate_multi(text, ["Hindi", "Klingon"])
+            raise AssertionError("expected ValueError")
+        except ValueError:
+            pass
+        
+        # The endpoint maps unsupported targets to a 400
+        import app as api
+        api.translation_service = service
+        client = api.app.test_client()
+        response = client.post("/translate/multi", json={"text": text, "targetLangs": ["Hindi", "Klingon"]})
+        assert response.status_code == 400 and "Klingon" in response.get_json()["error"]
+        response = client.post("/translate/multi", json={"text": text, "targetLangs": ["French", "Tamil"]})
+        body = response.get_json()
+        assert response.status_code == 200 and list(body["results"]) == ["French"] and list(body["errors"]) == ["Tamil"]
+        print("✓ /translate/multi returns 400 for unsupported targets")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_micro_batcher():
+    """Test window and size flushes, weight splits, per-item errors, shutdown and the /health histogram"""
+    print("\n" + "="*60)
+    print("Testing Micro Batching")
+    print("="*60)
+    
+    try:
+        batches = []
+        
+        def handler(key, items):
+            batches.append(list(items))
+            return [ValueError(f"bad item {item}") if item == "bad" else f"{key}:{item}" for item in items]
+        
+        def submit_staggered(batcher, items, key="k", delay=0.02):
+            """Submit items from separate threads, in order, ``delay`` apart"""
+            results = [None] * len(items)
+            
+            def worker(index):
+                try:
+                    results[index] = batcher.submit(key, items[index])
+                except Exception as e:
+                    results[index] = e
+            
+            threads = []
+            for index in range(len(items)):
+                threads.append(threading.Thread(target=worker, args=(index,)))
+                threads[-1].start()
+                time.sleep(delay)
+            for thread in threads:
+                thread.join()
+            return results
+        
+        # Window flush: everything submitted within the window goes out together
+        batcher = MicroBatcher("test", handler, window_seconds=0.2, max_batch=16)
+        started = time.monotonic()
+        results = submit_staggered(batcher, ["a", "b", "c"])
+        assert batches == [["a", "b", "c"]] and results == ["k:a", "k:b", "k:c"]
+        assert time.monotonic() - started >= 0.2
+        print("✓ Window flush")
+        
+        # max_batch flush: a full batch does not wait out the window
+        batches.clear()
+        batcher = MicroBatcher("test", handler, window_seconds=5.0, max_batch=2)
+        started = time.monotonic()
+        assert submit_staggered(batcher, ["a", "b"]) == ["k:a", "k:b"]
+        assert batches == [["a", "b"]] and time.monotonic() - started < 1.0
+        print("✓ max_batch flush")
+        
+        # max_weight split: an item that does not fit sends the open batch and starts a new one
+        batches.clear()
+        batcher = MicroBatcher("test", handler, window_seconds=0.2, max_batch=16, max_weight=10, weight=len)
+        assert submit_staggered(batcher, ["aaaa", "bbbb", "cccc"]) == ["k:aaaa", "k:bbbb", "k:cccc"]
+        assert batches == [["aaaa", "bbbb"], ["cccc"]]
+        print("✓ max_weight split")
+        
+        # A bad item fails only its own caller; a failing handler fails the whole batch
+        batches.clear()
+        results = submit_staggered(batcher, ["ok", "bad", "fine"])
+        assert results[0] == "k:ok" and results[2] == "k:fine" and isinstance(results[1], ValueError)
+        
+        def broken(key, items):
+            raise ConnectionError("upstream down")
+        
+        failing = MicroBatcher("test", broken, window_seconds=0.05)
+        assert all(isinstance(result, ConnectionError) for result in submit_staggered(failing, ["a", "b"]))
+        assert failing.get_stats()["errors"] == 1
+        print("✓ Per-item errors demultiplexed")
+        
+        # Shutdown: pending items are sent at once, later ones without waiting for a window
+        batches.clear()
+        batcher = MicroBatcher("test", handler, window_seconds=5.0, max_batch=16)
+        pending = []
+        thread = threading.Thread(target=lambda: pending.append(batcher.submit("k", "pending")))
+        thread.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        batcher.close()
+        thread.join()
+        assert pending == ["k:pending"] and batcher.submit("k", "late") == "k:late"
+        assert time.monotonic() - started < 1.0 and batches == [["pending"], ["late"]]
+        print("✓ Shutdown flushes pending items")
+        
+        # Concurrent translations share one backend call; the histogram is reported under /health
+        class BatchingTranslationService(OfflineTranslationService):
+            MICRO_BATCH_ENABLED = True
+            MICRO_BATCH_WINDOW_MS = 200
+        
+        service = BatchingTranslationService()
+        service.initialize()
+        backend = FakeBackend("counting")
+        service.router = BackendRouter([backend])
+        texts = ["Good morning.", "See you tomorrow.", "Thank you very much."]
+        results = run_concurrently(lambda index: service.translate(texts[index], "French", "English"), 3)
+        assert [result["translated"] for result in results] == [text.upper() for text in texts]
+        assert backend.calls == 1 and sorted(backend.segments) == sorted(texts)
+        
+        import app as api
+        api.translation_service = service
+        health = api.app.test_client().get("/health").get_json()
+        stats = health["services"]["translation"]["micro_batching"]["translate"]
+        assert stats["batches"] == 1 and stats["items"] == 3 and stats["histogram"]["le_4"] == 1
+        print(f"✓ /health batch-size histogram: {stats['histogram']}")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_translate_stream():
+    """Test streamed translation: document order, layout, counts and cancellation on early close"""
+    print("\n" + "="*60)
+    print("Testing Streaming Translation")
+    print("="*60)
+    
+    try:
+        class OrderedBackend(FakeBackend):
+            """Slows down packs that mention ``slow`` so they finish after later packs"""
+            def __init__(self, name, slow=(), delay=0.0):
+                super().__init__(name, delay)
+                self.slow = slow
+                self.finished = []
+            
+            def translate_batch(self, segments, source_code, target_code):
+                self.calls += 1
+                time.sleep(0.3 if any(word in " ".join(segments) for word in self.slow) else self.delay)
+                self.finished.append(segments[0])
+                return [segment.upper() for segment in segments]
+        
+        backend = OrderedBackend("ordered", slow=("first",))
+        service = OfflineTranslationService()
+        service.initialize()
+        service.router = BackendRouter([backend])
+        service.STREAM_PACK_CHARS = 40
+        
+        text = ("  The first sentence is slow to translate.  The second one is quick.\n\n"
+                "A new paragraph\tstarts here.   It ends the document.\n")
+        events = list(service.translate_stream(text, "French", "en"))
+        start, segments, done = events[0], events[1:-1], events[-1]
+        assert start["type"] == "start" and done["type"] == "done"
+        assert start["packs"] == len(segments) == 4
+        # The first pack finished last but is still emitted first
+        assert backend.finished[-1].startswith("The first") and [s["index"] for s in segments] == [0, 1, 2, 3]
+        assert "".join(s["text"] for s in segments) == text.strip().upper()
+        assert done["requests"] == 4 and done["segments_from_memory"] == 0 and done["backends"] == {"ordered": 4}
+        print(f"✓ {len(segments)} segments in document order with the layout intact; done {done}")
+        
+        # The same text again comes from the translation memory
+        done = list(service.translate_stream(text, "French", "en"))[-1]
+        assert done["requests"] == 0 and done["segments_from_memory"] == 4 and backend.calls == 4
+        print("✓ Repeated text reported as served from memory")
+        
+        # Closing early cancels the packs the pool has not started
+        backend = OrderedBackend("slow", delay=0.2)
+        service.router = BackendRouter([backend], timeout_seconds=5)
+        text = " ".join(f"Sentence number {index} of a long stream." for index in range(20))
+        stream = service.translate_stream(text, "French", "en")
+        assert next(stream)["type"] == "start" and next(stream)["index"] == 0
+        stream.close()
+        time.sleep(0.5)
+        assert backend.calls < 20 - service.MAX_WORKERS, backend.calls
+        print(f"✓ Early close: only {backend.calls} of 20 packs reached the backend\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_source_language_validation():
+    """Test that sourceLang accepts names and codes and rejects non-strings with a 400"""
+    print("\n" + "="*60)
+    print("Testing Source Language Validation")
+    print("="*60)
+    
+    try:
+        service = OfflineTranslationService()
+        service.initialize()
+        
+        for given, expected in ((None, None), ("", None), ("auto", None), ("English", "en"), ("FR", "fr")):
+            assert service._resolve_source(given) == expected, given
+        for given in (5, 0, False, ["en"], {"name": "English"}, "Elvish"):
+            try:
+                service._resolve_source(given)
+                raise AssertionError(f"expected ValueError for {given!r}")
+            except ValueError:
+                pass
+        print("✓ Names, codes and auto resolve; non-strings and unknown languages raise ValueError")
+        
+        import app as api
+        api.translation_service = service
+        client = api.app.test_client()
+        for source in (5, ["en"], "Elvish"):
+            for path, body in (("/translate", {"targetLang": "French"}),
+                               ("/translate/multi", {"targetLangs": ["French"]}),
+                               ("/translate/stream", {"targetLang": "French"})):
+                response = client.post(path, json={"text": "Hello there.", "sourceLang": source, **body})
+                assert response.status_code == 400, (path, source, response.status_code)
+        print("✓ Invalid sourceLang returns 400 from every translation endpoint\n")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 if __name__ == "__main__":
     test_translation()
+    
+    results = {
+        "Short Text Detection": test_short_text_detection(),
+        "Backend Routing": test_backend_routing(),
+        "Segmented Round Trip": test_segmented_round_trip(),
+        "Translation Memory": test_translation_memory(),
+        "Single Flight": test_single_flight(),
+        "Translator Pool": test_translator_pool(),
+        "Multi-Target Translation": test_translate_multi(),
+        "Micro Batching": test_micro_batcher(),
+        "Streaming Translation": test_translate_stream(),
+        "Source Language Validation": test_source_language_validation()
+    }
+    
+    print("\n" + "="*60)
+    print("TEST RESULTS")
+    print("="*60)
+    for name, passed in results.items():
+        status = "✓ PASSED" if passed else "✗ FAILED"
+        print(f"{name}: {status}")
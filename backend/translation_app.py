@@ -3,15 +3,62 @@ Simple Translation API - No model loading, just translation service
 Fast and lightweight backend for translation only.
 """
 
+import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from googletrans import Translator
+from services.translator_pool import TranslatorPool
+from services.translation_backends import BackendRouter, TranslationBackend, build_backends
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize translator
-translator = Translator()
+# Pool of translators keyed by target language. A googletrans Translator holds
+# one keep-alive HTTP client and is not safe to share between request
+# threads, so each request checks one out exclusively.
+TRANSLATE_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_READ_TIMEOUT_SECONDS", "10"))
+translators = TranslatorPool(
+    lambda key: Translator(timeout=TRANSLATE_TIMEOUT_SECONDS),
+    max_size=int(os.getenv("TRANSLATE_POOL_SIZE", "8")),
+    acquire_timeout=float(os.getenv("TRANSLATE_POOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+)
+
+
+class TranslatedText(str):
+    """Translated string that also carries the source language googletrans detected"""
+    
+    src = "auto"
+
+
+class GoogletransBackend(TranslationBackend):
+    """Google Translate through pooled googletrans clients"""
+    
+    name = "googletrans"
+    
+    def translate_batch(self, segments, source_code, target_code):
+        with translators.client(target_code) as translator:
+            results = translator.translate(list(segments), src=source_code or "auto", dest=target_code)
+        texts = []
+        for result in results:
+            text = TranslatedText(result.text)
+            text.src = result.src
+            texts.append(text)
+        return texts
+
+
+# Route across engines with failover: googletrans (also used for "google"
+# in a TRANSLATE_BACKENDS shared with app.py); the offline dictionary only
+# when listed explicitly
+googletrans_backend = GoogletransBackend()
+router = BackendRouter(
+    build_backends(
+        os.getenv("TRANSLATE_BACKENDS", "googletrans").split(","),
+        extra={"google": googletrans_backend, "googletrans": googletrans_backend}
+    ),
+    timeout_seconds=float(os.getenv("TRANSLATE_BACKEND_TIMEOUT_SECONDS", "8")),
+    failure_threshold=int(os.getenv("TRANSLATE_BREAKER_FAILURES", "5")),
+    reset_seconds=float(os.getenv("TRANSLATE_BREAKER_RESET_SECONDS", "30"))
+)
 
 # Language code mapping
 LANGUAGE_MAP = {
@@ -31,7 +78,9 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "service": "translation",
-        "supported_languages": list(LANGUAGE_MAP.keys())
+        "supported_languages": list(LANGUAGE_MAP.keys()),
+        "client_pool": translators.get_stats(),
+        "backends": router.get_stats()
     })
 
 @app.route('/translate', methods=['POST'])
@@ -65,13 +114,14 @@ def translate():
         print(f"Translating to {target_lang} ({target_code})...")
         
         # Perform translation
-        result = translator.translate(text, dest=target_code)
+        (translated,), backend = router.translate([text], "auto", target_code)
         
         return jsonify({
-            "translated": result.text,
-            "source_language": result.src,
+            "translated": str(translated),
+            "source_language": getattr(translated, "src", "auto"),
             "target_language": target_lang,
-            "target_code": target_code
+            "target_code": target_code,
+            "backend": backend.name
         })
     
     except ValueError as err:
@@ -101,7 +151,8 @@ def detect_language():
         if not text or not text.strip():
             return jsonify({"error": "Text cannot be empty"}), 400
         
-        detection = translator.detect(text)
+        with translators.client("detect") as translator:
+            detection = translator.detect(text)
         
         return jsonify({
             "language": detection.lang,
@@ -94,18 +94,43 @@ export default function DyslexiaFont() {
 
   async function summarizeText() {
     setSummarizing(true);
+    setSummary("");
     try {
-      const res = await fetch(new URL("/summarize", BASE).href, {
+      const res = await fetch(new URL("/summarize/stream", BASE).href, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ text }),
       });
-      const json = await res.json();
-      if (json.error) {
+      if (!res.ok || !res.body) {
+        const json = await res.json();
         console.error("Summarizer error:", json);
         alert("Summarizer error (see console)");
-      } else {
-        setSummary(json.summary || "");
+        return;
+      }
+
+      // Read Server-Sent Events and append tokens as they arrive
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const eventLine = raw.split("\n").find((l) => l.startsWith("event: "));
+          const dataLine = raw.split("\n").find((l) => l.startsWith("data: "));
+          if (!eventLine || !dataLine) continue;
+          const event = eventLine.slice(7);
+          const data = JSON.parse(dataLine.slice(6));
+          if (event === "token") {
+            setSummary((prev) => prev + data.text);
+          } else if (event === "error") {
+            console.error("Summarizer error:", data);
+            alert("Summarizer error (see console)");
+          }
+        }
       }
     } catch (err) {
       console.error("Summarizer request failed:", err);
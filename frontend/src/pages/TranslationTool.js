@@ -47,16 +47,37 @@ export default function TranslationTool() {
     if (!text.trim()) return alert("Enter text first");
 
     setLoading(true);
+    setTranslated("");
     try {
-      const res = await fetch(`${BASE}/translate`, {
+      const res = await fetch(`${BASE}/translate/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ text, targetLang: lang }),
       });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
 
-      const json = await res.json();
-      setTranslated(json.translated || "");
-    } catch {
+      // Read NDJSON lines and append each translated segment as it arrives
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === "segment") {
+            setTranslated((prev) => prev + event.text);
+          } else if (event.type === "error") {
+            throw new Error(event.details || event.error);
+          }
+        }
+      }
+    } catch (err) {
+      console.error("Translation failed:", err);
       alert("Translation failed");
     }
     setLoading(false);